@@ -0,0 +1,722 @@
+#!/usr/bin/env python3
+
+import argparse
+import audioop
+import ctypes
+import http.server
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import socketserver
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from array import array
+
+SRC_DIR = os.path.join(os.path.split(os.path.abspath(sys.path[0]))[0], 'src')
+sys.path.insert(0, SRC_DIR)
+
+# noinspection PyPep8
+from lib import sr_wrapper as sr
+# noinspection PyPep8
+from lib.audio_utils import ModuleLoader, EmptyHWD, WebRTCVAD, APMVAD, StreamDetector, ShortFrame
+# noinspection PyPep8
+from lib.streaming_converter import AudioConverter, CMD
+# noinspection PyPep8
+from lib.socket_wrapper import WSServerAdapter
+# noinspection PyPep8
+from lib.tts_cache_index import TTSCacheIndex
+
+RATE = 16000
+WIDTH = 2
+# Длина кадра porcupine в семплах
+PORCUPINE_FRAME = 512
+LF = '\n'
+
+
+def load_fixture(path: str, rate=RATE) -> bytes:
+    # Приводим запись к формату микрофона: mono, 16 bit, rate
+    with wave.open(path, 'rb') as fp:
+        channels, width, file_rate = fp.getnchannels(), fp.getsampwidth(), fp.getframerate()
+        data = fp.readframes(fp.getnframes())
+    if channels == 2:
+        data = audioop.tomono(data, width, 0.5, 0.5)
+    elif channels != 1:
+        raise RuntimeError('{}: unsupported channels count: {}'.format(path, channels))
+    if width != WIDTH:
+        data = audioop.lin2lin(data, width, WIDTH)
+    if file_rate != rate:
+        data, _ = audioop.ratecv(data, WIDTH, 1, file_rate, rate, None)
+    return data
+
+
+def synthetic_fixture(seconds=6.0, rate=RATE, seed=1) -> bytes:
+    # Тишина с шумом, 'речь' (гармоники с амплитудной модуляцией), снова тишина. Детерминировано.
+    rnd = random.Random(seed)
+    samples = array('h')
+    speech_start, speech_end = seconds * 0.3, seconds * 0.7
+    for idx in range(int(seconds * rate)):
+        pos = idx / rate
+        value = rnd.gauss(0, 150)
+        if speech_start <= pos < speech_end:
+            envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * pos)
+            value += envelope * sum(
+                amp * math.sin(2 * math.pi * freq * pos) for freq, amp in ((180, 5000), (360, 2500), (720, 1200))
+            )
+        samples.append(max(-32768, min(32767, int(value))))
+    if sys.byteorder != 'little':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+class ReplayStream:
+    """Совместим с MicrophoneStream, отдает заранее записанный PCM."""
+    def __init__(self, data: bytes, rate=RATE, width=WIDTH, realtime=False):
+        self._data = data
+        self._pos = 0
+        self._bytes_per_sec = rate * width
+        self._width = width
+        self._realtime = realtime
+        self._start = None
+
+    def read(self, size: int) -> bytes:
+        size *= self._width
+        if self._realtime:
+            self._start = self._start or time.perf_counter()
+            delay = (self._pos + size) / self._bytes_per_sec - (time.perf_counter() - self._start)
+            if delay > 0:
+                time.sleep(delay)
+        data = self._data[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    @property
+    def read_available(self) -> int:
+        if self.eof:
+            # listen2 и listen3 ждут данных, read() должен отдать им конец записи
+            return 1
+        remaining = len(self._data) - self._pos
+        if self._realtime and self._start is not None:
+            arrived = int((time.perf_counter() - self._start) * self._bytes_per_sec) - self._pos
+            remaining = max(0, min(remaining, arrived))
+        return remaining // self._width
+
+    @property
+    def consumed(self) -> int:
+        return self._pos // self._width
+
+    @property
+    def eof(self) -> bool:
+        return self._pos >= len(self._data)
+
+    def deactivate(self):
+        pass
+
+    @staticmethod
+    def reactivate(chunks):
+        return chunks
+
+    def close(self):
+        pass
+
+
+class ReplaySource(sr.AudioSource):
+    def __init__(self, data: bytes, chunk=1024, rate=RATE, realtime=False):
+        self.SAMPLE_RATE = rate
+        self.SAMPLE_WIDTH = WIDTH
+        self.CHUNK = chunk
+        self.stream = ReplayStream(data, rate, WIDTH, realtime)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class BenchStreamDetector(StreamDetector):
+    def __init__(self, width, rate, another):
+        super().__init__(width=width, rate=rate, resample_rate=rate, rms=False, another=another)
+        self._energy = 0
+
+    def new_chunk(self, buffer: bytes, is_speech=False):
+        self._energy = audioop.rms(buffer, self._width)
+
+    def end(self):
+        self.processing = False
+        self.is_ok = True
+        self.text = str(self._energy)
+
+    def die(self):
+        pass
+
+
+def energy_vad(source, lvl=0):
+    # lvl=32767 - VAD никогда не сработает, удобно для замера холостого цикла
+    return sr.EnergyDetectorVAD(source, WIDTH, RATE, energy_lvl=lvl, energy_dynamic=not lvl, rms=False)
+
+
+def webrtc_vad(*_):
+    return WebRTCVAD(width=WIDTH, rate=RATE, lvl=3, rms=False)
+
+
+def apm_vad(*_):
+    return APMVAD(width=WIDTH, rate=RATE, lvl=3, rms=False)
+
+
+def get_vads() -> dict:
+    vads = {'energy': energy_vad}
+    if ModuleLoader().is_loaded('webrtc'):
+        vads['webrtc'] = webrtc_vad
+    if ModuleLoader().is_loaded('apm'):
+        vads['apm'] = apm_vad
+    return vads
+
+
+def _drain(source, call):
+    # Гоняем этап до конца записи, результат и таймауты не важны
+    while not source.stream.eof:
+        try:
+            call()
+        except (sr.WaitTimeoutError, RuntimeError):
+            pass
+    return source.stream.consumed
+
+
+def bench_vad(vad_maker):
+    def bench(source):
+        vad = vad_maker(source)
+        stream = source.stream
+        while True:
+            buffer = stream.read(source.CHUNK)
+            if not buffer:
+                break
+            vad.is_speech(buffer)
+            vad.dynamic_energy()
+        return stream.consumed
+    return bench
+
+
+def bench_wait_detection(vad_maker, idle):
+    def bench(source):
+        vad = energy_vad(source, 32767) if idle else vad_maker(source)
+        hwd = EmptyHWD(width=WIDTH, rate=RATE, another=vad, rms=False)
+
+        def call():
+            hwd._current_state = -2
+            sr.wait_detection(source, hwd, lambda: False, lambda: False)
+        return _drain(source, call)
+    return bench
+
+
+def bench_listen1(vad_maker):
+    def bench(source):
+        vad, r = vad_maker(source), sr.Recognizer()
+        return _drain(source, lambda: r.listen1(source, vad, timeout=5))
+    return bench
+
+
+def bench_listen2(vad_maker):
+    def recognition(adata, *_):
+        while adata.read():
+            pass
+        return 'ok'
+
+    def bench(source):
+        vad, r = vad_maker(source), sr.Recognizer()
+        return _drain(source, lambda: r.listen2(source, vad, recognition, timeout=5).text)
+    return bench
+
+
+def bench_listen3(vad_maker):
+    def bench(source):
+        vad, r = vad_maker(source), sr.Recognizer()
+        return _drain(source, lambda: r.listen3(source, BenchStreamDetector(WIDTH, RATE, vad), None))
+    return bench
+
+
+def bench_converter(ext):
+    def bench(source):
+        data = source.stream.read(source.stream.read_available)
+        with AudioConverter(sr.AudioData(data, RATE, WIDTH), ext) as converter:
+            while converter.read():
+                pass
+        return source.stream.consumed
+    return bench
+
+
+def bench_porcupine_frame(buffered: bool):
+    # Только подготовка кадра для pv_porcupine_process, сама библиотека не нужна
+    def unpack(pcm: bytes):
+        samples = struct.unpack('H' * (len(pcm) // 2), pcm)
+        return (ctypes.c_short * len(samples))(*samples)
+
+    def bench(source):
+        convert = ShortFrame(PORCUPINE_FRAME) if buffered else unpack
+        size = PORCUPINE_FRAME * WIDTH
+        data = source.stream.read(source.stream.read_available)
+        for offset in range(0, len(data) - size + 1, size):
+            convert(data[offset:offset + size])
+        return source.stream.consumed
+    return bench
+
+
+def get_benchmarks(only: list) -> list:
+    result = []
+    for name, vad_maker in get_vads().items():
+        result.extend([
+            ('vad.{}'.format(name), bench_vad(vad_maker)),
+            ('wait_detection.{}'.format(name), bench_wait_detection(vad_maker, False)),
+            ('listen1.{}'.format(name), bench_listen1(vad_maker)),
+            ('listen2.{}'.format(name), bench_listen2(vad_maker)),
+            ('listen3.{}'.format(name), bench_listen3(vad_maker)),
+        ])
+    result.append(('wait_detection.idle', bench_wait_detection(None, True)))
+    for ext in ['pcm', 'wav'] + [key for key, val in CMD.items() if val[0] and shutil.which(val[0])]:
+        result.append(('converter.{}'.format(ext), bench_converter(ext)))
+    result.append(('porcupine_frame.unpack', bench_porcupine_frame(False)))
+    result.append(('porcupine_frame.buffer', bench_porcupine_frame(True)))
+    if only:
+        result = [x for x in result if any(key in x[0] for key in only)]
+    return result
+
+
+def cpu_time() -> float:
+    # Учитываем и время кодировщиков, запущенных через subprocess
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+
+def measure(bench, data: bytes, chunk: int, repeat: int) -> dict:
+    audio_sec = len(data) / (RATE * WIDTH)
+    wall, cpu, frames = None, None, 0
+    for _ in range(repeat):
+        source = ReplaySource(data, chunk)
+        wall_start, cpu_start = time.perf_counter(), cpu_time()
+        frames = bench(source)
+        wall_spent, cpu_spent = time.perf_counter() - wall_start, cpu_time() - cpu_start
+        wall = wall_spent if wall is None else min(wall, wall_spent)
+        cpu = cpu_spent if cpu is None else min(cpu, cpu_spent)
+
+    # Отдельный прогон, tracemalloc сильно замедляет выполнение
+    source = ReplaySource(data, chunk)
+    tracemalloc.start()
+    try:
+        bench(source)
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    wall = wall or 1e-9
+    return {
+        'chunk': chunk,
+        'chunks_per_sec': round(frames / chunk / wall, 1),
+        'realtime': round(audio_sec / wall, 1),
+        'cpu_ms_per_audio_sec': round(cpu * 1000 / audio_sec, 3),
+        'peak_kib': round(peak / 1024, 1),
+        'retained_blocks': blocks,
+    }
+
+
+def print_table(results: list):
+    head = ('benchmark', 'chunk', 'chunks/s', 'x realtime', 'CPU ms/s', 'peak KiB', 'blocks')
+    line = '{:<24} {:>6} {:>10} {:>11} {:>9} {:>9} {:>7}'
+    print(line.format(*head))
+    print('-' * 82)
+    for name, val in results:
+        print(line.format(
+            name, val['chunk'], val['chunks_per_sec'], val['realtime'], val['cpu_ms_per_audio_sec'],
+            val['peak_kib'], val['retained_blocks'],
+        ))
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """Имитирует HTTP API google, yandex, vosk-rest, pocketsphinx-rest и rhvoice-rest."""
+    daemon_threads = True
+
+    def __init__(self, latency: float, throughput: int, text: str):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.latency = latency
+        self.throughput = throughput
+        self.text = text
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(*self.server_address)
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    TTS_SIZE = 1024 * 24
+
+    def log_message(self, *_):
+        pass
+
+    def _read_body(self):
+        # requests отправляет генератор через chunked transfer encoding
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = bytearray()
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+            if not size:
+                self.rfile.readline()
+                return body
+            body.extend(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _reply(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self._read_body()
+        time.sleep(self.server.latency)
+        text = self.server.text
+        path = self.path.split('?', 1)[0]
+        if path.endswith('/speech-api/v2/recognize'):
+            reply = {'result': [{'alternative': [{'transcript': text, 'confidence': 0.9}]}], 'result_index': 0}
+            body = '{"result":[]}\n' + json.dumps(reply) + '\n'
+            self._reply(body.encode(), 'application/json; charset=utf-8')
+        elif path.endswith('/asr_xml'):
+            body = '<?xml version="1.0" encoding="utf-8"?>\n<recognitionResults success="1">\n' \
+                   '<variant confidence="1">{}</variant>\n</recognitionResults>\n'.format(text)
+            self._reply(body.encode(), 'text/xml; charset=utf-8')
+        elif path.endswith('/stt'):
+            self._reply(json.dumps({'code': 0, 'text': text}).encode(), 'application/json; charset=utf-8')
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/say', '/generate'):
+            return self.send_error(404)
+        time.sleep(self.server.latency)
+        chunk = 1024
+        delay = chunk / (self.server.throughput * 1024)
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(self.TTS_SIZE))
+        self.end_headers()
+        for _ in range(self.TTS_SIZE // chunk):
+            self.wfile.write(b'\xff' * chunk)
+            self.wfile.flush()
+            time.sleep(delay)
+
+
+class VoskStandIn(threading.Thread):
+    """Имитирует websocket API vosk-server."""
+    def __init__(self, latency: float, text: str):
+        super().__init__(daemon=True)
+        self._latency = latency
+        self._text = text
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(5)
+        self.start()
+
+    @property
+    def url(self) -> str:
+        return 'ws://{}:{}'.format(*self._sock.getsockname())
+
+    def run(self):
+        while True:
+            conn, _ = self._sock.accept()
+            threading.Thread(target=self._session, args=(conn,), daemon=True).start()
+
+    def _session(self, conn):
+        ws = WSServerAdapter(conn)
+        try:
+            while True:
+                _, data = ws.recv_data()
+                if b'"eof"' in data:
+                    break
+                # Как и vosk-server, отвечаем гипотезой на каждый кусок аудио
+                if not data.startswith(b'{'):
+                    ws.send(json.dumps({'partial': self._text[:len(self._text) // 2]}))
+            time.sleep(self._latency)
+            ws.send(json.dumps({'text': self._text}))
+        finally:
+            ws.close()
+
+
+class E2EConfig(dict):
+    """Минимальная замена ConfigHandler для SpeechToText и TextToSpeech."""
+    def __init__(self, home: str, stt: str, tts: str, stream: bool, optimistic: bool, cache: bool, urls: dict,
+                 mic=''):
+        super().__init__()
+        self['settings'] = {
+            'providerstt': stt, 'providertts': tts, 'optimistic_nonblock_tts': optimistic, 'say_stt_error': False,
+            'virtual_mic': mic, 'virtual_mic_pacing': 'fast',
+        }
+        self['listener'] = {'stream_recognition': stream}
+        self['cache'] = {'tts_size': 100 if cache else 0, 'path': home, 'tts_priority': '', 'stt_ttl': 0}
+        self['yandex'] = {
+            'api': 1, 'apikeystt': 'benchmark', 'apikeytts': 'benchmark', 'speaker': 'alyss', 'emotion': 'good',
+            'speed': 1.0,
+        }
+        for key in ('vosk-rest', 'pocketsphinx-rest', 'rhvoice-rest'):
+            self[key] = {'server': urls.get(key, '')}
+        self.path = {'tts_error': os.path.join(home, 'error.wav'), 'data': home}
+        self.tts_index = TTSCacheIndex(self)
+
+    def gt(self, sec, key, default=None):
+        return self.get(sec, {}).get(key, default)
+
+    def gts(self, key, default=None):
+        return self['settings'].get(key, default)
+
+    def get_uint(self, key: str, default=0) -> int:
+        return int(self.gts(key, default))
+
+    def key(self, prov, api_key):
+        return self.gt(prov, api_key)
+
+    def yandex_api(self, prov):
+        return self.gt(prov, 'api', 1) if prov == 'yandex' else 1
+
+    @staticmethod
+    def stt_lang(_):
+        return 'ru-RU'
+
+    @staticmethod
+    def tts_lang(_):
+        return 'ru-RU'
+
+    @staticmethod
+    def language_name():
+        return 'ru'
+
+    @staticmethod
+    def load_dict(*_, **__):
+        return None
+
+    @staticmethod
+    def save_dict(*_, **__):
+        return True
+
+
+class E2EOwner:
+    # Только то, что SpeechToText дергает в voice_recognition
+    @staticmethod
+    def registration(_):
+        return lambda *_, **__: None
+
+    @staticmethod
+    def is_stt_provider(name):
+        import lib.STT as STT
+        return STT.support(name)
+
+    def speech_recognized(self, _):
+        pass
+
+    def speech_partial_callback(self, _):
+        pass
+
+    @staticmethod
+    def modules_prematch(_):
+        return False
+
+    def say(self, *_, **__):
+        pass
+
+
+def stand_in_urls(server: StandInServer, vosk: VoskStandIn) -> dict:
+    import lib.STT as STT
+    import lib.TTS as TTS
+    STT.Google.URL = server.url + '/speech-api/v2/recognize'
+    STT.Yandex.URL = server.url + '/asr_xml'
+    TTS.Yandex.URL = server.url + '/generate'
+    return {
+        'vosk-rest': server.url, 'vosk-ws': vosk.url, 'pocketsphinx-rest': server.url, 'rhvoice-rest': server.url
+    }
+
+
+def e2e_stt(args, data: bytes, urls: dict, text: str, home: str) -> list:
+    import stts
+    log = (lambda *x: print(*x)) if args.verbose else (lambda *_: None)
+    results = []
+    # Виртуальный микрофон, чтобы SpeechToText не искал настоящий через pyaudio
+    mic = os.path.join(home, 'mic.wav')
+    with wave.open(mic, 'wb') as fp:
+        fp.setnchannels(1)
+        fp.setsampwidth(WIDTH)
+        fp.setframerate(RATE)
+        fp.writeframes(data)
+    for provider in args.stt:
+        urls_ = dict(urls, **{'vosk-rest': urls['vosk-ws']}) if provider == 'vosk-ws' else urls
+        for stream in (False, True):
+            cfg = E2EConfig(home, provider.replace('vosk-ws', 'vosk-rest'), '', stream, True, False, urls_, mic)
+            stt = stts.SpeechToText(cfg, log, E2EOwner())
+            wake, tail, errors = [], [], 0
+            for _ in range(args.repeat):
+                source, r = ReplaySource(data, realtime=True), sr.Recognizer()
+                vad = energy_vad(source)
+                start = time.perf_counter()
+                try:
+                    if stream:
+                        audio = r.listen2(source, vad, stt.voice_recognition, 5)
+                    else:
+                        audio = r.listen1(source, vad, 5)
+                except (sr.WaitTimeoutError, RuntimeError):
+                    errors += 1
+                    continue
+                recorded = time.perf_counter()
+                result = stt.voice_recognition(audio)
+                done = time.perf_counter()
+                if result != text:
+                    errors += 1
+                    continue
+                wake.append(done - start)
+                tail.append(done - recorded)
+            results.append(('{}{}'.format(provider, ' stream' if stream else ''), _ms(wake), _ms(tail), errors))
+    return results
+
+
+def e2e_tts(args, home: str, urls: dict) -> list:
+    import stts
+    log = (lambda *x: print(*x)) if args.verbose else (lambda *_: None)
+    results = []
+    for provider in args.tts:
+        for cache in (False, True):
+            for optimistic in (False, True):
+                tts = stts.TextToSpeech(E2EConfig(home, '', provider, False, optimistic, cache, urls), log)
+                for state in ('cold', 'warm') if cache else ('',):
+                    call, first, errors, underruns = [], [], 0, 0
+                    for idx in range(args.repeat):
+                        msg = 'benchmark {} {} {}'.format(provider, optimistic, idx)
+                        start = time.perf_counter()
+                        get = tts.tts(msg)
+                        called = time.perf_counter()
+                        file_path, stream, _ = get()
+                        try:
+                            if stream:
+                                chunk = stream.read()
+                            else:
+                                with open(file_path, 'rb') as fp:
+                                    chunk = fp.read(1024)
+                        except OSError:
+                            chunk = None
+                        got = time.perf_counter()
+                        while stream and stream.read():
+                            pass
+                        underruns += stream.stats['underruns'] if stream else 0
+                        if not chunk:
+                            errors += 1
+                            continue
+                        call.append(called - start)
+                        first.append(got - start)
+                    _wait_tts_workers()
+                    name = '{} {}cache{} {}'.format(
+                        provider, '' if cache else 'no ', ' ' + state if state else '',
+                        'optimistic' if optimistic else 'blocking'
+                    )
+                    results.append((name, _ms(call), _ms(first), errors, underruns))
+    return results
+
+
+def _wait_tts_workers():
+    for thread in threading.enumerate():
+        if thread.name == 'TTSWorker':
+            thread.join()
+
+
+def _ms(values: list) -> str:
+    return '{:.1f}'.format(statistics.median(values) * 1000) if values else '-'
+
+
+def e2e(args, data: bytes):
+    text = 'включи свет на кухне'
+    server = StandInServer(args.latency / 1000, args.throughput, text)
+    vosk = VoskStandIn(args.latency / 1000, text)
+    urls = stand_in_urls(server, vosk)
+    print('Stand-in latency: {} ms, TTS throughput: {} KiB/s{}'.format(args.latency, args.throughput, LF))
+    line = '{:<40} {:>12} {:>14} {:>7}'
+    report = {}
+    with tempfile.TemporaryDirectory() as home:
+        stt_results = e2e_stt(args, data, urls, text, home) if args.stt else []
+        if stt_results:
+            print(line.format('STT (median)', 'wake->text', 'speech end->text', 'errors'))
+            print('-' * 78)
+            for val in stt_results:
+                print(line.format(*val))
+            print()
+        tts_results = e2e_tts(args, home, urls) if args.tts else []
+        if tts_results:
+            tts_line = line + ' {:>9}'
+            print(tts_line.format('TTS (median)', 'tts() call', 'first byte', 'errors', 'underruns'))
+            print('-' * 88)
+            for val in tts_results:
+                print(tts_line.format(*val))
+            print()
+    report['stt'] = [dict(zip(('name', 'wake_to_text_ms', 'tail_ms', 'errors'), x)) for x in stt_results]
+    report['tts'] = [dict(zip(('name', 'call_ms', 'first_byte_ms', 'errors', 'underruns'), x)) for x in tts_results]
+    return report
+
+
+def cli():
+    parser = argparse.ArgumentParser(
+        description='Replay recorded audio through VAD, hotword and recording loops and measure them'
+    )
+    parser.add_argument('mode', nargs='?', default='audio', choices=('audio', 'e2e'),
+                        help='audio - DSP and detectors, e2e - latency with local STT/TTS stand-ins')
+    parser.add_argument('--wav', nargs='*', default=[], metavar='[file]',
+                        help='Recorded fixtures (any wav), otherwise synthetic audio will be used')
+    parser.add_argument('--chunk', nargs='*', type=int, default=[1024], metavar='[samples]',
+                        help='Capture chunk sizes to compare (default: 1024)')
+    parser.add_argument('--repeat', type=int, default=3, metavar='[N]', help='Timing runs, best is used')
+    parser.add_argument('--only', nargs='*', default=[], metavar='[name]', help='Run benchmarks matching names')
+    parser.add_argument('--json', default='', metavar='[file]', help='Also save results as json')
+    parser.add_argument('--latency', type=int, default=150, metavar='[ms]', help='e2e: stand-ins reply latency')
+    parser.add_argument('--throughput', type=int, default=64, metavar='[KiB/s]', help='e2e: TTS stand-in speed')
+    parser.add_argument('--stt', nargs='*', metavar='[provider]',
+                        default=['google', 'yandex', 'vosk-rest', 'vosk-ws', 'pocketsphinx-rest'],
+                        help='e2e: STT providers')
+    parser.add_argument('--tts', nargs='*', default=['rhvoice-rest', 'yandex'], metavar='[provider]',
+                        help='e2e: TTS providers')
+    parser.add_argument('--verbose', action='store_true', help='e2e: print terminal logs')
+    return parser.parse_args()
+
+
+def main():
+    args = cli()
+    seconds = 3.0 if args.mode == 'e2e' else 6.0
+    fixtures = [(os.path.basename(x), load_fixture(x)) for x in args.wav]
+    fixtures = fixtures or [('synthetic', synthetic_fixture(seconds))]
+    errors = ModuleLoader().extract_errors()
+    if errors:
+        print(LF.join(errors), end=LF * 2)
+    report = {}
+    if args.mode == 'e2e':
+        fixture, data = fixtures[0]
+        print('Fixture: {}, {:.2f} sec'.format(fixture, len(data) / (RATE * WIDTH)))
+        report[fixture] = e2e(args, data)
+        fixtures = []
+    for fixture, data in fixtures:
+        print('Fixture: {}, {:.2f} sec'.format(fixture, len(data) / (RATE * WIDTH)))
+        results = []
+        for chunk in args.chunk:
+            for name, bench in get_benchmarks(args.only):
+                results.append((name, measure(bench, data, chunk, max(1, args.repeat))))
+        print_table(results)
+        print()
+        report[fixture] = [dict(name=name, **val) for name, val in results]
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(report, fp, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from collections import defaultdict
+
+import websocket
+
+ERRORS = (BrokenPipeError, ConnectionResetError, ConnectionRefusedError, OSError, websocket.WebSocketException)
+CRLF = b'\r\n'
+EVENTS = ['talking', 'record', 'stt_event', 'volume', 'music_volume', 'listener', 'speech_recognized_success']
+
+
+def arg_parser():
+    parser = argparse.ArgumentParser(description='Load generator for mdmTerminal2 API server')
+    parser.add_argument('-i', '--ip', default='127.0.0.1', help='Terminal IP (127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=7999, help='Terminal API port (7999)')
+    parser.add_argument('-t', '--token', default='', help='[smarthome] token, if set')
+    parser.add_argument('--ws-token', default='token_is_unset', help='[system] ws_token ("token_is_unset")')
+    parser.add_argument('-c', '--clients', type=int, default=8, help='Concurrent request/response clients (8)')
+    parser.add_argument('-d', '--duplex', type=int, default=2, help='Concurrent duplex clients (2)')
+    parser.add_argument('--ws', type=float, default=0.5, help='Part of clients using websocket, 0..1 (0.5)')
+    parser.add_argument('--calls', type=int, default=10, help='Calls per connection for simple clients (10)')
+    parser.add_argument('--batch', type=float, default=0.2, help='Part of calls sent as batch, 0..1 (0.2)')
+    parser.add_argument('--rate', type=float, default=0, help='Calls per second for each client, 0 - unlimited')
+    parser.add_argument('--duration', type=float, default=30, help='Test duration in seconds (30)')
+    parser.add_argument('--timeout', type=float, default=10, help='Socket timeout in seconds (10)')
+    parser.add_argument('--pid', type=int, default=0, help='Terminal PID for thread and memory growth (local only)')
+    parser.add_argument('--settle', type=float, default=5, help='Wait after test before last PID sample (5)')
+    parser.add_argument('--json', default='', help='Also save results as json')
+    return parser.parse_args()
+
+
+def percentile(values: list, percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.notifications = 0
+        self.connections = 0
+
+    def call(self, method: str, latency: float):
+        with self._lock:
+            self.latency[method].append(latency)
+
+    def error(self, kind: str):
+        with self._lock:
+            self.errors[kind] += 1
+
+    def notify(self):
+        with self._lock:
+            self.notifications += 1
+
+    def connect(self):
+        with self._lock:
+            self.connections += 1
+
+
+class ProcStat:
+    def __init__(self, pid: int):
+        self._pid = pid
+        self.samples = []
+
+    def sample(self):
+        if not self._pid:
+            return
+        result = {'time': time.time()}
+        try:
+            with open('/proc/{}/status'.format(self._pid)) as fp:
+                for line in fp:
+                    key, value = line.split(':', 1)
+                    if key == 'Threads':
+                        result['threads'] = int(value)
+                    elif key == 'VmRSS':
+                        result['rss_kib'] = int(value.split()[0])
+        except (OSError, ValueError):
+            return
+        self.samples.append(result)
+
+    def report(self) -> dict:
+        if not self.samples:
+            return {}
+        first, last = self.samples[0], self.samples[-1]
+        result = {}
+        for key in ('threads', 'rss_kib'):
+            values = [x[key] for x in self.samples if key in x]
+            if values:
+                result[key] = {'start': first.get(key), 'max': max(values), 'end': last.get(key)}
+        return result
+
+
+class Transport:
+    def __init__(self, ip, port, timeout):
+        self.sock = socket.create_connection((ip, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self.sock.makefile('rb')
+
+    def send(self, data):
+        self.sock.sendall(json.dumps(data, ensure_ascii=False).encode() + CRLF)
+
+    def recv(self):
+        line = self._file.readline().rstrip(CRLF)
+        if not line:
+            # Сервер завершает сеанс отправкой \r\n
+            raise ConnectionResetError('Connection closed')
+        return json.loads(line)
+
+    def close(self):
+        try:
+            self.sock.sendall(CRLF * 2)
+        except ERRORS:
+            pass
+        try:
+            self._file.close()
+            self.sock.close()
+        except ERRORS:
+            pass
+
+
+class WSTransport:
+    def __init__(self, ip, port, timeout, ws_token):
+        self.ws = websocket.create_connection('ws://{}:{}/'.format(ip, port), timeout=timeout)
+        self.ws.send(ws_token)
+
+    def send(self, data):
+        self.ws.send(json.dumps(data, ensure_ascii=False))
+
+    def recv(self):
+        data = self.ws.recv()
+        if not data:
+            raise ConnectionResetError('Connection closed')
+        if isinstance(data, bytes):
+            data = data.decode()
+        try:
+            return json.loads(data)
+        except ValueError:
+            # Например 'Terminal rejected connection (incorrect ws_token?). BYE!'
+            raise ConnectionResetError(data)
+
+    def close(self):
+        try:
+            self.ws.close(timeout=0.5)
+        except ERRORS:
+            pass
+
+
+class Client(threading.Thread):
+    def __init__(self, args, stats: Stats, ws: bool, deadline: float):
+        super().__init__(daemon=True)
+        self.args, self.stats, self.ws, self.deadline = args, stats, ws, deadline
+        self._count = 0
+        self._transport = None
+
+    @property
+    def proto(self):
+        return 'ws' if self.ws else 'tcp'
+
+    def _new_id(self) -> str:
+        self._count += 1
+        return '{}-{}'.format(self.name, self._count)
+
+    def _connect(self):
+        if self.ws:
+            self._transport = WSTransport(self.args.ip, self.args.port, self.args.timeout, self.args.ws_token)
+        else:
+            self._transport = Transport(self.args.ip, self.args.port, self.args.timeout)
+        self.stats.connect()
+
+    def _close(self):
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+
+    def _message(self, method: str, params=None) -> dict:
+        msg = {'method': method, 'id': self._new_id()}
+        if params is not None:
+            msg['params'] = params
+        return msg
+
+    def _authorization(self):
+        # Без токена на терминале подойдет любой хеш, но авторизоваться все равно нужно
+        return self._message('authorization', [hashlib.sha512(self.args.token.encode()).hexdigest()])
+
+    def _random_call(self) -> dict:
+        return random.choice((
+            lambda: self._message('ping', [str(time.time())]),
+            lambda: self._message('info', ['']),
+            lambda: self._message('info', ['ping']),
+            lambda: self._message('get', ['volume', 'listener']),
+        ))()
+
+    def _pause(self):
+        if self.args.rate > 0:
+            time.sleep(1 / self.args.rate)
+
+    def _check(self, reply, ids: dict, start: float, name: str) -> bool:
+        if not isinstance(reply, dict) or reply.get('id') not in ids:
+            return False
+        method = ids.pop(reply['id'])
+        if 'error' in reply:
+            self.stats.error('{}:rpc:{}'.format(self.proto, method))
+        else:
+            self.stats.call('{}{}'.format(method, name), time.time() - start)
+        return True
+
+
+class SimpleClient(Client):
+    """Контроллер: подключился, авторизовался, сделал несколько вызовов, отключился."""
+    def run(self):
+        while time.time() < self.deadline:
+            try:
+                self._connect()
+                self._call([self._authorization()])
+                for _ in range(self.args.calls):
+                    if time.time() >= self.deadline:
+                        break
+                    if random.random() < self.args.batch:
+                        self._call([self._random_call() for _ in range(random.randint(2, 5))], batch=True)
+                    else:
+                        self._call([self._random_call()])
+                    self._pause()
+            except socket.timeout:
+                self.stats.error('{}:timeout'.format(self.proto))
+            except ERRORS as e:
+                self.stats.error('{}:{}'.format(self.proto, type(e).__name__))
+                time.sleep(0.1)
+            except ValueError:
+                self.stats.error('{}:bad_reply'.format(self.proto))
+            finally:
+                self._close()
+
+    def _call(self, messages: list, batch=False):
+        ids = {msg['id']: msg['method'] for msg in messages}
+        start = time.time()
+        self._transport.send(messages if batch else messages[0])
+        while ids:
+            reply = self._transport.recv()
+            for item in (reply if isinstance(reply, list) else [reply]):
+                if not self._check(item, ids, start, '[batch]' if batch else ''):
+                    self.stats.error('{}:unexpected'.format(self.proto))
+
+
+class DuplexClient(Client):
+    """Дашборд: одно постоянное подключение в duplex mode с подпиской на события."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def run(self):
+        while time.time() < self.deadline:
+            try:
+                self._session()
+            except socket.timeout:
+                self.stats.error('duplex-{}:timeout'.format(self.proto))
+            except ERRORS as e:
+                self.stats.error('duplex-{}:{}'.format(self.proto, type(e).__name__))
+                time.sleep(0.5)
+            except ValueError:
+                self.stats.error('duplex-{}:bad_reply'.format(self.proto))
+            finally:
+                self._close()
+
+    def _session(self):
+        self._connect()
+        for msg in (self._authorization(), self._message('upgrade duplex')):
+            self._send(msg)
+            while self._ids:
+                self._receive(self._transport.recv())
+        reader = threading.Thread(target=self._reader, daemon=True)
+        reader.start()
+        self._send(self._message('subscribe', EVENTS))
+        while time.time() < self.deadline and reader.is_alive():
+            self._send(self._message('ping', [str(time.time())]))
+            time.sleep(1 / self.args.rate if self.args.rate > 0 else 0.5)
+        self._close()
+        reader.join()
+
+    def _send(self, msg: dict):
+        with self._lock:
+            self._ids[msg['id']] = (msg['method'], time.time())
+        self._transport.send(msg)
+
+    def _reader(self):
+        try:
+            while self._transport:
+                self._receive(self._transport.recv())
+        except ERRORS + (ValueError, AttributeError):
+            if self._transport and time.time() < self.deadline:
+                # Например, терминал вытеснил подключение из пула (pool_size)
+                self.stats.error('duplex-{}:disconnect'.format(self.proto))
+
+    def _receive(self, reply):
+        if isinstance(reply, dict) and str(reply.get('method', '')).startswith('notify.'):
+            return self.stats.notify()
+        if isinstance(reply, dict) and reply.get('id') == 'pong' and reply.get('method') == 'ping':
+            # Приветствие сервера после upgrade duplex без id
+            return
+        with self._lock:
+            item = self._ids.pop(reply.get('id'), None) if isinstance(reply, dict) else None
+        if item is None:
+            return self.stats.error('duplex-{}:unexpected'.format(self.proto))
+        if 'error' in reply:
+            self.stats.error('duplex-{}:rpc:{}'.format(self.proto, item[0]))
+        else:
+            self.stats.call('{}[duplex]'.format(item[0]), time.time() - item[1])
+
+
+def print_report(result: dict):
+    print()
+    print('Duration: {duration:.1f} s, connections: {connections}, calls: {calls}, '
+          'throughput: {throughput:.1f} calls/s, notifications: {notifications}'.format(**result))
+    print()
+    line = '{:<26} {:>7} {:>9} {:>9} {:>9} {:>9}'
+    print(line.format('method', 'calls', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+    print('-' * 74)
+    for method, val in sorted(result['latency'].items()):
+        print(line.format(method, val['calls'], val['p50'], val['p90'], val['p99'], val['max']))
+    print()
+    print('Errors: {} ({:.2f}%)'.format(result['errors_total'], result['error_rate'] * 100))
+    for kind, count in sorted(result['errors'].items()):
+        print('  {:<30} {}'.format(kind, count))
+    if result['terminal']:
+        print()
+        for key, val in result['terminal'].items():
+            print('Terminal {}: start {start}, max {max}, end {end}'.format(key, **val))
+
+
+def main():
+    args = arg_parser()
+    stats, proc = Stats(), ProcStat(args.pid)
+    proc.sample()
+    start = time.time()
+    deadline = start + args.duration
+
+    def is_ws(idx, count):
+        return idx < round(count * min(1.0, max(0.0, args.ws)))
+
+    clients = [SimpleClient(args, stats, is_ws(idx, args.clients), deadline) for idx in range(args.clients)]
+    clients += [DuplexClient(args, stats, is_ws(idx, args.duplex), deadline) for idx in range(args.duplex)]
+    print('Start {} clients and {} duplex clients on {}:{} for {} s'.format(
+        args.clients, args.duplex, args.ip, args.port, args.duration))
+    for client in clients:
+        client.start()
+    while any(client.is_alive() for client in clients) and time.time() < deadline + args.timeout * 2:
+        proc.sample()
+        time.sleep(1)
+    duration = time.time() - start
+    if args.pid:
+        time.sleep(args.settle)
+        proc.sample()
+
+    calls = sum(len(x) for x in stats.latency.values())
+    errors = sum(stats.errors.values())
+    result = {
+        'duration': duration,
+        'connections': stats.connections,
+        'calls': calls,
+        'throughput': calls / duration,
+        'notifications': stats.notifications,
+        'latency': {
+            method: {
+                'calls': len(values),
+                **{key: round(percentile(values, pct) * 1000, 1) for key, pct in
+                   (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+            } for method, values in stats.latency.items()
+        },
+        'errors': dict(stats.errors),
+        'errors_total': errors,
+        'error_rate': errors / (calls + errors) if calls + errors else 0,
+        'terminal': proc.report(),
+    }
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(result, fp, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -419,6 +419,10 @@ class TestShell(cmd__.Cmd):
     def do_test_list(self, _):
         self._send_true_json('test.list', data={})
 
+    def do_job_cancel(self, _):
+        """Отменить фоновую компиляцию модели или test_test"""
+        self._send_json('job.cancel')
+
     def do_info(self, arg):
         """Информация о команде"""
         self._send_json('info', data=arg)
@@ -16,6 +16,7 @@ from lib.ip_storage import make_interface_storage
 from lib.keys_utils import Keystore
 from lib.map_settings.wiki_parser import WikiParser
 from lib.models_storage import ModelsStorage
+from lib.tts_cache_index import TTSCacheIndex
 from lib.proxy import proxies
 from lib.state_helper import state_helper
 from lib.tools.config_updater import ConfigUpdater
@@ -53,6 +54,7 @@ class ConfigHandler(utils.HashableDict):
         self.platform = platform.system().capitalize()
         self.detector = None
         self.models = ModelsStorage()
+        self.tts_index = TTSCacheIndex(self)
         self._save_me_later = False
         self._allow_addresses = []
         self.update(cfg)
@@ -450,7 +452,8 @@ class ConfigHandler(utils.HashableDict):
             pfile = os.path.join(cache_path, file)
             if os.path.isfile(pfile):
                 fsize = os.path.getsize(pfile)
-                if fsize > min_file_size:
+                # .part - недописанный файл после сбоя
+                if fsize > min_file_size and not file.endswith('.part'):
                     current_size += fsize
                     files.append([pfile, fsize])
                 else:
@@ -468,6 +471,7 @@ class ConfigHandler(utils.HashableDict):
         self.log(say, logger.INFO)
 
         if normal_size:
+            self._tts_index_sync([file[0] for file in files])
             return
         self.own.say_info(say)
 
@@ -484,10 +488,16 @@ class ConfigHandler(utils.HashableDict):
             deleted_files += 1
             deleted.append(os.path.split(file[0])[1])
         self.log(F('Удалено: {}', ', '.join(deleted)))
+        self._tts_index_sync([file[0] for file in files if os.path.isfile(file[0])])
         msg = F('Удалено {} файлов. Новый размер TTS кэша {}', deleted_files, utils.pretty_size(current_size))
         self.log(msg, logger.INFO)
         self.own.say_info(msg)
 
+    def _tts_index_sync(self, paths: list):
+        # Записи только для существующих файлов, кэш без записей (до индекса) принимаем
+        self.tts_index.prune([os.path.basename(path) for path in paths])
+        self.tts_index.adopt(paths)
+
     def _make_dir(self, path: str):
         if not os.path.isdir(path):
             self.log(F('Директория {} не найдена. Создаю...', path), logger.INFO)
@@ -2,6 +2,10 @@ CFG = {  # Дефолтные настройки https://github.com/Aculeasis/md
     'settings': {
         'providertts'     : 'google',
         'providerstt'     : 'google',
+        'providerstt_race': '',
+        'stt_race_policy' : 'first',
+        'providerstt_backup': '',
+        'stt_selection'   : 'static',
         'ip'              : '',
         'sensitivity'     : 0.45,
         'alarmkwactivated': True,
@@ -11,7 +15,10 @@ CFG = {  # Дефолтные настройки https://github.com/Aculeasis/md
         'first_love'      : True,
         'last_love'       : False,
         'mic_index'   : -1,
+        'virtual_mic': '',
+        'virtual_mic_pacing': 'realtime',
         'optimistic_nonblock_tts': True,
+        'tts_preroll': '',
         'ask_me_again': 0,
         'quiet': False,
         'no_hello': False,
@@ -31,6 +38,11 @@ CFG = {  # Дефолтные настройки https://github.com/Aculeasis/md
     'listener': {
         'detector': '',
         'stream_recognition': True,
+        'early_dispatch': False,
+        'detector_process': False,
+        'endpointer': False,
+        'chunk_size': 0,
+        'barge_in': False,
         'vad_mode': 'snowboy',
         'vad_chrome': '',
         'vad_lvl': 0,
@@ -51,6 +63,8 @@ CFG = {  # Дефолтные настройки https://github.com/Aculeasis/md
         'object_method': '',
         'heartbeat_timeout': 0,
         'pool_size': 1,
+        'satellites': 0,
+        'satellite_hub': False,
         'allow_addresses': '',
         'disable_http': False,
         'disable_server': False,
@@ -120,10 +134,13 @@ CFG = {  # Дефолтные настройки https://github.com/Aculeasis/md
     'cache': {
         'tts_priority': '',
         'tts_size': 100,
+        'stt_ttl': 24,
         'path': '',
     },
     'models': {
-        'allow': ''
+        'allow': '',
+        'sensitivity': '',
+        'audio_gain': '',
     },
     'persons': {},
     'proxy': {
@@ -159,6 +176,8 @@ CFG = {  # Дефолтные настройки https://github.com/Aculeasis/md
         'enable': False,
         'conservative': False,
         'ns_lvl': 0,
+        'aec_type': 0,
+        'aec_reference': False,
     },
     'plugins': {
         'enable': True,
@@ -173,7 +192,7 @@ CFG = {  # Дефолтные настройки https://github.com/Aculeasis/md
 
 STATE = {
     'system': {
-        'ini_version': 51,
+        'ini_version': 65,
         'merge': 1,
         'PLUGINS_API': 3,
         'VERSION': (0, 17, 2),
@@ -248,6 +248,12 @@ _LNG = {  # google translate - it's a good idea!
     'Во время записи произошел сбой, это нужно исправить': 'There was a failure while recording, it needs to be fixed',
     'Ошибка распознавания - неизвестный провайдер {}': 'Recognition Error - Unknown Provider {}',
     'Для распознавания используем {}': 'For recognition we use {}',
+    'Досрочно распознано за {}: {}': 'Early recognized for {}: {}',
+    'Параллельное распознавание {}: победил {}': 'Parallel recognition {}: {} won',
+    'Провайдер {} все еще недоступен: {}': 'Provider {} is still unavailable: {}',
+    # lib/provider_health.py
+    'Провайдер {} отключен, проверка через {}': 'Provider {} disabled, next check in {}',
+    'Провайдер {} снова доступен': 'Provider {} is available again',
     'Произошла ошибка распознавания': 'Recognition Error Occurred',
     "Ошибка распознавания речи от {}, ключ '{}'. ({})": "Speech recognition error from {}, key '{}'. ({})",
     'Распознано: {}. Консенсус: {}': 'Recognized: {}. Consensus: {}',
@@ -256,6 +256,12 @@ _LNG = {
     'Во время записи произошел сбой, это нужно исправить': None,
     'Ошибка распознавания - неизвестный провайдер {}': None,
     'Для распознавания используем {}': None,
+    'Досрочно распознано за {}: {}': None,
+    'Параллельное распознавание {}: победил {}': None,
+    'Провайдер {} все еще недоступен: {}': None,
+    # lib/provider_health.py
+    'Провайдер {} отключен, проверка через {}': None,
+    'Провайдер {} снова доступен': None,
     'Произошла ошибка распознавания': None,
     "Ошибка распознавания речи от {}, ключ '{}'. ({})": None,
     'Распознано: {}. Консенсус: {}': None,
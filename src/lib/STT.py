@@ -1,6 +1,7 @@
 
 import hashlib
 import json
+import threading
 import time
 from io import BytesIO
 
@@ -20,6 +21,10 @@ __all__ = ['support', 'GetSTT', 'BaseSTT', 'RequestError']
 
 class BaseSTT:
     BUFF_SIZE = 1024 * 4
+    # Провайдер отправляет аудио по мере записи, иначе получит фразу целиком после ее окончания
+    STREAMING = True
+    # Получает промежуточные гипотезы, если провайдер их отдает
+    _partial_cb = None
 
     def __init__(self, url, audio_data: AudioData or StreamRecognition, ext,
                  headers=None, convert_rate=None, convert_width=None, proxy_key=None, **kwargs):
@@ -29,6 +34,8 @@ class BaseSTT:
         self._headers = headers
         self._params = kwargs
 
+        if not self.STREAMING and isinstance(audio_data, StreamRecognition):
+            audio_data = audio_data.get_audio_data()
         if ext in streaming_converter.CMD or isinstance(audio_data, StreamRecognition):
             self._data = streaming_converter.AudioConverter(audio_data, ext, convert_rate, convert_width)
         elif ext == 'wav':
@@ -75,6 +82,10 @@ class BaseSTT:
     def _parse_response(self):
         pass
 
+    def _partial(self, text: str):
+        if self._partial_cb and text:
+            self._partial_cb(text)
+
     def text(self):
         if not self._text:
             raise UnknownValueError('No variants')
@@ -183,8 +194,10 @@ class YandexCloudDemo(BaseSTT):
     URL = 'wss://cloud.yandex.ru/api/speechkit/recognition'
     ORIGIN = 'https://cloud.yandex.ru'
 
-    def __init__(self, audio_data, lang='ru-RU', **_):
+    def __init__(self, audio_data, lang='ru-RU', partial=None, **_):
         ext, rate, width = 'pcm', 16000, 2
+        self._partial_cb = partial
+        self._receiver, self._error = None, None
         super().__init__(
             self.URL, audio_data, ext, convert_rate=rate, convert_width=width,
             proxy_key='stt_yandex', language=lang, format=ext, sampleRate=rate,
@@ -201,6 +214,9 @@ class YandexCloudDemo(BaseSTT):
             )
             self._rq.send(json.dumps(self._params))
             self._rq.recv()  # wait {'type': 'connect', 'data': 'Done'}
+            # Ответы читаем параллельно с отправкой, промежуточные гипотезы приходят во время записи
+            self._receiver = threading.Thread(target=self._receiving, daemon=True)
+            self._receiver.start()
             for chunk in self._chunks():
                 if chunk:
                     if not time_stamp:
@@ -214,29 +230,36 @@ class YandexCloudDemo(BaseSTT):
             self.close()
             raise RuntimeErrorTrace(e)
 
-    def _reply_check(self):
-        try:
-            while True:
-                try:
-                    data = json.loads(self._rq.recv())
-                except (json.JSONDecodeError, TypeError, BlockingIOError):
-                    continue
-                except Exception as e:
+    def _receiving(self):
+        while True:
+            try:
+                data = json.loads(self._rq.recv())
+            except (json.JSONDecodeError, TypeError, BlockingIOError):
+                continue
+            except Exception as e:
+                if not self._text:
+                    self._error = RuntimeErrorTrace(e)
+                break
+            if isinstance(data, dict) and 'type' in data:
+                if data['type'] == 'data':
+                    try:
+                        self._text = data['data']['chunks'][0]['alternatives'][0]['text']
+                    except (KeyError, TypeError, IndexError):
+                        pass
+                    else:
+                        self._partial(self._text)
+                elif data['type'] in ('end', 'error'):
                     if not self._text:
-                        raise RuntimeErrorTrace(e)
+                        self._error = RuntimeError('{}: {}'.format(data['type'].upper(), data.get('data')))
                     break
-                if isinstance(data, dict) and 'type' in data:
-                    if data['type'] == 'data':
-                        try:
-                            self._text = data['data']['chunks'][0]['alternatives'][0]['text']
-                        except (KeyError, TypeError, IndexError):
-                            pass
-                    elif data['type'] in ('end', 'error'):
-                        if not self._text:
-                            raise RuntimeError('{}: {}'.format(data['type'].upper(), data.get('data')))
-                        break
+
+    def _reply_check(self):
+        try:
+            self._receiver.join()
         finally:
             self.close()
+        if self._error:
+            raise self._error
 
     def close(self):
         # noinspection PyBroadException
@@ -319,10 +342,12 @@ class Azure(BaseSTT):
 class VoskServer(BaseSTT):
     # https://alphacephei.com/vosk/server
     # https://github.com/alphacep/vosk-server/blob/master/websocket/asr_server.py
-    def __init__(self, audio_data: AudioData, url='', **_):
+    def __init__(self, audio_data: AudioData, url='', partial=None, **_):
         self.rate = audio_data.sample_rate if audio_data.sample_rate < 16000 else 16000
+        self._partial_cb = partial
+        self._receiver, self._error = None, None
         url = url_builder_cached(url or '127.0.0.1', def_port=2700)
-        super().__init__(url, audio_data, 'wav', convert_rate=self.rate, convert_width=2, proxy_key='stt_vosk-rest')
+        super().__init__(url, audio_data, 'pcm', convert_rate=self.rate, convert_width=2, proxy_key='stt_vosk-rest')
 
     def _send(self, proxy_key):
         try:
@@ -332,6 +357,8 @@ class VoskServer(BaseSTT):
                 **proxies(proxy_key, ws_format=True),
             )
             self._rq.send(json.dumps({'config': {'sample_rate': self.rate}}))
+            self._receiver = threading.Thread(target=self._receiving, daemon=True)
+            self._receiver.start()
             for chunk in self._chunks():
                 self._rq.send(chunk, opcode=ABNF.OPCODE_BINARY)
             self._rq.send('{"eof" : 1}')
@@ -339,20 +366,27 @@ class VoskServer(BaseSTT):
             self._close()
             raise RuntimeErrorTrace(e)
 
-    def _reply_check(self):
+    def _receiving(self):
         try:
             while True:
                 recv = json.loads(self._rq.recv())
                 if 'partial' in recv:
                     self._text = recv['partial']
+                    self._partial(self._text)
                 elif 'text' in recv:
                     self._text = recv['text']
                     break
-        except REQUEST_ERRORS as e:
+        except (ValueError, TypeError) + REQUEST_ERRORS as e:
             if not self._text:
-                raise RuntimeError(e)
+                self._error = RuntimeError(e)
+
+    def _reply_check(self):
+        try:
+            self._receiver.join()
         finally:
             self._close()
+        if self._error:
+            raise self._error
 
     def _close(self):
         if self._rq:
@@ -390,9 +424,12 @@ class VoskREST(BaseMySTT):
 
 
 class Microsoft:
+    STREAMING = False
+
     def __init__(self, audio_data, key, lang, **_):
         sr = Recognizer()
         if isinstance(audio_data, StreamRecognition):
+            # Фраза копится в фоне, пока recognize_bing получает токен
             audio_data = audio_data.get_audio_data()
         self._text = sr.recognize_bing(audio_data, key, lang)
 
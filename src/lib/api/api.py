@@ -277,6 +277,11 @@ class API:
         """providers: list[str], files: list[str]"""
         self.own.terminal_call('test.test', dict_list_to_list_in_tuple(data, ('providers', 'files')))
 
+    @api_commands('job.cancel')
+    def _api_job_cancel(self, *_):
+        """Отменяет фоновую компиляцию модели или test.test"""
+        self.own.terminal_call('job.cancel', ())
+
     @api_commands('test.list', pure_json=True)
     def _api_test_list(self, *_):
         return self.cfg.get_all_testfile()
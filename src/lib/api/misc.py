@@ -115,8 +115,7 @@ def api_commands(*commands, true_json=None, true_legacy=None, pure_json=None, al
     return wrapper
 
 
-def upgrade_duplex(own: Owner, soc: Connect, msg=''):
-    cmd = 'upgrade duplex'
+def upgrade_duplex(own: Owner, soc: Connect, msg='', cmd='upgrade duplex'):
     if own.has_subscribers(cmd, cmd):
         lock = Unlock()
         own.sub_call(cmd, cmd, msg, lock, soc)
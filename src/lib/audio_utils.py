@@ -1,9 +1,13 @@
 import audioop
 import collections
+import ctypes
+import math
+import multiprocessing
 import os
 import platform
 import threading
 import time
+import weakref
 from functools import lru_cache
 
 from speech_recognition import Microphone, AudioData
@@ -30,14 +34,20 @@ def _loader_snowboy():
 
 
 def _loader_porcupine():
-    import struct
     from lib.porcupine import Porcupine as Porcupine_
 
     class Porcupine(Porcupine_):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._frame = ShortFrame(self.frame_length)
+            self._result = ctypes.c_int()
+
         def process(self, pcm: bytes) -> int:
-            result = super().process(struct.unpack('H' * (len(pcm) // 2), pcm))
-            if self._num_keywords == 1:
-                result = int(result) - 1
+            # Кадр копируется в готовый буфер, без tuple из int на каждый кадр
+            status = self.process_func(self._handle, self._frame(pcm), ctypes.byref(self._result))
+            if status is not self.PicovoiceStatuses.SUCCESS:
+                raise self._PICOVOICE_STATUS_TO_EXCEPTION[status]()
+            result = self._result.value
             return -2 if result < 0 else result + 1
 
         def __del__(self):
@@ -47,6 +57,19 @@ def _loader_porcupine():
     return Porcupine
 
 
+class ShortFrame:
+    """Переиспользуемый буфер c_short для нативных движков, pcm (int16, native) копируется через memmove."""
+    def __init__(self, samples: int):
+        self._frame = (ctypes.c_short * samples)()
+
+    def __call__(self, pcm: bytes):
+        size = len(pcm) // 2
+        if size != len(self._frame):
+            self._frame = (ctypes.c_short * size)()
+        ctypes.memmove(self._frame, pcm, size * 2)
+        return self._frame
+
+
 def porcupine_lib() -> str:
     ext = {'windows': 'dll', 'linux': 'so', 'darwin': 'dylib'}
     return 'libpv_porcupine.{}'.format(ext.get(platform.system().lower(), 'linux'))
@@ -132,11 +155,14 @@ class RMS:
 @singleton
 class APMSettings:
     NAME = 'apm'
+    # Шумоподавление работает кадрами по 10 мс
+    FRAME = 160
 
     def __init__(self):
         self._cfg = {
             'enable': False,
             'conservative': False,
+            'aec_reference': False,
             'aec_type': 0,
             'agc_type': 0,
             'ns_lvl': 0,
@@ -154,7 +180,7 @@ class APMSettings:
         # agc_target = 0..31, for agc_type == 1..2
         # aec_lvl = 0..2, for aec_type == 2?
         for key, val in kwargs.items():
-            if key in ('enable', 'conservative'):
+            if key in ('enable', 'conservative', 'aec_reference'):
                 if isinstance(val, bool):
                     self._cfg[key] = val
                 continue
@@ -179,6 +205,11 @@ class APMSettings:
     def conservative(self):
         return self._cfg['conservative']
 
+    @property
+    def aec_reference(self):
+        # Эхоподавление по сигналу, который играет плеер
+        return self._cfg['aec_reference'] and self._cfg['aec_type'] > 0 and self.enable
+
     @property
     def instance(self):
         return self._constructor(**self._cfg)
@@ -206,6 +237,119 @@ class APMSettings:
         return ap
 
 
+@singleton
+class PlaybackTap:
+    """
+    Опорный сигнал для эхоподавления APM - то, что сейчас играет плеер, 16 kHz mono.
+    Кадры по 10 мс привязаны ко времени воспроизведения и отдаются в reverse stream по мере проигрывания.
+    Декодер опережает воспроизведение не больше чем на AHEAD секунд, дальше feed ждет.
+    Задержку динамик -> микрофон оцениваем по корреляции огибающих.
+    """
+    RATE = 16000
+    FRAME = 160 * 2
+    AHEAD = 3
+    MAX_DELAY = 50
+    HISTORY = 300
+    ESTIMATE_EVERY = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = collections.deque()
+        self._buffer = b''
+        self._session = 0
+        self._start = None
+        self._played = 0
+        self._ref = collections.deque(maxlen=self.HISTORY)
+        self._mic = collections.deque(maxlen=self.HISTORY)
+        self._counter = 0
+        self.delay = 0
+
+    @property
+    def enable(self) -> bool:
+        return APMSettings().aec_reference
+
+    def begin(self) -> int:
+        # Новое воспроизведение, данные от старых сессий игнорируются. Часы пойдут с первыми данными
+        with self._lock:
+            self._session += 1
+            self._clear()
+            return self._session
+
+    def stop(self):
+        with self._lock:
+            self._session += 1
+            self._clear()
+
+    def _clear(self):
+        self._frames.clear()
+        self._buffer = b''
+        self._start = None
+        self._played = 0
+
+    def feed(self, pcm: bytes, session: int):
+        with self._lock:
+            if session != self._session:
+                return
+            now = time.time()
+            if self._start is None:
+                self._start = now
+            else:
+                queued = self._played + len(self._frames)
+                due = int((now - self._start) * 100)
+                if queued < due:
+                    # Данных не было (медленный поток), плеер тоже стоял - сдвигаем часы
+                    self._start += (due - queued) / 100
+            self._buffer += pcm
+            end = len(self._buffer) - len(self._buffer) % self.FRAME
+            for step in range(0, end, self.FRAME):
+                self._frames.append(self._buffer[step:step + self.FRAME])
+            self._buffer = self._buffer[end:]
+            due = int((now - self._start) * 100)
+            # Без захвата микрофона render не вызывается, старые кадры выкидываем сами
+            while self._played < due - self.MAX_DELAY and self._frames:
+                self._frames.popleft()
+                self._played += 1
+            ahead = self._played + len(self._frames) - due - self.AHEAD * 100
+        if ahead > 0:
+            # Держим декодер в темпе воспроизведения, иначе длинный файл целиком окажется в памяти
+            time.sleep(ahead / 100)
+
+    def render(self, ap, frame: bytes):
+        # Вызывается перед обработкой каждого кадра микрофона
+        frames = []
+        with self._lock:
+            if self._start is not None:
+                due = int((time.time() - self._start) * 100)
+                while self._played < due and self._frames:
+                    frames.append(self._frames.popleft())
+                    self._played += 1
+        for data in frames:
+            ap.process_reverse_stream(data)
+        self._ref.append(sum(audioop.rms(x, 2) for x in frames) // len(frames) if frames else 0)
+        self._mic.append(audioop.rms(frame, 2))
+        self._counter += 1
+        if self._counter >= self.ESTIMATE_EVERY:
+            self._counter = 0
+            self._estimate(ap)
+
+    def _estimate(self, ap):
+        ref, mic = list(self._ref), list(self._mic)
+        if len(ref) < self.HISTORY or not any(ref):
+            return
+        ref_avg, mic_avg = sum(ref) / len(ref), sum(mic) / len(mic)
+        ref = [x - ref_avg for x in ref]
+        mic = [x - mic_avg for x in mic]
+        size = len(ref) - self.MAX_DELAY
+        best, delay = 0, None
+        for lag in range(self.MAX_DELAY + 1):
+            score = sum(ref[idx] * mic[idx + lag] for idx in range(size))
+            if score > best:
+                best, delay = score, lag
+        if delay is not None and delay * 10 != self.delay:
+            self.delay = delay * 10
+            ap.set_system_delay(self.delay)
+
+
 class MicrophoneStream(Microphone.MicrophoneStream):
     def deactivate(self):
         pass
@@ -225,6 +369,10 @@ class MicrophoneStreamAPM(MicrophoneStream):
         self._ap = APMSettings().instance
         self._conservative = conservative
         self._ap.set_stream_format(rate, 1)
+        self._tap = PlaybackTap() if PlaybackTap().enable else None
+        if self._tap:
+            self._ap.set_reverse_stream_format(PlaybackTap.RATE, 1)
+            self._ap.set_system_delay(self._tap.delay)
         self._buffer = b''
         self._sample_size = width * int(rate * 10 / 1000)
         self._active = True
@@ -242,7 +390,9 @@ class MicrophoneStreamAPM(MicrophoneStream):
         read_len = (buff_len // self._sample_size) * self._sample_size
         if read_len:
             for step in range(0, read_len, self._sample_size):
-                yield self._ap.process_stream(self._buffer[step: step + self._sample_size])
+                frame = self._buffer[step: step + self._sample_size]
+                self._tap and self._tap.render(self._ap, frame)
+                yield self._ap.process_stream(frame)
             self._buffer = self._buffer[read_len:]
 
     def deactivate(self):
@@ -258,7 +408,125 @@ class MicrophoneStreamAPM(MicrophoneStream):
         return chunks
 
 
+def _engine_worker(name: str, method: str, info: tuple, kwargs: dict, conn, shared):
+    # Живет в отдельном процессе, получает длину кадра из общей памяти и возвращает результат
+    try:
+        if not ModuleLoader().is_loaded(name):
+            raise RuntimeError('; '.join(ModuleLoader().extract_errors()))
+        engine = ModuleLoader().get(name)(**kwargs)
+        processing = getattr(engine, method)
+        info = {key: getattr(engine, key) for key in info}
+        info = {key: (val() if callable(val) else val, callable(val)) for key, val in info.items()}
+    except Exception as e:
+        conn.send(('error', '{}: {}'.format(type(e).__name__, e)))
+        return
+    conn.send(('ok', info))
+    while True:
+        try:
+            size = conn.recv()
+        except (EOFError, OSError):
+            break
+        if size is None:
+            break
+        conn.send(processing(shared[:size]))
+
+
+class ProcessEngine:
+    """
+    Движок детектора (snowboy, porcupine) в отдельном процессе, не делит GIL с остальными потоками.
+    Кадры передаются через общую память, pipe только для синхронизации.
+    Повторяет интерфейс движка: method(buffer) и атрибуты из info.
+    """
+    FRAME_LIMIT = 1024 * 64
+    START_TIMEOUT = 30
+    _instances = weakref.WeakSet()
+
+    def __init__(self, name: str, method: str, info: tuple, **kwargs):
+        self._method = method
+        self._lock = threading.Lock()
+        self._process = None
+        ctx = multiprocessing.get_context('spawn')
+        self._shared = ctx.RawArray(ctypes.c_char, self.FRAME_LIMIT)
+        self._conn, child = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_engine_worker, args=(name, method, info, kwargs, child, self._shared),
+            name='HWD-{}'.format(name), daemon=True,
+        )
+        self._process.start()
+        child.close()
+        if not self._conn.poll(self.START_TIMEOUT):
+            self.close()
+            raise RecognitionCrashMessage('{} process start timeout'.format(name))
+        status, self._info = self._conn.recv()
+        if status != 'ok':
+            self.close()
+            raise RecognitionCrashMessage('{} process: {}'.format(name, self._info))
+        self._instances.add(self)
+
+    def __getattr__(self, item):
+        if item == self._method:
+            return self._processing
+        try:
+            val, is_callable = self._info[item]
+        except KeyError:
+            raise AttributeError(item)
+        return (lambda: val) if is_callable else val
+
+    def _processing(self, buffer: bytes) -> int:
+        size = len(buffer)
+        if size > self.FRAME_LIMIT:
+            raise RecognitionCrashMessage('Frame too large: {}'.format(size))
+        with self._lock:
+            ctypes.memmove(self._shared, buffer, size)
+            try:
+                self._conn.send(size)
+                return self._conn.recv()
+            except (EOFError, OSError) as e:
+                raise RecognitionCrashMessage('Detector process died: {}'.format(e))
+
+    def close(self):
+        if not self._process:
+            return
+        process, self._process = self._process, None
+        try:
+            self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        process.join(1)
+        if process.is_alive():
+            process.terminate()
+        self._conn.close()
+
+    def __del__(self):
+        self.close()
+
+    @classmethod
+    def close_all(cls):
+        for engine in list(cls._instances):
+            engine.close()
+
+
+def aligned_chunk(target: int, *frames: int, rate: int = 16000) -> int:
+    """
+    Размер блока захвата (в семплах микрофона с частотой rate), кратный кадрам детекторов и ближайший к target.
+    Кадры заданы для 16 kHz и пересчитываются в rate, кадры без целого числа семплов в rate не учитываются.
+    Если общее кратное больше target вдвое, выравнивание только по первому кадру (детектор).
+    """
+    frames = [x * rate // 16000 for x in frames if x and x > 0 and not x * rate % 16000]
+    if not frames:
+        return target
+    step = frames[0]
+    for frame in frames[1:]:
+        step = step * frame // math.gcd(step, frame)
+    if step > target * 2:
+        step = frames[0]
+    return max(1, int(round(target / step))) * step
+
+
 class BaseDetector:
+    # Родной кадр детектора в семплах (16 kHz), 0 - любой
+    FRAME = 0
+
     def __init__(self, duration, width, rate, resample_rate, rms, another=None):
         self._vad = another
         self._resample_rate = resample_rate
@@ -321,6 +589,13 @@ class BaseDetector:
         return buffer
 
     def _new_chunk(self, buffer: bytes, is_speech=False):
+        if not self._buffer and not len(buffer) % self._sample_size:
+            # Блок выровнен по кадрам: один кадр отдаем как есть, несколько - срезами без склейки с буфером
+            if len(buffer) == self._sample_size:
+                return self.new_chunk(buffer, is_speech)
+            for step in range(0, len(buffer), self._sample_size):
+                self.new_chunk(buffer[step: step + self._sample_size], is_speech)
+            return
         self._buffer += buffer
         buff_len = len(self._buffer)
         read_len = (buff_len // self._sample_size) * self._sample_size
@@ -331,12 +606,33 @@ class BaseDetector:
 
 
 class Detector(BaseDetector):
+    # Движки комнат хаба, у каждой комнаты свой экземпляр: {(класс, комната): (аргументы, движок)}
+    _rooms = {}
+
     def die(self):
         pass
 
     @classmethod
     def reset(cls):
         cls._constructor.cache_clear()
+        for key in [key for key in Detector._rooms if key[0] is cls]:
+            Detector._rooms.pop(key, None)
+
+    @classmethod
+    def drop_room(cls, room: str):
+        for key in [key for key in Detector._rooms if key[1] == room]:
+            Detector._rooms.pop(key, None)
+
+    @classmethod
+    def _engine(cls, room: str, *args):
+        # Основной конвейер использует общий кэш _constructor
+        if not room:
+            return cls._constructor(*args)
+        key = (cls, room)
+        cached = Detector._rooms.get(key)
+        if cached is None or cached[0] != args:
+            cached = Detector._rooms[key] = (args, cls._constructor.__wrapped__(cls, *args))
+        return cached[1]
 
     def new_chunk(self, buffer: bytes, is_speech=False):
         raise NotImplementedError
@@ -347,14 +643,42 @@ class Detector(BaseDetector):
         raise NotImplementedError
 
 
+class SnowboyBatch:
+    """
+    Модели с разным усилением в отдельных экземплярах snowboy, кадр (уже ресемплированный) общий.
+    Возвращает номер модели в общем списке.
+    """
+    def __init__(self, engines: list, indexes: list):
+        self._engines = engines
+        self._indexes = indexes
+
+    def SampleRate(self):
+        return self._engines[0].SampleRate()
+
+    def RunDetection(self, buffer: bytes) -> int:
+        state = -2
+        for engine, indexes in zip(self._engines, self._indexes):
+            result = engine.RunDetection(buffer)
+            if result > 0:
+                return indexes[result - 1]
+            state = max(state, result)
+        return state
+
+
 class SnowboyHWD(Detector):
-    def __init__(self, home, hot_word_files, sensitivity, audio_gain, width, rate, another, apply_frontend, rms, **_):
-        self._snowboy = SnowboyHWD._constructor(home, sensitivity, audio_gain, apply_frontend, *hot_word_files)
+    FRAME = 2400
+
+    def __init__(self, home, hot_word_files, sensitivity, audio_gain, width, rate, another, apply_frontend, rms,
+                 process=False, sensitivities=None, audio_gains=None, room='', **_):
+        files = tuple(hot_word_files)
+        sensitivities = tuple(sensitivities or (sensitivity,) * len(files))
+        audio_gains = tuple(audio_gains or (audio_gain,) * len(files))
+        self._snowboy = SnowboyHWD._engine(room, process, home, apply_frontend, files, sensitivities, audio_gains)
         super().__init__(150, width, rate, self._snowboy.SampleRate(), rms, another)
         self._processing_chunk = self.new_chunk
 
     def new_chunk(self, buffer: bytes, is_speech=False):
-        self._buffer += buffer
+        self._buffer = self._buffer + buffer if self._buffer else buffer
         if len(self._buffer) >= self._sample_size:
             self._current_state = self._snowboy.RunDetection(self._buffer)
             if not self._vad:
@@ -363,16 +687,38 @@ class SnowboyHWD(Detector):
 
     @classmethod
     @lru_cache(maxsize=1)
-    def _constructor(cls, home, sensitivity, audio_gain, apply_frontend, *hot_word_files):
-        return ModuleLoader().get('snowboy')(
-            home=home, sensitivity=sensitivity, audio_gain=audio_gain,
-            apply_frontend=apply_frontend, hot_word_files=hot_word_files,
-        )
+    def _constructor(cls, process, home, apply_frontend, hot_word_files, sensitivities, audio_gains):
+        def engine(files, sensitivity, audio_gain):
+            kwargs = dict(
+                home=home, sensitivity=sensitivity, audio_gain=audio_gain,
+                apply_frontend=apply_frontend, hot_word_files=files,
+            )
+            if process:
+                return ProcessEngine('snowboy', 'RunDetection', ('SampleRate',), **kwargs)
+            return ModuleLoader().get('snowboy')(**kwargs)
+
+        # Группируем по усилению, оно одно на экземпляр
+        groups = collections.OrderedDict()
+        for idx, gain in enumerate(audio_gains):
+            groups.setdefault(gain, []).append(idx)
+        if len(groups) < 2:
+            return engine(hot_word_files, sensitivities, audio_gains[0] if audio_gains else 1.0)
+        engines, indexes = [], []
+        for gain, group in groups.items():
+            files = tuple(hot_word_files[idx] for idx in group)
+            engines.append(engine(files, tuple(sensitivities[idx] for idx in group), gain))
+            indexes.append([idx + 1 for idx in group])
+        return SnowboyBatch(engines, indexes)
 
 
 class PorcupineHWD(Detector):
-    def __init__(self, home, hot_word_files, sensitivity, width, rate, another, rms, **_):
-        self._porcupine = PorcupineHWD._constructor(home, sensitivity, *hot_word_files)
+    FRAME = 512
+
+    def __init__(self, home, hot_word_files, sensitivity, width, rate, another, rms, process=False,
+                 sensitivities=None, room='', **_):
+        files = tuple(hot_word_files)
+        sensitivities = tuple(sensitivities or (sensitivity,) * len(files))
+        self._porcupine = PorcupineHWD._engine(room, process, home, files, sensitivities)
         super().__init__(1, width, rate, self._porcupine.sample_rate, rms, another)
         self._sample_size = width * self._porcupine.frame_length
         if not self._vad:
@@ -383,14 +729,16 @@ class PorcupineHWD(Detector):
 
     @classmethod
     @lru_cache(maxsize=1)
-    def _constructor(cls, home, sensitivity, *hot_word_files):
-        sensitivities = [sensitivity] * len(hot_word_files)
-        library_path = os.path.join(home, porcupine_lib())
-        model_file_path = os.path.join(home, 'porcupine_params.pv')
-        return ModuleLoader().get('porcupine')(
-            library_path=library_path, model_file_path=model_file_path, keyword_file_paths=hot_word_files,
-            sensitivities=sensitivities,
+    def _constructor(cls, process, home, hot_word_files, sensitivities):
+        kwargs = dict(
+            library_path=os.path.join(home, porcupine_lib()),
+            model_file_path=os.path.join(home, 'porcupine_params.pv'),
+            keyword_file_paths=hot_word_files,
+            sensitivities=list(sensitivities),
         )
+        if process:
+            return ProcessEngine('porcupine', 'process', ('sample_rate', 'frame_length'), **kwargs)
+        return ModuleLoader().get('porcupine')(**kwargs)
 
 
 class EmptyHWD(Detector):
@@ -418,12 +766,14 @@ class EmptyHWD(Detector):
 
 
 class WebRTCVAD(Detector):
-    def __init__(self, width, rate, lvl, rms, **_):
+    FRAME = 480
+
+    def __init__(self, width, rate, lvl, rms, room='', **_):
         super().__init__(30, width, rate, 16000, rms)
-        self._vad = WebRTCVAD._constructor(lvl)
+        self._webrtc = WebRTCVAD._engine(room, lvl)
 
     def new_chunk(self, buffer: bytes, is_speech=False):
-        self._speech_state = self._vad.is_speech(buffer, self._resample_rate)
+        self._speech_state = self._webrtc.is_speech(buffer, self._resample_rate)
 
     @classmethod
     @lru_cache(maxsize=1)
@@ -432,9 +782,11 @@ class WebRTCVAD(Detector):
 
 
 class APMVAD(Detector):
-    def __init__(self, width, rate, lvl, rms, **_):
+    FRAME = 160
+
+    def __init__(self, width, rate, lvl, rms, room='', **_):
         super().__init__(10, width, rate, 16000, rms)
-        self._apm = APMVAD._constructor(lvl)
+        self._apm = APMVAD._engine(room, lvl)
 
     def is_speech(self, buffer: bytes) -> bool:
         super().is_speech(buffer)
@@ -503,6 +855,10 @@ class StreamRecognition(threading.Thread):
         self._written = False
         self._block = threading.Event()
         self.__event = threading.Event()
+        self._forks = ()
+        self._fork_lock = threading.Lock()
+        self._partial = ''
+        self._partial_time = 0
 
     @property
     def ready(self):
@@ -522,13 +878,36 @@ class StreamRecognition(threading.Thread):
     def end(self):
         self.time_up()
         if self.ready:
-            self._pipe.append(b'')
-            self.__event.set()
+            self._append(b'')
 
     def terminate(self):
         self.work = False
+        for fork in self._forks:
+            fork.work = False
         self.end()
 
+    def fork(self, count: int) -> list:
+        # Копии потока для нескольких провайдеров, после этого данные пишутся только в них
+        with self._fork_lock:
+            self._forks = tuple(StreamFork(self, self._pipe) for _ in range(count))
+            self._pipe.clear()
+        return list(self._forks)
+
+    def early_result(self, text):
+        # Досрочный результат, запись и передача аудио прекращаются
+        if self._text is None:
+            self._text = text
+            self.terminate()
+            self._block.set()
+
+    def partial(self, text: str):
+        if text and text != self._partial:
+            self._partial, self._partial_time = text, time.time()
+
+    def partial_age(self) -> float:
+        # Сколько секунд промежуточный результат не менялся
+        return time.time() - self._partial_time if self._partial else 0.0
+
     def init(self, iterable=(), maxlen=None, sample_rate=None, sample_width=None):
         self._pipe = collections.deque(iterable, maxlen)
         self.sample_rate = sample_rate
@@ -537,17 +916,27 @@ class StreamRecognition(threading.Thread):
 
     def read(self):
         while True:
-            self.__event.wait(0.5)
             try:
                 return self._pipe.popleft()
             except IndexError:
-                self.__event.clear()
-                continue
+                pass
+            # Сбрасываем событие до повторной проверки, иначе можно пропустить write и уснуть на таймаут
+            self.__event.clear()
+            if not self._pipe:
+                self.__event.wait(0.5)
 
     def write(self, data):
         self._written = True
-        self._pipe.append(data)
-        self.__event.set()
+        self._append(data)
+
+    def _append(self, data):
+        with self._fork_lock:
+            if self._forks:
+                for fork in self._forks:
+                    fork.write(data)
+            else:
+                self._pipe.append(data)
+                self.__event.set()
 
     @property
     def text(self):
@@ -557,17 +946,59 @@ class StreamRecognition(threading.Thread):
     def run(self):
         self.time_up()
         try:
-            self._text = self._voice_recognition(self, False, self._time)
+            text = self._voice_recognition(self, False, self._time)
+            if self._text is None:
+                self._text = text
         finally:
             self._block.set()
 
     def get_audio_data(self):
-        frames = collections.deque()
+        return BufferedAudioData(self)
+
+
+class StreamFork(StreamRecognition):
+    """Копия потока StreamRecognition, каждый провайдер читает свою."""
+    def __init__(self, parent: StreamRecognition, iterable):
+        super().__init__(None)
+        self._parent = parent
+        self._pipe = collections.deque(iterable)
+        self.sample_rate = parent.sample_rate
+        self.sample_width = parent.sample_width
+
+    def early_result(self, text):
+        self._parent.early_result(text)
+
+    def partial(self, text: str):
+        self._parent.partial(text)
+
+
+class BufferedAudioData(AudioData):
+    """
+    Адаптер потока для провайдеров без потоковой передачи.
+    Фраза копится в фоне пока идет запись, провайдер может подготовиться заранее (токен, соединение),
+    обращение к frame_data блокирует до конца фразы.
+    """
+    # noinspection PyMissingConstructor
+    def __init__(self, stream: StreamRecognition):
+        self.sample_rate = stream.sample_rate
+        self.sample_width = stream.sample_width
+        self._stream = stream
+        self._frames = collections.deque()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _collect(self):
         chunk = True
         while chunk:
-            chunk = self.read()
-            frames.append(chunk)
-        return AudioData(frame_data=b''.join(frames), sample_rate=self.sample_rate, sample_width=self.sample_width)
+            chunk = self._stream.read()
+            self._frames.append(chunk)
+
+    @property
+    def frame_data(self) -> bytes:
+        self._collector.join()
+        if len(self._frames) > 1:
+            self._frames = collections.deque((b''.join(self._frames),))
+        return self._frames[0]
 
 
 class TimeFusion:
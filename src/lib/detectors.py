@@ -1,7 +1,7 @@
 import pathlib
 
 import utils
-from lib.audio_utils import SnowboyHWD, PorcupineHWD, EmptyHWD, ModuleLoader, porcupine_lib
+from lib.audio_utils import SnowboyHWD, PorcupineHWD, EmptyHWD, ModuleLoader, ProcessEngine, porcupine_lib
 
 
 class Detector:
@@ -88,6 +88,7 @@ def detector(name, home: str or None) -> Detector:
 
 def reset_detector_caches():
     ModuleLoader().clear()
+    ProcessEngine.close_all()
     for x in list(DETECTORS.values()):
         try:
             x.reset()
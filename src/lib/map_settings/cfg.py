@@ -1,7 +1,9 @@
 from lib import STT
 from lib import TTS
 from lib.polly_signing import AWS_REGIONS
+from lib.provider_health import POLICIES
 from lib.snowboy_training import Training
+from lib.virtual_mic import PACING
 
 VAD_MODE = ['snowboy', 'webrtc', 'apm', 'energy']
 VAD_LVL = [0, 1, 2, 3]
@@ -31,6 +33,20 @@ CFG_DSC = {
             'name': 'Провайдер распознавания речи',
             'options': STT.PROVIDERS,
         },
+        'providerstt_race': {
+            'name': 'Дополнительные провайдеры для параллельного распознавания потока (stream_recognition), через запятую',
+        },
+        'stt_race_policy': {
+            'name': 'Результат параллельного распознавания',
+            'options': ['first', 'agreement'],
+        },
+        'providerstt_backup': {
+            'name': 'Резервные провайдеры распознавания, через запятую',
+        },
+        'stt_selection': {
+            'name': 'Выбор провайдера распознавания',
+            'options': POLICIES,
+        },
         'ip' : {
             'name': 'IP терминала',
         },
@@ -58,9 +74,19 @@ CFG_DSC = {
         'mic_index': {
             'name': ''
         },
+        'virtual_mic': {
+            'name': 'Виртуальный микрофон: wav:путь, pcm:путь, tcp:хост:порт или satellite[:имя]',
+        },
+        'virtual_mic_pacing': {
+            'name': 'Темп виртуального микрофона',
+            'options': PACING,
+        },
         'optimistic_nonblock_tts': {
             'name': '',
         },
+        'tts_preroll': {
+            'name': 'Предзагрузка потокового TTS, формат или провайдер:KiB через запятую (wav:16,yandex:4)',
+        },
         'ask_me_again': {
             'name': ''
         },
@@ -108,6 +134,21 @@ CFG_DSC = {
         'stream_recognition': {
             'name': '',
         },
+        'early_dispatch': {
+            'name': '',
+        },
+        'detector_process': {
+            'name': '',
+        },
+        'endpointer': {
+            'name': '',
+        },
+        'chunk_size': {
+            'name': 'Размер блока захвата в семплах, 0 - авто',
+        },
+        'barge_in': {
+            'name': 'Прерывать ответ ключевым словом',
+        },
         'vad_mode': {
             'name': '',
             'options': VAD_MODE,
@@ -167,6 +208,12 @@ CFG_DSC = {
         'disable_server': {
             'name': '',
         },
+        'satellites': {
+            'name': 'Максимум сателлитов (удаленных микрофонов), 0 - выключено',
+        },
+        'satellite_hub': {
+            'name': 'Хаб: каждый сателлит - отдельная комната со своей активацией и ответом',
+        },
     },
     'music': {
         'control': {
@@ -319,6 +366,9 @@ CFG_DSC = {
         'tts_size': {
             'name': '',
         },
+        'stt_ttl': {
+            'name': 'Сколько часов хранить результаты распознавания образцов при тестах и сравнении провайдеров, 0 - не хранить',
+        },
         'path': {
             'name': '',
         },
@@ -326,7 +376,13 @@ CFG_DSC = {
     'models': {
         'allow': {
             'name': '',
-        }
+        },
+        'sensitivity': {
+            'name': 'Чувствительность моделей, model:0.5 через запятую',
+        },
+        'audio_gain': {
+            'name': 'Усиление моделей, model:1.5 через запятую',
+        },
     },
     'persons': {},
     'proxy': {
@@ -394,6 +450,13 @@ CFG_DSC = {
             'name': '',
             'options': VAD_LVL,
         },
+        'aec_type': {
+            'name': 'Эхоподавление',
+            'options': [0, 1, 2],
+        },
+        'aec_reference': {
+            'name': 'Эхоподавление по сигналу плеера',
+        },
     },
     'plugins': {
         'enable': {
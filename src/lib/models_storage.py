@@ -1,13 +1,19 @@
 
 
+from utils import str_to_list
+
+
 class ModelsStorage(list):
     STRIP = ',.!? '
     SEP = '|'
     _EMPTY = '<NOPE>'
+    # Опции моделей в [models], формат: model1.pmdl:0.5, model2.pmdl:0.6
+    OPTIONS = {'sensitivity': (0.0, 1.0), 'audio_gain': (0.1, 10.0)}
 
     def __init__(self, seq=(), phrases=None, models=(), no_models=False):
         super().__init__(seq)
         self._phrases, self._opt_phrases, self._models = {}, {}, models
+        self._options = {}
         self.no_models = no_models
         if self.no_models:
             self.clear()
@@ -15,6 +21,7 @@ class ModelsStorage(list):
             self.append(self._EMPTY)
         else:
             self._init_phrases(phrases or {})
+            self._init_options(phrases or {})
         assert len(self) == len(self._models)
 
     def _init_phrases(self, phrases: dict):
@@ -24,6 +31,25 @@ class ModelsStorage(list):
                 self._phrases[model] = data
                 self._opt_phrases[model] = [self._prep_text(x) for x in data]
 
+    def _init_options(self, phrases: dict):
+        for option, (min_, max_) in self.OPTIONS.items():
+            values = {}
+            for el in str_to_list(phrases.get(option)):
+                model, _, value = el.rpartition(':')
+                try:
+                    value = float(value)
+                except ValueError:
+                    continue
+                if model.strip() in self._models and min_ <= value <= max_:
+                    values[model.strip()] = value
+            if values:
+                self._options[option] = values
+
+    def per_model(self, option: str, default) -> tuple:
+        # Значения опции для каждой модели, в порядке моделей
+        values = self._options.get(option, {})
+        return tuple(values.get(model, default) for model in self._models)
+
     def model_info_by_id(self, model: int):
         if self.no_models:
             return (self._EMPTY,) * 3
@@ -0,0 +1,50 @@
+import time
+
+from lib.persistent_dict import PersistentDict
+
+
+class NoiseFloor(PersistentDict):
+    """
+    Порог EnergyDetectorVAD по микрофону и времени суток, чтобы не калибровать шум на каждом детекторе.
+    Сохраняется в data, переживает перезапуск. Обновляется после ожидания активации (там работает dynamic_energy).
+    """
+    FILE = 'noise_floor'
+    # Часов в одном интервале суток
+    BUCKET = 6
+    MAX_AGE = 7 * 24 * 3600
+
+    @classmethod
+    def _bucket(cls) -> str:
+        return str(time.localtime().tm_hour // cls.BUCKET)
+
+    @staticmethod
+    def _valid(key: str, val) -> bool:
+        return isinstance(val, dict)
+
+    def get(self, mic: str) -> float or None:
+        # Текущий интервал, или самый свежий для этого микрофона
+        with self._lock:
+            self._load()
+            buckets = self._data.get(mic)
+            if not buckets:
+                return None
+            deadline = time.time() - self.MAX_AGE
+            fresh = {key: val for key, val in buckets.items()
+                     if isinstance(val, list) and len(val) == 2 and val[1] > deadline and val[0] > 0}
+            if not fresh:
+                return None
+            bucket = self._bucket()
+            if bucket in fresh:
+                return fresh[bucket][0]
+            return max(fresh.values(), key=lambda x: x[1])[0]
+
+    def update(self, mic: str, threshold: int or None):
+        if not threshold:
+            return
+        with self._lock:
+            self._load()
+            self._data.setdefault(mic, {})[self._bucket()] = [threshold, int(time.time())]
+            self._changed = True
+
+    def _snapshot(self) -> dict:
+        return {key: dict(val) for key, val in self._data.items()}
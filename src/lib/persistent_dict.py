@@ -0,0 +1,44 @@
+import threading
+import time
+
+
+class PersistentDict:
+    """
+    Словарь в data (cfg.load_dict / cfg.save_dict): загружается при первом обращении,
+    изменения сохраняются не чаще SAVE_INTERVAL секунд, save(True) - сразу.
+    Наследники работают с self._data под self._lock, загрузка через _load, после изменений _changed = True.
+    """
+    FILE = ''
+    SAVE_INTERVAL = 600
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self._lock = threading.Lock()
+        self._data = None
+        self._changed = False
+        self._saved = time.time()
+
+    @staticmethod
+    def _valid(key: str, val) -> bool:
+        # Фильтр записей из файла
+        return True
+
+    def _snapshot(self) -> dict:
+        # Что сохранить, вызывается под блокировкой
+        return self._data.copy()
+
+    def _load(self):
+        if self._data is not None:
+            return
+        data = self.cfg.load_dict(self.FILE)
+        data = data if isinstance(data, dict) else {}
+        self._data = {key: val for key, val in data.items() if self._valid(key, val)}
+
+    def save(self, force=False):
+        with self._lock:
+            if not self._changed or not (force or time.time() - self._saved > self.SAVE_INTERVAL):
+                return
+            self._changed = False
+            self._saved = time.time()
+            data = self._snapshot()
+        self.cfg.save_dict(self.FILE, data)
@@ -1,9 +1,12 @@
+import audioop
 import os
 import platform
+import queue
 import shutil
 import subprocess
 import threading
 import time
+import wave
 
 CMD = {
     '.mp3': ['mpg123', '-q'],
@@ -11,6 +14,11 @@ CMD = {
     '.opus': ['opusdec', '--quiet', '--force-wav', '-', '-']
 }
 BACKENDS = {}
+# Декодеры в 16 kHz mono s16 для опорного сигнала эхоподавления
+TAP_CMD = {
+    '.mp3': ['mpg123', '-q', '-s', '-m', '-r', '16000', '{}'],
+    '.opus': ['opusdec', '--quiet', '--rate', '16000', '{}', '-'],
+}
 
 
 def init_backends():
@@ -49,11 +57,89 @@ def win_vlc() -> str:
 init_backends()
 
 
+class TapDecoder(threading.Thread):
+    """Декодирует то, что играет плеер, и отдает PCM в PlaybackTap. Файл читает сам, поток получает через write."""
+    CHUNK = 3200
+
+    def __init__(self, ext: str, tap, path=None):
+        super().__init__(daemon=True)
+        self._tap = tap
+        self._session = tap.begin()
+        self._popen = None
+        self._input = None
+        self._wav = ext == '.wav'
+        if self._wav:
+            if path:
+                self._output = open(path, 'rb')
+            else:
+                read, write = os.pipe()
+                self._output, self._input = os.fdopen(read, 'rb'), os.fdopen(write, 'wb')
+        else:
+            cmd = [x.format(path or '-') for x in TAP_CMD[ext]]
+            stdin = None if path else subprocess.PIPE
+            self._popen = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            self._input, self._output = self._popen.stdin, self._popen.stdout
+        self.start()
+
+    @staticmethod
+    def supported(ext: str) -> bool:
+        return ext == '.wav' or (ext in TAP_CMD and shutil.which(TAP_CMD[ext][0]) is not None)
+
+    def write(self, data: bytes):
+        try:
+            self._input and self._input.write(data)
+        except (OSError, ValueError):
+            pass
+
+    def close(self):
+        try:
+            self._input and self._input.close()
+        except (OSError, ValueError):
+            pass
+
+    def kill(self):
+        self.close()
+        if self._popen:
+            self._popen.kill()
+
+    def run(self):
+        try:
+            if self._wav:
+                self._read_wav()
+            else:
+                data = self._output.read(self.CHUNK)
+                while data:
+                    self._tap.feed(data, self._session)
+                    data = self._output.read(self.CHUNK)
+        except (OSError, EOFError, wave.Error):
+            pass
+        finally:
+            self._output.close()
+            if self._popen:
+                self._popen.wait()
+
+    def _read_wav(self):
+        with wave.open(self._output, 'rb') as fp:
+            width, channels, rate = fp.getsampwidth(), fp.getnchannels(), fp.getframerate()
+            state = None
+            data = fp.readframes(self.CHUNK)
+            while data:
+                if channels > 1:
+                    data = audioop.tomono(data, width, 0.5, 0.5)
+                if width != 2:
+                    data = audioop.lin2lin(data, width, 2)
+                if rate != self._tap.RATE:
+                    data, state = audioop.ratecv(data, 2, 1, rate, self._tap.RATE, state)
+                self._tap.feed(data, self._session)
+                data = fp.readframes(self.CHUNK)
+
+
 class StreamPlayer(threading.Thread):
-    def __init__(self, popen, fp):
+    def __init__(self, popen, fp, tap=None):
         super().__init__()
         self._fp = fp
         self._popen = popen
+        self._tap = tap
         self.poll = self._popen.poll
         self.wait = self._popen.wait
         self.start()
@@ -61,12 +147,14 @@ class StreamPlayer(threading.Thread):
     def kill(self):
         self._fp.write(b'')
         self._popen.kill()
+        self._tap and self._tap.kill()
         if self.is_alive():
             super().join()
 
     def run(self):
         data = self._fp.read()
         while data and self.poll() is None:
+            self._tap and self._tap.write(data)
             try:
                 self._popen.write(data)
             except BrokenPipeError:
@@ -76,9 +164,97 @@ class StreamPlayer(threading.Thread):
                 # На всякий случай я увеличу размер чанка при стриминге wav до 4 KiB, но это не сильно помогает
                 break
             data = self._fp.read()
+        self._tap and self._tap.close()
         self._popen.close()
 
 
+class RemotePlayer(threading.Thread):
+    """
+    Воспроизведение на сателлите: TapDecoder декодирует в PCM, отправляем его в темпе проигрывания.
+    Для Player выглядит как Popen. sink.send(pcm, rate) -> bool, sink.stop() - сбросить недоигранное.
+    """
+    RATE = 16000
+    # На сколько секунд отправляем наперед
+    AHEAD = 0.3
+    # Сколько блоков декодера (несколько секунд) ждут отправки, дальше декодер ждет
+    QUEUE_SIZE = 30
+
+    def __init__(self, ext, file, stream, callback, sink):
+        super().__init__()
+        self._sink = sink
+        self._stream = stream
+        self._callback = callback
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._work = True
+        self._returncode = None
+        self._decoder = TapDecoder(ext, self, None if stream else file)
+        if stream:
+            threading.Thread(target=self._stream_feeder, daemon=True).start()
+        self.start()
+
+    @staticmethod
+    def begin() -> int:
+        return 0
+
+    def feed(self, pcm: bytes, _):
+        while self._work:
+            try:
+                return self._queue.put(pcm, timeout=0.1)
+            except queue.Full:
+                pass
+
+    def poll(self):
+        return self._returncode
+
+    def wait(self, timeout=None):
+        self.join(timeout)
+        if self.is_alive():
+            raise subprocess.TimeoutExpired('satellite', timeout)
+        return self._returncode
+
+    def kill(self):
+        if self._work:
+            self._work = False
+            self._stream and self._stream.write(b'')
+            self._decoder.kill()
+            self._sink.stop()
+
+    def _stream_feeder(self):
+        data = self._stream.read()
+        while data and self._work:
+            self._decoder.write(data)
+            data = self._stream.read()
+        self._decoder.close()
+
+    def run(self):
+        bytes_per_sec = self.RATE * 2
+        start, sent = None, 0
+        while self._work:
+            try:
+                pcm = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._decoder.is_alive() or not self._queue.empty():
+                    continue
+                break
+            now = time.time()
+            delay = (start or now) + sent / bytes_per_sec - self.AHEAD - now
+            if start is None or delay < -self.AHEAD:
+                # Начало или данные опоздали - отсчет заново
+                start, delay = now - sent / bytes_per_sec, 0
+            if delay > 0:
+                time.sleep(delay)
+            if not (self._work and self._sink.send(pcm, self.RATE)):
+                break
+            sent += len(pcm)
+        # Ждем пока сателлит доиграет
+        end = (start or 0) + sent / bytes_per_sec
+        while self._work and time.time() < end:
+            time.sleep(min(0.1, max(0.0, end - time.time())))
+        self._returncode = 0 if self._work else -9
+        self._work = False
+        self._callback and self._callback(False)
+
+
 class Popen(threading.Thread):
     def __init__(self, cmd, callback):
         self._one = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -166,7 +342,9 @@ def _get_cmd1(path):
     return cmd
 
 
-def get_popen(ext, file, stream, callback, backend=None):
+def get_popen(ext, file, stream, callback, backend=None, tap=None):
+    """tap - PlaybackTap, если нужен опорный сигнал для эхоподавления."""
+    tap = TapDecoder(ext, tap, None if stream else file) if tap and TapDecoder.supported(ext) else None
     file_path = '-' if stream else file
     if backend in BACKENDS:
         cmd1 = None
@@ -179,6 +357,6 @@ def get_popen(ext, file, stream, callback, backend=None):
         cmd1 = None
         cmd2 = _get_cmd2(ext, file_path)
     if stream:
-        return StreamPlayer(_select_popen(cmd1, cmd2, callback), stream)
+        return StreamPlayer(_select_popen(cmd1, cmd2, callback), stream, tap)
     else:
         return _select_popen(cmd1, cmd2, callback)
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+
+import logger
+from languages import F
+from utils import pretty_time
+
+POLICIES = ('static', 'failover', 'fastest')
+
+
+class _Stat:
+    def __init__(self, window):
+        # (успех, время ответа)
+        self.results = deque(maxlen=window)
+        self.failures = 0
+        self.opened = False
+        self.cooldown = 0
+        self.timer = None
+
+    def p95(self) -> float or None:
+        latency = sorted(x[1] for x in self.results if x[0])
+        if not latency:
+            return None
+        return latency[min(len(latency) - 1, int(len(latency) * 0.95))]
+
+    def failure_rate(self) -> float:
+        if not self.results:
+            return 0.0
+        return sum(1 for x in self.results if not x[0]) / len(self.results)
+
+
+class ProviderHealth:
+    """
+    Задержки и ошибки провайдеров, выбор провайдера и отключение сбоящих (circuit breaker).
+    Отключенный провайдер проверяется в фоне через probe(name) -> bool, интервал растет до MAX_COOLDOWN.
+    """
+    WINDOW = 20
+    MIN_SAMPLES = 3
+    FAILURES = 3
+    FAILURE_RATE = 0.5
+    COOLDOWN = 30
+    MAX_COOLDOWN = 600
+
+    def __init__(self, log, probe: callable):
+        self.log = log
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._work = True
+
+    def stop(self):
+        self._work = False
+        with self._lock:
+            for stat in self._stats.values():
+                if stat.timer:
+                    stat.timer.cancel()
+
+    def _get(self, name: str) -> _Stat:
+        if name not in self._stats:
+            self._stats[name] = _Stat(self.WINDOW)
+        return self._stats[name]
+
+    def record(self, name: str, success: bool, latency: float):
+        with self._lock:
+            stat = self._get(name)
+            stat.results.append((success, latency))
+            if success:
+                stat.failures = 0
+                if stat.opened:
+                    self._close(name, stat)
+            else:
+                stat.failures += 1
+                if not stat.opened and self._is_bad(stat):
+                    self._open(name, stat)
+
+    def available(self, providers: list) -> list:
+        # Если отключены все, остается основной
+        with self._lock:
+            result = [name for name in providers if not (name in self._stats and self._stats[name].opened)]
+        return result or providers[:1]
+
+    def select(self, providers: list, policy: str) -> str:
+        candidates = self.available(providers)
+        if policy != 'fastest' or len(candidates) < 2:
+            return candidates[0]
+        with self._lock:
+            p95 = {name: self._get(name).p95() for name in candidates}
+            # Сначала набираем статистику по всем
+            for name in candidates:
+                if p95[name] is None or len(self._stats[name].results) < self.MIN_SAMPLES:
+                    return name
+        return min(candidates, key=lambda x: p95[x])
+
+    def _is_bad(self, stat: _Stat) -> bool:
+        if stat.failures >= self.FAILURES:
+            return True
+        return len(stat.results) >= self.MIN_SAMPLES and stat.failure_rate() > self.FAILURE_RATE
+
+    def _open(self, name: str, stat: _Stat):
+        stat.opened = True
+        stat.cooldown = min(stat.cooldown * 2 or self.COOLDOWN, self.MAX_COOLDOWN)
+        self.log(F('Провайдер {} отключен, проверка через {}', name, pretty_time(stat.cooldown)), logger.WARN)
+        if self._work:
+            stat.timer = threading.Timer(stat.cooldown, self._probing, (name,))
+            stat.timer.daemon = True
+            stat.timer.start()
+
+    def _close(self, name: str, stat: _Stat):
+        stat.opened = False
+        stat.cooldown = 0
+        stat.failures = 0
+        # Окно с чистого листа, иначе старые ошибки сразу отключат провайдера снова. Задержки оставляем для p95
+        stat.results = deque((x for x in stat.results if x[0]), maxlen=stat.results.maxlen)
+        if stat.timer:
+            stat.timer.cancel()
+            stat.timer = None
+        self.log(F('Провайдер {} снова доступен', name), logger.INFO)
+
+    def _probing(self, name: str):
+        if not self._work:
+            return
+        w_time = time.time()
+        success = self._probe(name)
+        w_time = time.time() - w_time
+        with self._lock:
+            stat = self._get(name)
+            stat.timer = None
+            if not stat.opened:
+                return
+            if success:
+                stat.results.append((success, w_time))
+                self._close(name, stat)
+            else:
+                self._open(name, stat)
@@ -123,7 +123,9 @@ class SnowboyDetect(_object):
         except __builtin__.Exception:
             self.this = this
         self.SetAudioGain(audio_gain)
-        self.SetSensitivity(','.join([str(sensitivity)] * self.NumHotwords()).encode())
+        if not isinstance(sensitivity, (list, tuple)):
+            sensitivity = [sensitivity] * self.NumHotwords()
+        self.SetSensitivity(','.join(str(x) for x in sensitivity).encode())
         self.ApplyFrontend(apply_frontend)
 
     def Reset(self):
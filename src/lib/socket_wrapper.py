@@ -11,6 +11,7 @@ import hashlib
 import json
 import socket
 import ssl
+import struct
 import threading
 import time
 from contextlib import closing
@@ -37,6 +38,8 @@ GUID_STR = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
 PLATFORM = platform.system().capitalize()
 
 CRLF = b'\r\n'
+# Заголовок кадра бинарного режима в TCP: тип (0 - bytes, 1 - str в utf-8) и длина
+FRAME_HEADER = '>BI'
 AUTH_FAILED = 'Terminal rejected connection (incorrect ws_token?). BYE!'
 ALL_EXCEPTS = (OSError, websocket.WebSocketException, TypeError, ValueError, AttributeError)
 
@@ -265,6 +268,71 @@ class Connect:
                 continue
             yield chunk
 
+    def read_frames(self):
+        """
+        Генератор для бинарного режима, возвращает bytes или str.
+        В веб-сокете это бинарные и текстовые фреймы, в TCP перед каждым кадром идет FRAME_HEADER.
+        Любая ошибка сокета или закрытие соединения прерывает итерацию.
+        """
+        while self._conn:
+            try:
+                with self._recv_lock:
+                    kind, data = self._ws_read_frame() if self._is_ws else self._tcp_read_frame()
+            except (struct.error, *ALL_EXCEPTS):
+                break
+            if kind is None:
+                break
+            if kind:
+                yield data.decode('utf-8', errors='replace')
+            else:
+                yield data
+
+    def _ws_read_frame(self) -> tuple:
+        with self._conn.readlock:
+            opcode, data = self._conn.recv_data()
+        if opcode == websocket.ABNF.OPCODE_BINARY:
+            return 0, data
+        elif opcode == websocket.ABNF.OPCODE_TEXT:
+            return 1, data
+        return None, None
+
+    def _tcp_read_frame(self) -> tuple:
+        kind, size = struct.unpack(FRAME_HEADER, self._tcp_recv(struct.calcsize(FRAME_HEADER)))
+        return kind, self._tcp_recv(size)
+
+    def _tcp_recv(self, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = self._conn.recv(size - len(data))
+            if not chunk:
+                raise OSError('remote socket closed')
+            data += chunk
+        return data
+
+    def write_frame(self, data: bytes or str or dict):
+        """
+        Отправляет кадр бинарного режима: bytes как есть, dict -> json, str в utf-8.
+        В любой непонятной ситуации кидает RuntimeError.
+        """
+        if not self._conn:
+            return
+        if isinstance(data, (dict, list)):
+            try:
+                data = json.dumps(data, ensure_ascii=False)
+            except TypeError as e:
+                raise RuntimeError(e)
+        if not isinstance(data, (bytes, str)):
+            raise RuntimeError('Unsupported data type: {}'.format(repr(type(data))))
+        with self._send_lock:
+            try:
+                if self._is_ws:
+                    self._conn.send_binary(data) if isinstance(data, bytes) else self._conn.send(data)
+                else:
+                    kind, data = (0, data) if isinstance(data, bytes) else (1, data.encode())
+                    self._conn.sendall(struct.pack(FRAME_HEADER, kind, len(data)) + data)
+            except ALL_EXCEPTS as e:
+                raise RuntimeError(e)
+
     def _ws_auth(self, chunk) -> bool:
         if self._ws_allow(self.ip, self.port, chunk):
             self._conn.auth = True
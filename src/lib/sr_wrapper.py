@@ -34,6 +34,7 @@ import speech_recognition
 
 from .audio_utils import APMSettings, MicrophoneStreamAPM, MicrophoneStream, StreamRecognition, RMS, StreamDetector
 from .proxy import proxies
+from .virtual_mic import VirtualMic
 
 AudioData = speech_recognition.AudioData
 AudioSource = speech_recognition.AudioSource
@@ -49,12 +50,31 @@ class Interrupted(Exception):
 
 class Microphone(speech_recognition.Microphone):
     DEFAULT_RATE = 16000
-
-    def __init__(self, device_index=None, _=None, chunk_size=1024):
-        super().__init__(device_index, self.DEFAULT_RATE, chunk_size)
+    DEFAULT_CHUNK = 1024
+    # Размер блока захвата в семплах, Listener выравнивает его под кадр детекторов
+    chunk_size = DEFAULT_CHUNK
+    # (uri, realtime) виртуального микрофона, тогда PyAudio не нужен
+    virtual = None
+
+    def __init__(self, device_index=None, _=None, chunk_size=None):
+        if not self.virtual:
+            super().__init__(device_index, self.DEFAULT_RATE, chunk_size or Microphone.chunk_size)
+            return
+        self.device_index = device_index
+        self.SAMPLE_WIDTH = 2
+        self.SAMPLE_RATE = self.DEFAULT_RATE
+        self.CHUNK = chunk_size or Microphone.chunk_size
+        self.audio = None
+        self.stream = None
 
     def __enter__(self):
         assert self.stream is None, "This audio source is already inside a context manager"
+        if self.virtual:
+            self.stream = Microphone.get_microphone_stream(
+                VirtualMic.get(*self.virtual, self.SAMPLE_RATE, self.SAMPLE_WIDTH).open(),
+                self.SAMPLE_WIDTH, self.SAMPLE_RATE
+            )
+            return self
         self.audio = self.pyaudio_module.PyAudio()
         try:
             self.stream = Microphone.get_microphone_stream(
@@ -69,6 +89,20 @@ class Microphone(speech_recognition.Microphone):
             raise
         return self
 
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.audio:
+            return super().__exit__(exc_type, exc_value, traceback)
+        try:
+            self.stream.close()
+        finally:
+            self.stream = None
+
+    @classmethod
+    def set_virtual(cls, uri: str, pacing: str):
+        cls.virtual = (uri, pacing != 'fast') if uri else None
+        if not cls.virtual:
+            VirtualMic.close_all()
+
     @classmethod
     def get_microphone_stream(cls, pyaudio_stream, width, rate):
         if APMSettings().enable:
@@ -76,8 +110,26 @@ class Microphone(speech_recognition.Microphone):
         else:
             return MicrophoneStream(pyaudio_stream)
 
+    @staticmethod
+    def list_microphone_names():
+        if Microphone.virtual:
+            return [Microphone.virtual[0]]
+        return speech_recognition.Microphone.list_microphone_names()
+
+    @staticmethod
+    def device_count() -> int:
+        if Microphone.virtual:
+            return 1
+        audio = Microphone.get_pyaudio().PyAudio()
+        try:
+            return audio.get_device_count()
+        finally:
+            audio.terminate()
+
     @staticmethod
     def get_microphone_name(index=None):
+        if Microphone.virtual:
+            return Microphone.virtual[0]
         audio = Microphone.get_pyaudio().PyAudio()
         try:
             info = audio.get_default_input_device_info() if index is None else audio.get_device_info_by_index(index)
@@ -88,10 +140,90 @@ class Microphone(speech_recognition.Microphone):
             audio.terminate()
 
 
+def trim_silence(data: bytes, width: int, rate: int, leading=True, trailing=True, keep=0.2) -> bytes:
+    """
+    Обрезает тишину в начале и конце с точностью до семпла, оставляя keep секунд.
+    Порог считается по самым тихим окнам записи, если речь не найдена - возвращает как есть.
+    """
+    window = int(rate * 0.01) * width
+    if not data or window < width or len(data) < window * 4:
+        return data
+    energy = [audioop.rms(data[x:x + window], width) for x in range(0, len(data) - window + 1, window)]
+    threshold = max(50, sorted(energy)[len(energy) // 10] * 3)
+    loud = [idx for idx, val in enumerate(energy) if val > threshold]
+    if not loud:
+        return data
+    keep = int(rate * keep) * width
+    start, end = 0, len(data)
+    if leading:
+        offset = loud[0] * window
+        chunk = data[offset:offset + window]
+        # Первый громкий семпл в окне
+        sample = next((x for x in range(len(chunk) // width) if abs(audioop.getsample(chunk, width, x)) > threshold), 0)
+        start = max(0, offset + sample * width - keep)
+    if trailing:
+        offset = loud[-1] * window
+        chunk = data[offset:offset + window]
+        count = len(chunk) // width
+        sample = next(
+            (x for x in range(count - 1, -1, -1) if abs(audioop.getsample(chunk, width, x)) > threshold), count - 1
+        )
+        end = min(len(data), offset + (sample + 1) * width + keep)
+    return data[start:end]
+
+
+class Endpointer:
+    """
+    Конец фразы по VAD, спаду энергии и стабильности partial STT.
+    Если энергия после речи падает, а partial не меняется, ждет меньше pause_threshold.
+    Выключенный работает как обычный счетчик пауз.
+    """
+    # Минимальная пауза, доля от pause_threshold
+    MIN_PAUSE = 0.35
+    # Энергия тишины относительно средней энергии речи
+    ENERGY_DROP = 0.25
+
+    def __init__(self, pause_buffer_count: int, seconds_per_buffer: float, width: int, enable=True):
+        self._pause = pause_buffer_count
+        self._min_pause = max(1, int(math.ceil(pause_buffer_count * self.MIN_PAUSE)))
+        self._seconds_per_buffer = seconds_per_buffer
+        self._width = width
+        self._enable = enable
+        self._speech_energy = None
+        self._tail = collections.deque(maxlen=3)
+        self.pause_count = 0
+
+    def end(self, buffer: bytes, is_speech: bool, partial_age=0.0) -> bool:
+        if not self._enable:
+            self.pause_count = 0 if is_speech else self.pause_count + 1
+            return self.pause_count > self._pause
+        energy = audioop.rms(buffer, self._width)
+        if is_speech:
+            self.pause_count = 0
+            self._tail.clear()
+            self._speech_energy = energy if self._speech_energy is None else self._speech_energy * 0.9 + energy * 0.1
+            return False
+        self.pause_count += 1
+        self._tail.append(energy)
+        return self.pause_count > self._required(partial_age)
+
+    def _required(self, partial_age: float) -> int:
+        # Распознанный текст не меняется половину паузы - фраза закончена
+        if partial_age >= self._pause * self._seconds_per_buffer / 2:
+            return self._min_pause
+        # Энергия упала и не растет - конец фразы, а не пауза между словами
+        if self._speech_energy and len(self._tail) == self._tail.maxlen:
+            tail = list(self._tail)
+            if tail[-1] < self._speech_energy * self.ENERGY_DROP and all(a >= b for a, b in zip(tail, tail[1:])):
+                return (self._pause + self._min_pause) // 2
+        return self._pause
+
+
 class Recognizer(speech_recognition.Recognizer):
-    def __init__(self, record_callback=None, silent_multiplier=1.0):
+    def __init__(self, record_callback=None, silent_multiplier=1.0, endpointer=False):
         super().__init__()
         self._record_callback = record_callback
+        self._endpointer = endpointer
 
         silent_multiplier = min(5.0, max(0.1, silent_multiplier))
         self.pause_threshold *= silent_multiplier
@@ -125,6 +257,7 @@ class Recognizer(speech_recognition.Recognizer):
         pause_count = 0
         buffer = b''  # an empty buffer means that the stream has ended and there is no data left to read
         send_record_starting = False
+        endpointer = None
         # Use snowboy to words detecting instead of energy_threshold
         while True:
             frames = collections.deque()
@@ -159,7 +292,8 @@ class Recognizer(speech_recognition.Recognizer):
                 hw_buffer, hw_time = None, None
 
             # read audio input until the phrase ends
-            pause_count, phrase_count = 0, 0
+            phrase_count = 0
+            endpointer = Endpointer(pause_buffer_count, seconds_per_buffer, source.SAMPLE_WIDTH, self._endpointer)
             phrase_start_time = elapsed_time
             if self._record_callback and not send_record_starting:
                 send_record_starting = True
@@ -177,14 +311,11 @@ class Recognizer(speech_recognition.Recognizer):
                 phrase_count += 1
 
                 # check if speaking has stopped for longer than the pause threshold on the audio input
-                if vad.is_speech(buffer):
-                    pause_count = 0
-                else:
-                    pause_count += 1
-                if pause_count > pause_buffer_count:  # end of the phrase
+                if endpointer.end(buffer, vad.is_speech(buffer)):  # end of the phrase
                     break
 
             # check how long the detected phrase is, and retry listening if the phrase is too short
+            pause_count = endpointer.pause_count
             phrase_count -= pause_count  # exclude the buffers for the pause before the phrase
             if phrase_count >= phrase_buffer_count or len(buffer) == 0:
                 break  # phrase is long enough or we've reached the end of the stream, so stop listening
@@ -193,6 +324,8 @@ class Recognizer(speech_recognition.Recognizer):
         for i in range(pause_count - non_speaking_buffer_count):
             frames.pop()  # remove extra non-speaking frames at the end
         frame_data = b"".join(frames)
+        if self._endpointer:
+            frame_data = trim_silence(frame_data, source.SAMPLE_WIDTH, source.SAMPLE_RATE)
         if self._record_callback and send_record_starting:
             self._record_callback(False)
         return AudioData(frame_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
@@ -233,6 +366,11 @@ class Recognizer(speech_recognition.Recognizer):
                     # detect whether speaking has started on audio input
                     silent_frames.append(buffer)
                     if vad.is_speech(buffer):
+                        if self._endpointer:
+                            # Тишину перед фразой не отправляем, только небольшой запас
+                            silent_frames = [trim_silence(
+                                b''.join(silent_frames), source.SAMPLE_WIDTH, source.SAMPLE_RATE, trailing=False
+                            )]
                         if voice_recognition.ready:
                             voice_recognition.write(b''.join(silent_frames))
                         else:
@@ -248,7 +386,10 @@ class Recognizer(speech_recognition.Recognizer):
                 hw_buffer, hw_time = None, None
 
             # read audio input until the phrase ends
-            pause_count, phrase_count = 0, 0
+            phrase_count = 0
+            endpointer = Endpointer(pause_buffer_count, seconds_per_buffer, source.SAMPLE_WIDTH, self._endpointer)
+            # Последний кусок речи и тишина после него придерживаются до следующей речи или конца фразы
+            pending = []
             phrase_start_time = elapsed_time
             if self._record_callback and not send_record_starting:
                 send_record_starting = True
@@ -268,18 +409,25 @@ class Recognizer(speech_recognition.Recognizer):
                 if phrase_time_limit and elapsed_time - phrase_start_time >= phrase_time_limit:
                     break
 
-                voice_recognition.write(buffer)
                 phrase_count += 1
-
-                if vad.is_speech(buffer):
-                    pause_count = 0
+                is_speech = vad.is_speech(buffer)
+                if not self._endpointer:
+                    voice_recognition.write(buffer)
+                elif is_speech:
+                    pending and voice_recognition.write(b''.join(pending))
+                    pending = [buffer]
                 else:
-                    pause_count += 1
-                if pause_count > pause_buffer_count:  # end of the phrase
+                    pending.append(buffer)
+
+                if endpointer.end(buffer, is_speech, voice_recognition.partial_age()):  # end of the phrase
                     break
+            if pending:
+                voice_recognition.write(trim_silence(
+                    b''.join(pending), source.SAMPLE_WIDTH, source.SAMPLE_RATE, leading=False
+                ))
 
             # check how long the detected phrase is, and retry listening if the phrase is too short
-            phrase_count -= pause_count  # exclude the buffers for the pause before the phrase
+            phrase_count -= endpointer.pause_count  # exclude the buffers for the pause before the phrase
             if phrase_count >= phrase_buffer_count or len(buffer) == 0:
                 break  # phrase is long enough or we've reached the end of the stream, so stop listening
 
@@ -342,6 +490,8 @@ class EnergyDetectorVAD:
         self._seconds_per_buffer = None
         self._rms = RMS(width) if rms else None
         self.set_rate(rate)
+        # Порог подбирается автоматически
+        self.auto_energy = not energy_lvl
         if not energy_lvl:
             self._energy_threshold = 500
             self._energy = None
@@ -357,6 +507,11 @@ class EnergyDetectorVAD:
     def set_rate(self, rate: int):
         self._seconds_per_buffer = self._chunk_size / rate
 
+    def set_noise_floor(self, energy_threshold):
+        # Готовый порог вместо калибровки
+        self._energy_threshold = energy_threshold
+        self._energy = energy_threshold / self.dynamic_energy_ratio
+
     def force_adjust_for_ambient_noise(self, source):
         if self._energy is None:
             stream = source.stream
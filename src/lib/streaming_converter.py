@@ -3,6 +3,7 @@ import subprocess
 import threading
 import wave
 from collections import deque
+from functools import lru_cache
 from io import BytesIO
 
 from .sr_wrapper import AudioData, get_flac_converter
@@ -14,6 +15,28 @@ CMD = {
 }
 
 
+def _loader_flac():
+    import numpy
+    import pyflac
+    return numpy, pyflac
+
+
+def _loader_opus():
+    import soundfile
+    if 'OPUS' not in soundfile.available_subtypes('OGG'):
+        raise ImportError('libsndfile built without opus')
+    return soundfile
+
+
+@lru_cache(maxsize=None)
+def _codec(name: str):
+    # Кодеки внутри процесса не обязательны, без них работают CMD
+    try:
+        return globals()['_loader_{}'.format(name)]()
+    except Exception:
+        return None
+
+
 class AudioConverter(threading.Thread):
     IN_CHUNK_SIZE = 1024 * 8
 
@@ -74,12 +97,15 @@ class AudioConverter(threading.Thread):
             except BrokenPipeError:
                 return False
         else:
-            self._stream.write(data)
+            try:
+                self._stream.write(data)
+            except BrokenPipeError:
+                return False
         return True
 
     def _start_processing(self):
         self._stream = self._get_stream()
-        if self._format != 'pcm':
+        if self._format != 'pcm' and not isinstance(self._stream, _StreamEncoder):
             self._wave = _WaveWrite(self._stream)
             self._wave.setnchannels(1)
             self._wave.setsampwidth(self._sample_width)
@@ -92,6 +118,12 @@ class AudioConverter(threading.Thread):
         self._stream.end()
 
     def _get_stream(self):
+        if self._format in ENCODERS and self._sample_width == 2 and _codec(self._format):
+            # noinspection PyBroadException
+            try:
+                return ENCODERS[self._format](self._sample_rate)
+            except Exception:
+                pass
         if self._format in CMD:
             return _StreamPopen(CMD[self._format])
         else:
@@ -135,14 +167,14 @@ class _StreamPipe(_Stream):
 
     def read(self) -> bytes:
         while True:
-            self._event.wait(1)
+            # Сначала сбрасываем событие: write или end после проверки его выставят и wait не уснет
+            self._event.clear()
             try:
                 return self._pipe.popleft()
             except IndexError:
                 if self._closed:
                     return b''
-                else:
-                    self._event.clear()
+            self._event.wait(1)
 
     def write(self, data: bytes):
         self._pipe.append(data)
@@ -153,6 +185,175 @@ class _StreamPipe(_Stream):
         self._closed = True
 
 
+class _StreamEncoder(_Stream):
+    """Кодирует 16-bit mono PCM в том же потоке, без процесса, чтения stdout и лишних копий."""
+    def __init__(self):
+        self._stream = _StreamPipe()
+        self._closed = False
+
+    def read(self) -> bytes:
+        return self._stream.read()
+
+    def write(self, data: bytes):
+        try:
+            self._encode(data)
+        except Exception as e:
+            raise BrokenPipeError(e)
+
+    def end(self):
+        if self._closed:
+            return
+        self._closed = True
+        # noinspection PyBroadException
+        try:
+            self._finish()
+        except Exception:
+            pass
+        self._stream.end()
+
+    def _put(self, data: bytes):
+        if data:
+            self._stream.write(bytes(data))
+
+    def _encode(self, data: bytes):
+        raise NotImplementedError
+
+    def _finish(self):
+        raise NotImplementedError
+
+
+class _EncoderFLAC(_StreamEncoder):
+    def __init__(self, rate):
+        super().__init__()
+        self._numpy, pyflac = _codec('flac')
+        self._encoder = pyflac.StreamEncoder(
+            sample_rate=rate, write_callback=self._callback, compression_level=8
+        )
+
+    def _callback(self, buffer: bytes, *_):
+        self._put(buffer)
+
+    def _encode(self, data: bytes):
+        self._encoder.process(self._numpy.frombuffer(data, dtype=self._numpy.int16))
+
+    def _finish(self):
+        self._encoder.finish()
+
+
+class _EncoderOpus(_StreamEncoder):
+    def __init__(self, rate):
+        super().__init__()
+        soundfile = _codec('opus')
+        self._file = soundfile.SoundFile(_Sink(self._put), 'w', rate, 1, 'OPUS', format='OGG')
+
+    def _encode(self, data: bytes):
+        self._file.buffer_write(data, 'int16')
+
+    def _finish(self):
+        self._file.close()
+
+
+class _Sink(_Stream):
+    # Файл только для записи без перемотки, для libsndfile
+    def __init__(self, callback):
+        self._callback = callback
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._callback(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if (offset if whence == 0 else self._position + offset) != self._position:
+            raise OSError('Unseekable stream')
+        return self._position
+
+    @staticmethod
+    def read(*_):
+        return b''
+
+
+ENCODERS = {'flac': _EncoderFLAC, 'opus': _EncoderOpus}
+
+
+class _PopenPool:
+    """
+    Заранее запущенные кодировщики, по SIZE на команду.
+    Пул для команды появляется после первого запроса и пополняется в фоне, одним потоком на команду.
+    """
+    SIZE = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = {}
+        self._filling = set()
+
+    def get(self, cmd: list) -> subprocess.Popen:
+        key = tuple(cmd)
+        popen = None
+        with self._lock:
+            pool = self._pool.setdefault(key, deque())
+            while pool and popen is None:
+                popen = pool.popleft()
+                if popen.poll() is not None:
+                    self._kill(popen)
+                    popen = None
+            fill = key not in self._filling
+            self._filling.add(key)
+        if fill:
+            threading.Thread(target=self._fill, args=(key,), daemon=True).start()
+        return popen or self._spawn(key)
+
+    def clear(self):
+        with self._lock:
+            for pool in self._pool.values():
+                while pool:
+                    self._kill(pool.popleft())
+            self._pool.clear()
+
+    def _fill(self, key: tuple):
+        try:
+            while True:
+                with self._lock:
+                    if key not in self._pool or len(self._pool[key]) >= self.SIZE:
+                        return
+                try:
+                    popen = self._spawn(key)
+                except OSError:
+                    return
+                with self._lock:
+                    # Пул могли очистить или заполнить, пока процесс запускался
+                    if key in self._pool and len(self._pool[key]) < self.SIZE:
+                        self._pool[key].append(popen)
+                        continue
+                self._kill(popen)
+                return
+        finally:
+            with self._lock:
+                self._filling.discard(key)
+
+    @staticmethod
+    def _spawn(cmd) -> subprocess.Popen:
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE)
+
+    @staticmethod
+    def _kill(popen: subprocess.Popen):
+        for fp in (popen.stdin, popen.stdout):
+            try:
+                fp.close()
+            except OSError:
+                pass
+        popen.kill()
+        popen.wait()
+
+
+POPEN_POOL = _PopenPool()
+
+
 class _StreamPopen(threading.Thread, _Stream):
     OUT_CHUNK_SIZE = 1024 * 4
     POPEN_TIMEOUT = 10
@@ -160,7 +361,7 @@ class _StreamPopen(threading.Thread, _Stream):
 
     def __init__(self, cmd):
         super().__init__()
-        self._popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE)
+        self._popen = POPEN_POOL.get(cmd)
         self._stream = _StreamPipe()
         self._closed = False
         self.start()
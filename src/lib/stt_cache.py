@@ -0,0 +1,60 @@
+import hashlib
+import time
+
+from lib.persistent_dict import PersistentDict
+
+
+class STTCache(PersistentDict):
+    """
+    Результаты распознавания по отпечатку звука (PCM + провайдер + язык), чтобы не отправлять одно и то же повторно:
+    тесты образцов и сравнение провайдеров, живые фразы не кэшируются. Пустые результаты не сохраняются.
+    Срок жизни stt_ttl часов, 0 - выключено.
+    """
+    FILE = 'stt_cache'
+    MAX_SIZE = 1000
+
+    @property
+    def _ttl(self) -> int:
+        return self.cfg.gt('cache', 'stt_ttl', 0) * 3600
+
+    @staticmethod
+    def fingerprint(frame_data: bytes, rate: int, width: int, provider: str, lang: str) -> str:
+        hash_ = hashlib.sha1(frame_data)
+        hash_.update('{}:{}:{}:{}'.format(rate, width, provider, lang).encode())
+        return hash_.hexdigest()
+
+    @staticmethod
+    def _valid(key: str, val) -> bool:
+        return isinstance(val, list) and len(val) == 2 and isinstance(val[0], str) and isinstance(val[1], int)
+
+    def get(self, key: str or None) -> str or None:
+        ttl = self._ttl
+        if not (key and ttl > 0):
+            return None
+        with self._lock:
+            self._load()
+            val = self._data.get(key)
+            if val is None:
+                return None
+            if val[1] < time.time() - ttl:
+                del self._data[key]
+                self._changed = True
+                return None
+            return val[0]
+
+    def set(self, key: str or None, text: str):
+        if not (key and self._ttl > 0):
+            return
+        with self._lock:
+            self._load()
+            self._data[key] = [text, int(time.time())]
+            if len(self._data) > self.MAX_SIZE:
+                # Выкидываем самые старые
+                for old in sorted(self._data, key=lambda x: self._data[x][1])[:len(self._data) - self.MAX_SIZE]:
+                    del self._data[old]
+            self._changed = True
+        self.save()
+
+    def _snapshot(self) -> dict:
+        deadline = time.time() - self._ttl
+        return {key: val for key, val in self._data.items() if val[1] > deadline}
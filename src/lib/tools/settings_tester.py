@@ -1,3 +1,6 @@
+from lib.virtual_mic import PACING, parse_uri
+from utils import parse_preroll
+
 
 SETTINGS_TESTER = {
     # Если кинет исключение, вернет строку или False - плохая настройка, игнорируем ее.
@@ -6,6 +9,9 @@ SETTINGS_TESTER = {
         'audio_gain': lambda x: min_max(x, 0.1, 10),
         'sensitivity': lambda x: min_max(x, 0.0, 1),
         'mic_index': lambda x: min_max(x, min_=-1),
+        'virtual_mic': lambda x: parse_uri(x) and None if x else None,
+        'virtual_mic_pacing': lambda x: None if x in PACING else 'Must be {}'.format(' or '.join(PACING)),
+        'tts_preroll': lambda x: parse_preroll(x) and None,
         'ask_me_again': lambda x: min_max(x, min_=0),
         'phrase_time_limit': lambda x: min_max(x, min_=1),
         'silent_multiplier': lambda x: min_max(x, 0.1, 5.0),
@@ -13,10 +19,15 @@ SETTINGS_TESTER = {
     'listener': {
         'vad_lvl': lambda x: min_max(x, 1, 3),
         'speech_timeout': lambda x: min_max(x, min_=0),
+        'chunk_size': lambda x: min_max(x, 0, 8192),
     },
     'smarthome': {
         'heartbeat_timeout': lambda x: min_max(x, min_=0),
         'pool_size': lambda x: min_max(x, min_=0),
+        'satellites': lambda x: min_max(x, min_=0),
+    },
+    'cache': {
+        'stt_ttl': lambda x: min_max(x, min_=0),
     },
     'log': {
         'method': lambda x: min_max(x, 0, 3),
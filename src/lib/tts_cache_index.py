@@ -0,0 +1,109 @@
+import os
+import zlib
+
+from lib.persistent_dict import PersistentDict
+
+
+class TTSCacheIndex(PersistentDict):
+    """
+    Размер и crc32 файлов tts кэша, попадание в кэш засчитывается только если файл совпадает с записью.
+    Файлы без записи (старый кэш, сбой до сохранения индекса) считаются промахом, пока их не примет adopt.
+    """
+    FILE = 'tts_cache_index'
+    SAVE_INTERVAL = 60
+    BLOCK = 1024 * 64
+
+    @classmethod
+    def checksum(cls, path: str) -> list:
+        crc, size = 0, 0
+        with open(path, 'rb') as fp:
+            data = fp.read(cls.BLOCK)
+            while data:
+                crc = zlib.crc32(data, crc)
+                size += len(data)
+                data = fp.read(cls.BLOCK)
+        return [size, crc]
+
+    @staticmethod
+    def _valid(key: str, val) -> bool:
+        return isinstance(val, list) and len(val) == 2 and all(isinstance(x, int) for x in val)
+
+    def add(self, path: str, record: list):
+        with self._lock:
+            self._load()
+            self._data[os.path.basename(path)] = record
+            self._changed = True
+        self.save()
+
+    def valid(self, path: str) -> bool or None:
+        # None - записи нет, False - файл поврежден (запись удаляется)
+        name = os.path.basename(path)
+        with self._lock:
+            self._load()
+            record = self._data.get(name)
+        if record is None:
+            return None
+        try:
+            if os.path.getsize(path) == record[0] and self.checksum(path) == record:
+                return True
+        except OSError:
+            pass
+        self.remove(name)
+        return False
+
+    def remove(self, name: str):
+        with self._lock:
+            self._load()
+            if self._data.pop(name, None) is not None:
+                self._changed = True
+
+    def adopt(self, paths: list):
+        # Файлы без записи, прошедшие проверку размера, принимаем как есть
+        with self._lock:
+            self._load()
+            paths = [path for path in paths if os.path.basename(path) not in self._data]
+        for path in paths:
+            try:
+                record = self.checksum(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._data[os.path.basename(path)] = record
+                self._changed = True
+        self.save()
+
+    def prune(self, files: list):
+        # Оставляем записи только для существующих файлов
+        files = set(files)
+        with self._lock:
+            self._load()
+            for name in [name for name in self._data if name not in files]:
+                del self._data[name]
+                self._changed = True
+        self.save()
+
+
+class ChecksumWriter:
+    """Файл для записи, попутно считает размер и crc32 для TTSCacheIndex."""
+    def __init__(self, path: str):
+        self._fp = open(path, 'wb')
+        self.name = path
+        self._crc, self._size = 0, 0
+
+    @property
+    def record(self) -> list:
+        return [self._size, self._crc]
+
+    def write(self, data: bytes):
+        self._fp.write(data)
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+
+    def flush(self):
+        self._fp.flush()
+
+    def fileno(self) -> int:
+        return self._fp.fileno()
+
+    def close(self):
+        self._fp.close()
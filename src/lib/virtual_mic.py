@@ -0,0 +1,254 @@
+import audioop
+import os
+import socket
+import stat
+import threading
+import time
+import wave
+
+PACING = ('realtime', 'fast')
+
+
+def parse_uri(uri: str) -> tuple:
+    # wav:path, pcm:path (сырой s16le mono, файл или FIFO), tcp:host:port, satellite[:name].
+    # Путь к .wav можно без схемы
+    scheme, _, target = uri.partition(':')
+    scheme = scheme.lower()
+    if scheme == 'tcp':
+        host, _, port = target.rpartition(':')
+        try:
+            return scheme, (host.strip('[]') or '127.0.0.1', int(port))
+        except ValueError:
+            pass
+    elif scheme in ('wav', 'pcm') and target:
+        return scheme, target
+    elif scheme == 'satellite':
+        # Сателлиты, подключенные к серверу терминала. Можно указать имя одного
+        return scheme, target
+    elif uri.lower().endswith('.wav'):
+        return 'wav', uri
+    raise RuntimeError('Wrong virtual microphone: {}'.format(repr(uri)))
+
+
+class _WavSource:
+    def __init__(self, path: str, rate: int, width: int):
+        self._fp = wave.open(path, 'rb')
+        self._channels, self._width, self._rate = self._fp.getnchannels(), self._fp.getsampwidth(), \
+            self._fp.getframerate()
+        if self._channels > 2:
+            self._fp.close()
+            raise RuntimeError('{}: unsupported channels count: {}'.format(path, self._channels))
+        self._out_rate, self._out_width = rate, width
+        self._state = None
+
+    def read(self, size: int) -> bytes:
+        data = self._fp.readframes(max(1, size // self._out_width * self._rate // self._out_rate))
+        if not data:
+            return data
+        if self._channels == 2:
+            data = audioop.tomono(data, self._width, 0.5, 0.5)
+        if self._width != self._out_width:
+            data = audioop.lin2lin(data, self._width, self._out_width)
+        if self._rate != self._out_rate:
+            data, self._state = audioop.ratecv(data, self._out_width, 1, self._rate, self._out_rate, self._state)
+        return data
+
+    def close(self):
+        self._fp.close()
+
+
+class _PCMSource:
+    def __init__(self, path: str, *_):
+        # FIFO откроется только когда появится писатель, поэтому не здесь
+        self._path = path
+        self.live = stat.S_ISFIFO(os.stat(path).st_mode)
+        self._fp = None if self.live else open(path, 'rb', buffering=0)
+
+    def read(self, size: int) -> bytes:
+        if self._fp is None:
+            self._fp = open(self._path, 'rb', buffering=0)
+        return self._fp.read(size)
+
+    def close(self):
+        if self._fp:
+            self._fp.close()
+            self._fp = None
+
+
+class _TCPSource:
+    live = True
+    TIMEOUT = 1
+
+    def __init__(self, address: tuple, *_):
+        self._address = address
+        self._sock = None
+
+    def read(self, size: int) -> bytes or None:
+        # None - данных пока нет, b'' - соединение закрыто
+        if self._sock is None:
+            self._sock = socket.create_connection(self._address, timeout=self.TIMEOUT)
+        try:
+            return self._sock.recv(size)
+        except socket.timeout:
+            return None
+
+    def close(self):
+        if self._sock:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+
+class VirtualMic:
+    """
+    Источник звука вместо PyAudio: запись, FIFO, TCP поток в формате микрофона или сателлиты (SOURCES).
+    Живет между открытиями Microphone как настоящее устройство, пока никто не слушает - стоит на паузе.
+    Запись отдается в темпе реального времени или так быстро, как ее читают (fast), после конца - тишина.
+    Живые источники (FIFO, TCP, сателлиты) задают темп сами, при обрыве - тишина и переподключение.
+    """
+    SOURCES = {'wav': _WavSource, 'pcm': _PCMSource, 'tcp': _TCPSource}
+    # Сколько секунд читаем наперед
+    BUFFER = 2
+    # Сколько ждем живой источник перед тем как отдать тишину
+    TIMEOUT = 1
+    RECONNECT = 1
+    _instance = None
+
+    def __init__(self, uri: str, realtime: bool, rate: int, width: int, source=None):
+        # source - готовый источник вместо uri (комнаты хаба сателлитов)
+        self.uri, self.realtime, self.rate, self.width = uri, realtime, rate, width
+        try:
+            if source is None:
+                scheme, target = parse_uri(uri)
+                if scheme not in self.SOURCES:
+                    raise RuntimeError('Virtual microphone {} is unavailable'.format(scheme))
+                source = self.SOURCES[scheme](target, rate, width)
+        except (RuntimeError, EOFError, wave.Error) as e:
+            # Для вызывающих это сломанный микрофон
+            raise OSError(str(e))
+        self._source = source
+        self.live = getattr(self._source, 'live', False)
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._max_size = self.BUFFER * rate * width
+        self._dry = False
+        self._start = None
+        self._consumed = 0
+        self._work = True
+        self._thread = threading.Thread(target=self._run, name='VirtualMic', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get(cls, uri: str, realtime: bool, rate: int, width: int) -> 'VirtualMic':
+        old = cls._instance
+        if old and old._work and (old.uri, old.realtime, old.rate, old.width) == (uri, realtime, rate, width):
+            return old
+        cls.close_all()
+        cls._instance = cls(uri, realtime, rate, width)
+        return cls._instance
+
+    @classmethod
+    def close_all(cls):
+        if cls._instance:
+            cls._instance.close()
+            cls._instance = None
+
+    def open(self) -> 'VirtualStream':
+        with self._cond:
+            if self.live:
+                # Настоящий микрофон не копит звук пока закрыт
+                self._buffer.clear()
+                self._cond.notify_all()
+            self._start = None
+        return VirtualStream(self)
+
+    def close(self):
+        with self._cond:
+            self._work = False
+            self._cond.notify_all()
+        self._thread.join(timeout=self.TIMEOUT * 2)
+
+    def _clocked(self) -> bool:
+        return self._dry or (self.realtime and not self.live)
+
+    def _clock(self) -> float:
+        if self._start is None:
+            self._start = time.time() - self._consumed / self.rate
+        return self._start
+
+    def available(self) -> int:
+        with self._cond:
+            if self._clocked():
+                return max(0, int((time.time() - self._clock()) * self.rate) - self._consumed)
+            return len(self._buffer) // self.width
+
+    def read(self, frames: int) -> bytes:
+        size = frames * self.width
+        with self._cond:
+            clocked = self._clocked()
+            if clocked:
+                delay = self._clock() + (self._consumed + frames) / self.rate - time.time()
+        if clocked and delay > 0:
+            time.sleep(delay)
+        with self._cond:
+            if not self._clocked():
+                self._cond.wait_for(lambda: len(self._buffer) >= size or self._dry or not self._work, self.TIMEOUT)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            self._consumed += frames
+            self._cond.notify_all()
+        return data + b'\x00' * (size - len(data))
+
+    def _set_dry(self, dry: bool):
+        with self._cond:
+            if self._dry != dry:
+                self._dry = dry
+                self._start = None
+                self._cond.notify_all()
+
+    def _run(self):
+        block = self.rate * self.width // 10
+        while self._work:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._buffer) < self._max_size or not self._work)
+            try:
+                data = self._source.read(block)
+            except OSError:
+                data = b''
+            if data is None:
+                continue
+            if data:
+                self._set_dry(False)
+                with self._cond:
+                    self._buffer.extend(data)
+                    self._cond.notify_all()
+                continue
+            self._source.close()
+            self._set_dry(True)
+            if not self.live:
+                break
+            time.sleep(self.RECONNECT)
+        self._source.close()
+
+
+class VirtualStream:
+    # Интерфейс потока PyAudio для MicrophoneStream
+    def __init__(self, mic: VirtualMic):
+        self._mic = mic
+        self._stopped = False
+
+    def read(self, size: int, exception_on_overflow=True) -> bytes:
+        return self._mic.read(size)
+
+    def get_read_available(self) -> int:
+        return self._mic.available()
+
+    def is_stopped(self) -> bool:
+        return self._stopped
+
+    def stop_stream(self):
+        self._stopped = True
+
+    def close(self):
+        self._stopped = True
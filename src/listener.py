@@ -6,7 +6,8 @@ import time
 import logger
 from languages import F
 from lib import sr_wrapper as sr
-from lib.audio_utils import ModuleLoader, SnowboyHWD, WebRTCVAD, APMVAD, StreamDetector
+from lib.audio_utils import ModuleLoader, SnowboyHWD, WebRTCVAD, APMVAD, StreamDetector, APMSettings, aligned_chunk
+from lib.noise_floor import NoiseFloor
 from owner import Owner
 from utils import recognition_msg, pretty_time
 
@@ -16,6 +17,17 @@ class Listener:
         self.cfg = cfg
         self.log = log
         self.own = owner
+        self._noise = NoiseFloor(cfg)
+
+    def stop(self):
+        self._noise.save(True)
+
+    def _recognizer(self, record_callback=True):
+        return sr.Recognizer(
+            self.own.record_callback if record_callback else None,
+            self.cfg.gt('listener', 'silent_multiplier'),
+            self.cfg.gt('listener', 'endpointer'),
+        )
 
     def _print_loading_errors(self):
         for msg in ModuleLoader().extract_errors():
@@ -26,13 +38,35 @@ class Listener:
             self.log('Wake word detection don\'t work on this system: {}'.format(self.cfg.platform), logger.WARN)
         elif self.cfg.models and self.own.max_mic_index != -2:
             if not self.cfg.detector.MUST_PRELOAD or ModuleLoader().is_loaded(self.cfg.detector.NAME):
+                self._configure_chunk()
                 return lambda: self._smart_listen(interrupt_check, callback)
             else:
                 self._print_loading_errors()
         return None
 
+    def _configure_chunk(self):
+        # Блок захвата кратен кадрам детектора и VAD, без перебуферизации внутри них
+        vad_name = self.cfg.gt('listener', 'vad_chrome') if self.cfg.gts('chrome_mode') else None
+        frames = [
+            getattr(self.cfg.detector.DETECTOR or SnowboyHWD, 'FRAME', 0),
+            getattr(self._select_vad(vad_name), 'FRAME', 0),
+            APMSettings().FRAME if APMSettings().enable else 0,
+        ]
+        target = self.cfg.gt('listener', 'chunk_size') or sr.Microphone.DEFAULT_CHUNK
+        rate = sr.Microphone.DEFAULT_RATE
+        if not rate:
+            # Частоту выберет pyaudio, кадры не пересчитать
+            sr.Microphone.chunk_size = target
+            self.log('Capture chunk: {} samples, not aligned: unknown sample rate'.format(target), logger.DEBUG)
+            return
+        sr.Microphone.chunk_size = aligned_chunk(target, *frames, rate=rate)
+        msg = 'Capture chunk: {} samples ({} ms) at {} Hz, frames (16 kHz): {}'.format(
+            sr.Microphone.chunk_size, sr.Microphone.chunk_size * 1000 // rate, rate, frames
+        )
+        self.log(msg, logger.DEBUG)
+
     def _smart_listen(self, interrupt_check, callback):
-        r = sr.Recognizer(self.own.record_callback, self.cfg.gt('listener', 'silent_multiplier'))
+        r = self._recognizer()
         adata, vad_hwd = None, None
         stream_hwd = issubclass(self.cfg.detector.DETECTOR, StreamDetector)
         chrome_mode = self.cfg.gts('chrome_mode')
@@ -41,7 +75,8 @@ class Listener:
         while not interrupt_check():
             try:
                 with sr.Microphone(device_index=self.own.mic_index) as source:
-                    vad_hwd, noising = self._get_vad_detector(source, vad_name)
+                    vad, noising = self._get_vad_detector(source, vad_name)
+                    vad_hwd = vad
                     if not isinstance(vad_hwd, SnowboyHWD):
                         vad_hwd = self._get_hw_detector(source.SAMPLE_WIDTH, source.SAMPLE_RATE, vad_hwd)
                     try:
@@ -50,6 +85,8 @@ class Listener:
                         continue
                     except RuntimeError:
                         return
+                    finally:
+                        self._noise_update(source, vad)
                     if stream_hwd:
                         model_name, phrase, msg = vad_hwd.model_info
                     else:
@@ -75,6 +112,7 @@ class Listener:
                     self._detected(model_name, phrase, msg, callback)
             finally:
                 vad_hwd and vad_hwd.die()
+                self._noise.save()
 
     def _adata_parse(self, adata, model_name: str, phrases: str, vad, callback):
         if self.cfg.gts('chrome_alarmstt'):
@@ -128,7 +166,7 @@ class Listener:
         self._recognition_sr_action(text, None, rms, model, model_msg, cb)
 
     def listen(self, r=None, mic=None, vad=None):
-        r = r or sr.Recognizer(self.own.record_callback, self.cfg.gt('listener', 'silent_multiplier'))
+        r = r or self._recognizer()
         mic = mic or sr.Microphone(device_index=self.own.mic_index)
         with mic as source:
             vad = vad or self.get_vad_detector(source)
@@ -154,7 +192,7 @@ class Listener:
 
     def background_listen(self):
         def callback(interrupt_check, mic, detector):
-            r = sr.Recognizer(silent_multiplier=self.cfg.gt('listener', 'silent_multiplier'))
+            r = self._recognizer(False)
             adata = None
             while not interrupt_check():
                 with mic as source:
@@ -174,7 +212,75 @@ class Listener:
         detector, _ = self._get_vad_detector(source_or_mic, vad_mode, vad_lvl, energy_lvl, energy_dynamic)
         return detector
 
-    def _get_vad_detector(self, source_or_mic, vad_mode=None, vad_lvl=None, energy_lvl=None, energy_dynamic=None):
+    def barge_in_listener(self, callback: callable):
+        if not (self.cfg.detector.NAME and self.cfg.models) or self.own.max_mic_index == -2:
+            return None
+        if self.cfg.detector.MUST_PRELOAD and not ModuleLoader().is_loaded(self.cfg.detector.NAME):
+            return None
+
+        def listener(interrupt_check, mic, detector):
+            try:
+                with mic as source:
+                    model_id, _, _ = sr.wait_detection(source, detector, interrupt_check)
+            except (sr.Interrupted, RuntimeError, OSError):
+                return None
+            finally:
+                detector.die()
+            if model_id > 0:
+                callback(model_id)
+            return model_id
+
+        mic_ = sr.Microphone(device_index=self.own.mic_index)
+        # Играет TTS: калибровать шум нельзя, динамик станет порогом для всех следующих прослушиваний
+        detector_, _ = self._get_vad_detector(mic_, calibrate=False)
+        if not isinstance(detector_, SnowboyHWD):
+            detector_ = self._get_hw_detector(mic_.SAMPLE_WIDTH, mic_.SAMPLE_RATE, detector_)
+        return NonBlockListener(listener, mic_, detector_)
+
+    def detected_barge_in(self, model_id: int, cb: callable):
+        model_name, phrase, msg = self.cfg.models.model_info_by_id(model_id)
+        self._detected(model_name, phrase, msg, cb)
+
+    def room_listen(self, mic, room: str, interrupt_check: callable, activated: callable, detect=True) -> tuple:
+        """
+        Конвейер комнаты хаба: ждет ключевое слово на mic и записывает фразу, детекторы у комнаты свои.
+        detect=False - только запись. Возвращает (adata, model_name, phrases, chrome_mode) или None.
+        """
+        chrome_mode = detect and self.cfg.gts('chrome_mode')
+        vad_name = self.cfg.gt('listener', 'vad_chrome') if chrome_mode else None
+        vad_name = vad_name or self.cfg.gt('listener', 'vad_mode', '')
+        model_name, phrases = None, None
+        with mic as source:
+            vad, _ = self._get_vad_detector(source, vad_name, room=room)
+            hwd = vad
+            if detect and not isinstance(hwd, SnowboyHWD):
+                hwd = self._get_hw_detector(source.SAMPLE_WIDTH, source.SAMPLE_RATE, vad, room)
+            recorder, frames, elapsed_time = hwd, None, None
+            try:
+                if detect:
+                    try:
+                        model_id, frames, elapsed_time = sr.wait_detection(source, hwd, interrupt_check)
+                    finally:
+                        self._noise_update(source, vad, room)
+                    if isinstance(hwd, StreamDetector):
+                        model_name, phrases, _ = hwd.model_info
+                    else:
+                        model_name, phrases, _ = self.cfg.models.model_info_by_id(model_id)
+                    self.log(F('Голосовая активация по {}{}', model_name, ' [{}]'.format(room)), logger.INFO)
+                    activated()
+                if not chrome_mode:
+                    detect and hwd.reset()
+                    recorder, frames, elapsed_time = vad, None, None
+                adata = self._listen(self._recognizer(False), source, recorder, frames, elapsed_time)
+            except (sr.Interrupted, sr.WaitTimeoutError, RuntimeError):
+                return None
+            finally:
+                hwd is not vad and hwd.die()
+        return adata, model_name, phrases, chrome_mode
+
+    def _get_vad_detector(self, source_or_mic, vad_mode=None, vad_lvl=None, energy_lvl=None, energy_dynamic=None,
+                          room='', calibrate=True):
+        # calibrate=False - только сохраненный порог шума или заданный, без калибровки и ее сохранения
         vad = self._select_vad(vad_mode)
         vad_lvl = vad_lvl if vad_lvl is not None else self.cfg.gt('listener', 'vad_lvl')
         vad_lvl = min(3, max(0, vad_lvl))
@@ -183,17 +289,31 @@ class Listener:
         energy_dynamic = energy_dynamic if energy_dynamic is not None else self.cfg.gt('listener', 'energy_dynamic')
         cfg = self._detector_cfg(
             source=source_or_mic, energy_lvl=energy_lvl, energy_dynamic=energy_dynamic, lvl=vad_lvl,
-            width=source_or_mic.SAMPLE_WIDTH, rate=source_or_mic.SAMPLE_RATE, another=None,
+            width=source_or_mic.SAMPLE_WIDTH, rate=source_or_mic.SAMPLE_RATE, another=None, room=room,
         )
         vad = vad(**cfg)
         if isinstance(vad, sr.EnergyDetectorVAD):
-            vad.force_adjust_for_ambient_noise(source_or_mic)
+            key = self._noise_key(source_or_mic, room)
+            energy_threshold = self._noise.get(key) if vad.auto_energy else None
+            if energy_threshold:
+                vad.set_noise_floor(energy_threshold)
+            elif calibrate:
+                vad.force_adjust_for_ambient_noise(source_or_mic)
+                vad.auto_energy and self._noise.update(key, vad.energy_threshold)
             if energy_dynamic:
                 return vad, self.own.noising
         return vad, None
 
-    def _get_hw_detector(self, width, rate, another_detector=None):
-        cfg = self._detector_cfg(width=width, rate=rate, another=another_detector, full_cfg=self.cfg)
+    def _noise_key(self, source_or_mic, room='') -> str:
+        return '{}_{}'.format(room or self.own.mic_index, source_or_mic.SAMPLE_RATE)
+
+    def _noise_update(self, source, vad, room=''):
+        # Порог после ожидания активации уже подстроен dynamic_energy под текущий шум
+        if isinstance(vad, sr.EnergyDetectorVAD) and vad.auto_energy:
+            self._noise.update(self._noise_key(source, room), vad.energy_threshold)
+
+    def _get_hw_detector(self, width, rate, another_detector=None, room=''):
+        cfg = self._detector_cfg(width=width, rate=rate, another=another_detector, full_cfg=self.cfg, room=room)
         if self.cfg.detector.DETECTOR:
             return self.cfg.detector.DETECTOR(**cfg)
         return SnowboyHWD(**cfg)
@@ -202,8 +322,11 @@ class Listener:
         kwargs.update({
             'home': self.cfg.detector.path, 'hot_word_files': self.cfg.models,
             'sensitivity': self.cfg.gts('sensitivity'), 'audio_gain': self.cfg.gts('audio_gain'),
+            'sensitivities': self.cfg.models.per_model('sensitivity', self.cfg.gts('sensitivity')),
+            'audio_gains': self.cfg.models.per_model('audio_gain', self.cfg.gts('audio_gain')),
             'apply_frontend': self.cfg.gt('noise_suppression', 'snowboy_apply_frontend'),
             'rms': self.cfg.gt('smarthome', 'send_rms'),
+            'process': self.cfg.gt('listener', 'detector_process'),
         })
         return kwargs
 
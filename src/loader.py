@@ -15,6 +15,7 @@ from lib import volume as volume_
 from lib.available_version import available_version_msg
 from lib.proxy import proxies
 from lib.publisher import PubSub
+from lib.streaming_converter import POPEN_POOL
 from listener import Listener
 from modules_manager import ModuleManager
 from music_controls import music_constructor
@@ -22,6 +23,7 @@ from notifier import MajordomoNotifier
 from owner import Owner
 from player import Player
 from plugins import Plugins
+from satellite import SatellitePool
 from server import server_constructor
 from terminal import MDTerminal
 from updater import Updater
@@ -72,6 +74,7 @@ class Loader(Owner):
         self._tts = stts.TextToSpeech(cfg=self._cfg, log=self._logger.add('TTS'))
         self._play = Player(cfg=self._cfg, log=self._logger.add('Player'), owner=self)
         self._music = music_constructor(cfg=self._cfg, logger=self._logger, owner=self)
+        self._satellites = SatellitePool(cfg=self._cfg, log=self._logger.add('Satellites'), owner=self)
         self._stt = stts.SpeechToText(cfg=self._cfg, log=self._logger.add('STT'), owner=self)
         self._mm = ModuleManager(cfg=self._cfg, log=self._logger.add('MM'), owner=self)
         self._updater = Updater(cfg=self._cfg, log=self._logger.add('Updater'), owner=self)
@@ -113,12 +116,16 @@ class Loader(Owner):
         self.join_thread(self._updater)
         self.join_thread(self._notifier)
         self.join_thread(self._duplex_pool)
+        self.join_thread(self._satellites)
 
         self._play.quiet()
         self._play.kill_popen()
         self._play.say_info(F('Голосовой терминал завершает свою работу.'))
 
         self._stt.stop()
+        POPEN_POOL.clear()
+        self._cfg.tts_index.save(True)
+        self._listen.stop()
         self._play.stop()
         self.join_thread(self._music)
 
@@ -393,6 +400,9 @@ class Loader(Owner):
             self.play(self._cfg.path['bimp'])
         self._pub.call('speech_recognized_{}success'.format('' if status else 'un'))
 
+    def speech_partial_callback(self, text: str):
+        self._pub.call('speech_partial', text)
+
     def record_callback(self, start_stop: bool):
         self._pub.call('start_record' if start_stop else 'stop_record')
 
@@ -411,6 +421,10 @@ class Loader(Owner):
     def volume_callback(self, volume: int):
         self._pub.call('volume', volume)
 
+    @property
+    def satellite_output(self):
+        return self._satellites.output
+
     @property
     def srv_ip(self) -> str:
         return self._cfg['smarthome']['ip']
@@ -435,6 +449,9 @@ class Loader(Owner):
     def modules_tester(self, phrase: str, call_me=None, rms=None, model=None):
         return self._mm.tester(phrase, call_me, rms, model)
 
+    def modules_prematch(self, phrase: str) -> bool:
+        return self._mm.prematch(phrase)
+
     def die_in(self, wait, reload=False):
         self.reload = reload
         self._sig.die_in(wait)
@@ -465,6 +482,15 @@ class Loader(Owner):
     def background_listen(self):
         return self._listen.background_listen()
 
+    def room_listen(self, mic, room: str, interrupt_check: callable, activated: callable, detect=True) -> tuple:
+        return self._listen.room_listen(mic, room, interrupt_check, activated, detect)
+
+    def barge_in_listener(self, callback: callable):
+        return self._listen.barge_in_listener(callback)
+
+    def detected_barge_in(self, model_id: int, cb: callable):
+        self._listen.detected_barge_in(model_id, cb)
+
     def get_volume(self) -> int:
         control = self._cfg.gt('volume', 'line_out', '')
         card = self._cfg.gt('volume', 'card', 0)
@@ -548,6 +574,9 @@ class Loader(Owner):
                 reload_terminal = True
                 detector_reconfigure = 'detector' in diff['listener']
                 vad_reconfigure = bool([key for key in ('vad_mode', 'vad_chrome') if key in diff['listener']])
+            if is_sub_dict('settings', diff) and [key for key in diff['settings'] if key.startswith('providerstt')]:
+                # STT provider may need another encoder, drop pre-spawned ones
+                POPEN_POOL.clear()
             if is_sub_dict('settings', diff) or reload_terminal:
                 # reload terminal
                 # noinspection PyTypeChecker
@@ -125,6 +125,8 @@ class ModuleManager:
         self.model = None
         # Имя модуля (.__name__) который вызван в данный момент.
         self._module_name = None
+        # Модуль переспросил, следующая фраза - ответ ему
+        self._asking = False
         # Без расширения
         self._cfg_name = 'modules'
         self._cfg_options = ['enable', 'mode', 'hardcoded']
@@ -365,6 +367,23 @@ class ModuleManager:
 
             return self._phrases_testing(phrase, phrase_check)
 
+    def prematch(self, phrase: str) -> bool:
+        # Промежуточная гипотеза однозначно совпадает с EQ фразой и не может стать другой командой
+        phrase_check = phrase.lower().strip()
+        if not phrase_check or self.one_way or self._asking:
+            return False
+        matched = False
+        for _, words, mode_ in self._words_iter():
+            if not words:
+                continue
+            elif mode_ == EQ and phrase_check == words:
+                matched = True
+            elif words.startswith(phrase_check) or (mode_ == SW and phrase_check.startswith(words)):
+                return False
+            elif mode_ == EW and phrase_check.endswith(words):
+                return False
+        return matched
+
     def words_by_f_all(self, f):
         return [x for x in self.words_by_f(f)] or [x for x in self.words_by_f(f, help_modes=[NM, DM, ANY])]
 
@@ -416,6 +435,7 @@ class ModuleManager:
                     f_by_key[key](*val)
 
     def _return_wrapper(self, f, replies):
+        self._asking = False
         if replies is None:
             return None, None
         if not isinstance(replies, (tuple, list)):
@@ -431,6 +451,7 @@ class ModuleManager:
             elif reply_type is Ask:
                 result = reply.text
                 asking = f  # можно заменить на f.__name__ если передача ссылки на объект станет невозможной
+                self._asking = True
             elif reply_type is SayLow:
                 for text in reply.iter():
                     self.own.say(*text)
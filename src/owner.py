@@ -304,6 +304,9 @@ class Owner:
     def speech_recognized_callback(self, status: bool):
         raise NotImplementedError
 
+    def speech_partial_callback(self, text: str):
+        raise NotImplementedError
+
     def record_callback(self, start_stop: bool):
         raise NotImplementedError
 
@@ -322,6 +325,11 @@ class Owner:
     def volume_callback(self, volume: int):
         raise NotImplementedError
 
+    @property
+    def satellite_output(self):
+        """Активный сателлит, на который отправляется звук вместо локального плеера, или None."""
+        raise NotImplementedError
+
     @property
     def srv_ip(self) -> str:
         raise NotImplementedError
@@ -344,6 +352,9 @@ class Owner:
     def modules_tester(self, phrase: str, call_me=None, rms=None, model=None):
         raise NotImplementedError
 
+    def modules_prematch(self, phrase: str) -> bool:
+        raise NotImplementedError
+
     def die_in(self, wait, reload=False):
         raise NotImplementedError
 
@@ -372,6 +383,23 @@ class Owner:
     def background_listen(self):
         raise NotImplementedError
 
+    def room_listen(self, mic, room: str, interrupt_check: callable, activated: callable, detect=True) -> tuple:
+        """
+        Ожидание ключевого слова и запись фразы для комнаты хаба, у комнаты свои детекторы.
+        Возвращает (adata, model_name, phrases, chrome_mode) или None.
+        """
+        raise NotImplementedError
+
+    def barge_in_listener(self, callback: callable):
+        """
+        Детектор ключевого слова в отдельном потоке, пока плеер блокирует терминал.
+        callback(model_id) вызывается из потока детектора.
+        """
+        raise NotImplementedError
+
+    def detected_barge_in(self, model_id: int, cb: callable):
+        raise NotImplementedError
+
     def get_volume(self) -> int:
         """
         Вернет текущую громкость системы 0..100 или код ошибки.
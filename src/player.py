@@ -9,11 +9,13 @@ import time
 import logger
 from languages import F
 from lib import play_utils
+from lib.audio_utils import PlaybackTap
 from owner import Owner
 
 
 class Player:
     MAX_BUSY_WAIT = 300  # Макс время блокировки, потом отлуп. Поможет от возможных зависаний
+    BARGE_IN_MIN = 10  # Минимальное время блокировки для прерывания ключевым словом
 
     def __init__(self, cfg, log, owner: Owner):
         self.cfg = cfg
@@ -86,6 +88,7 @@ class Player:
     def kill_popen(self):
         if self.popen_work():
             self._popen.kill()
+            PlaybackTap().stop()
             self.log('Stop playing', logger.DEBUG)
 
     def quiet(self):
@@ -100,12 +103,39 @@ class Player:
     def popen_work(self):
         return self._popen is not None and self._popen.poll() is None
 
-    def _wait_popen(self, timeout=2):
+    def _wait_popen(self, timeout=2, barge_in_lvl=None):
         if self._popen:
+            listener = self._barge_in_start(barge_in_lvl, timeout)
             try:
                 self._popen.wait(timeout)
             except subprocess.TimeoutExpired:
                 pass
+            finally:
+                listener and self._barge_in_stop(listener)
+
+    def _barge_in_start(self, lvl, timeout):
+        # Детектор терминала не работает только пока мы блокируем его поток. Короткие сигналы не слушаем.
+        # Монопольный режим (lvl >= 5) не прерываем, его вызывающий не начнет запись после barge-in
+        if lvl is None or lvl >= 5 or timeout < self.BARGE_IN_MIN or not self.cfg.gt('listener', 'barge_in'):
+            return None
+        if not self.popen_work():
+            return None
+        if threading.current_thread().name != 'MDTerminal':
+            return None
+        listener = self.own.barge_in_listener(self._barge_in)
+        listener and listener.start()
+        return listener
+
+    def _barge_in(self, _):
+        self._lp_play.clear()
+        self.kill_popen()
+
+    def _barge_in_stop(self, listener):
+        listener.stop()
+        model_id = listener.audio
+        if model_id and model_id > 0:
+            self.log('Barge-in, model id: {}'.format(model_id), logger.INFO)
+            self.own.terminal_call('barge_in', model_id, save_time=False)
 
     def _no_background_play(self, lvl, blocking):
         if not self.cfg.gts('no_background_play'):
@@ -123,7 +153,7 @@ class Player:
 
         self._play(file)
         if blocking:
-            self._wait_popen(blocking)
+            self._wait_popen(blocking, lvl)
         self._only_one.release()
 
         if wait:
@@ -152,7 +182,7 @@ class Player:
             self._wait_popen()
         self._play(file, self.own.say_callback)
         if blocking:
-            self._wait_popen(blocking)
+            self._wait_popen(blocking, lvl)
         self._only_one.release()
 
         if wait:
@@ -169,6 +199,7 @@ class Player:
             raise RuntimeError('Get unknown object: {}'.format(str(obj)))
         if self._popen:
             self._popen.kill()
+            PlaybackTap().stop()
         ext = ext or os.path.splitext(path)[1]
         if not stream and not os.path.isfile(path):
             return self.log(F('Файл {} не найден.', path), logger.ERROR)
@@ -176,7 +207,12 @@ class Player:
             return self.log(F('Неизвестный тип файла: {}', ext), logger.CRIT)
         self.log(F('Играю {} ...', path) if stream is None else F('Стримлю {} ...', path))
         try:
-            self._popen = play_utils.get_popen(ext, path, stream, callback, self.cfg.gts('software_player'))
+            satellite = self.own.satellite_output
+            if satellite and play_utils.TapDecoder.supported(ext):
+                self._popen = play_utils.RemotePlayer(ext, path, stream, callback, satellite)
+                return
+            tap = PlaybackTap() if PlaybackTap().enable else None
+            self._popen = play_utils.get_popen(ext, path, stream, callback, self.cfg.gts('software_player'), tap)
         except FileNotFoundError as e:
             self.log('Playing error: {}'.format(e), logger.ERROR)
 
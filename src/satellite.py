@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+
+import audioop
+import json
+import os
+import subprocess
+import threading
+import time
+
+import logger
+from languages import F
+from lib import sr_wrapper as sr
+from lib.audio_utils import Detector
+from lib.play_utils import RemotePlayer, TapDecoder
+from lib.socket_wrapper import Connect
+from lib.virtual_mic import VirtualMic
+from owner import Owner
+
+
+class SatellitePool:
+    """
+    Сателлиты - удаленные микрофоны (и динамики), подключенные к серверу через 'upgrade satellite'.
+    Для терминала это виртуальный микрофон satellite[:имя]: слушаем самый громкий сателлит,
+    пока терминал активирован, записывает или говорит - активный сателлит не меняется.
+    Ответы терминала отправляются на активный сателлит, если он их принимает.
+    В режиме хаба (satellite_hub) каждый сателлит - отдельная комната со своим конвейером (SatelliteRoom),
+    такие сателлиты в выборе активного не участвуют.
+    """
+    UPGRADE = 'upgrade satellite'
+    EVENTS = ('voice_activated', 'start_record', 'stop_record', 'start_talking', 'stop_talking')
+    # Сколько секунд после события держим активный сателлит
+    HOLD = 3
+    # Во сколько раз другой сателлит должен быть громче активного
+    SWITCH = 2.0
+    MIN_ENERGY = 300
+    # Сколько секунд звука храним от неактивных сателлитов
+    KEEP = 0.5
+    TIMEOUT = 1
+    WIDTH = 2
+
+    def __init__(self, cfg, log, owner: Owner):
+        self.cfg = cfg
+        self.log = log
+        self.own = owner
+        self.work = False
+        self.rate = 16000
+        self._cond = threading.Condition()
+        self._sessions = []
+        self._rooms = []
+        self._active = None
+        self._hold = 0
+        self.own.subscribe(self.UPGRADE, self._handle_upgrade, self.UPGRADE)
+        self.own.subscribe(self.EVENTS, self._activity)
+        VirtualMic.SOURCES['satellite'] = self._source
+
+    def close_signal(self):
+        self.own.unsubscribe(self.UPGRADE, self._handle_upgrade, self.UPGRADE)
+        self.own.unsubscribe(self.EVENTS, self._activity)
+        with self._cond:
+            sessions = self._sessions.copy()
+        for session in sessions:
+            session.close_signal()
+
+    def join(self, timeout=10):
+        with self._cond:
+            threads = self._sessions + self._rooms
+        for thread in threads:
+            thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        with self._cond:
+            return any(thread.is_alive() for thread in self._sessions + self._rooms)
+
+    @property
+    def output(self):
+        # Активный сателлит, если ему можно отдать звук
+        with self._cond:
+            active = self._active
+        return active if active and active.output and active.work else None
+
+    def _handle_upgrade(self, _, data, lock, conn):
+        try:
+            cmd, params = data
+            conn_ = conn.extract()
+            if conn_:
+                self._add_session(conn_, cmd, params)
+        finally:
+            lock()
+
+    def _add_session(self, conn: Connect, cmd, params: dict):
+        limit = self.cfg.gt('smarthome', 'satellites')
+        hub = self.cfg.gt('smarthome', 'satellite_hub')
+        name = params['name']
+        with self._cond:
+            count = len(self._sessions)
+            # У комнаты свои детекторы и порог шума, имена не должны совпадать
+            busy = hub and any(x.room == name for x in self._rooms)
+        msg = None
+        if count >= limit:
+            msg = 'disabled' if not limit else 'too many satellites'
+        elif busy:
+            msg = 'room {} already connected'.format(repr(name))
+        if msg:
+            self.log('Reject satellite {}::{}:{}: {}'.format(*conn.info, msg), logger.WARN)
+            try:
+                conn.write({'error': {'code': -9999, 'message': msg}, 'id': cmd})
+            except RuntimeError:
+                pass
+            conn.close()
+            return
+        session = SatelliteSession(
+            self, self.log.add(name), name, conn, cmd,
+            params.get('rate') if isinstance(params.get('rate'), int) and params['rate'] > 0 else self.rate,
+            bool(params.get('output', True)),
+        )
+        if hub:
+            session.room = SatelliteRoom(self, self.log.add(name), session)
+        with self._cond:
+            self._sessions.append(session)
+            if session.room:
+                self._rooms.append(session.room)
+            self.work = True
+        self.log('New satellite {}{}: {}::{}:{}'.format(repr(name), ' (room)' if hub else '', *conn.info), logger.INFO)
+        session.start()
+        if session.room:
+            session.room.start()
+
+    def remove(self, session):
+        with self._cond:
+            if session in self._sessions:
+                self._sessions.remove(session)
+            if self._active is session:
+                self._active = None
+            self._cond.notify_all()
+
+    def remove_room(self, room):
+        with self._cond:
+            if room in self._rooms:
+                self._rooms.remove(room)
+
+    def _activity(self, *_):
+        with self._cond:
+            self._hold = time.time() + self.HOLD
+
+    def feed(self, session, data: bytes):
+        with self._cond:
+            session.buffer.extend(data)
+            keep = self.rate * self.WIDTH * (self.TIMEOUT * 2 if session is self._active or session.room else self.KEEP)
+            if len(session.buffer) > keep:
+                del session.buffer[:len(session.buffer) - int(keep)]
+            self._cond.notify_all()
+
+    def _source(self, name: str, rate: int, width: int):
+        if width != self.WIDTH:
+            raise RuntimeError('Satellites support only 16 bit, not {}'.format(width * 8))
+        self.rate = rate
+        return _PoolSource(self, name)
+
+    def read(self, name: str, size: int) -> bytes or None:
+        # Пустые данные - сателлитов нет или активный молчит, микрофон отдает тишину
+        deadline = time.time() + self.TIMEOUT
+        with self._cond:
+            while True:
+                active = self._select(name)
+                if active and active.buffer:
+                    data = bytes(active.buffer[:size])
+                    del active.buffer[:size]
+                    return data
+                remaining = deadline - time.time()
+                if not active or remaining <= 0:
+                    return b''
+                self._cond.wait(remaining)
+
+    def read_room(self, session, size: int) -> bytes or None:
+        # None - данных пока нет, b'' - сателлит отключился
+        with self._cond:
+            self._cond.wait_for(lambda: session.buffer or not session.work, self.TIMEOUT)
+            if not session.buffer:
+                return b'' if not session.work else None
+            data = bytes(session.buffer[:size])
+            del session.buffer[:size]
+            return data
+
+    def _select(self, name: str):
+        sessions = [x for x in self._sessions if x.work and not x.room and (not name or x.name == name)]
+        if not sessions:
+            self._active = None
+            return None
+        active = self._active if self._active in sessions else None
+        loudest = max(sessions, key=lambda x: x.energy)
+        if active is None:
+            active = loudest
+        elif loudest is not active and time.time() > self._hold:
+            if loudest.energy > max(active.energy * self.SWITCH, self.MIN_ENERGY):
+                active = loudest
+        if active is not self._active:
+            self._active = active
+            del active.buffer[:-int(self.rate * self.WIDTH * self.KEEP) or None]
+            self.log('Active satellite: {}'.format(repr(active.name)))
+        return active
+
+
+class _PoolSource:
+    live = True
+
+    def __init__(self, pool: SatellitePool, name: str):
+        self._pool = pool
+        self._name = name
+
+    def read(self, size: int) -> bytes:
+        return self._pool.read(self._name, size)
+
+    def close(self):
+        pass
+
+
+class _SessionSource(_PoolSource):
+    def __init__(self, pool: SatellitePool, session):
+        super().__init__(pool, session.name)
+        self._session = session
+
+    def read(self, size: int) -> bytes or None:
+        return self._pool.read_room(self._session, size)
+
+
+class _RoomMicrophone(sr.Microphone):
+    # Микрофон комнаты поверх ее VirtualMic, без общего APM
+    def __init__(self, mic: VirtualMic):
+        self.device_index = None
+        self.SAMPLE_WIDTH = mic.width
+        self.SAMPLE_RATE = mic.rate
+        self.CHUNK = sr.Microphone.chunk_size
+        self.audio = None
+        self.stream = None
+        self._mic = mic
+
+    def __enter__(self):
+        assert self.stream is None, "This audio source is already inside a context manager"
+        self.stream = sr.MicrophoneStream(self._mic.open())
+        return self
+
+
+class SatelliteRoom(threading.Thread):
+    """
+    Комната хаба: свои ожидание активации, запись и ответ на сателлит, общие STT, TTS (и его кэш) и модули.
+    Побочные эффекты модулей (say, музыка) по-прежнему идут в основной терминал.
+    """
+    WAIT = 0.5
+
+    def __init__(self, pool: SatellitePool, log, session):
+        super().__init__(name='SatelliteRoom')
+        self.pool = pool
+        self.cfg = pool.cfg
+        self.own = pool.own
+        self.log = log
+        self.room = session.name
+        self._session = session
+
+    def _interrupted(self) -> bool:
+        return not self._session.work
+
+    def run(self):
+        mic = None
+        try:
+            mic = VirtualMic(
+                self.room, False, self.pool.rate, SatellitePool.WIDTH, _SessionSource(self.pool, self._session)
+            )
+            source = _RoomMicrophone(mic)
+            while not self._interrupted():
+                self._processing(source)
+        except Exception as e:
+            self.log('Room error: {}'.format(e), logger.ERROR)
+        finally:
+            mic and mic.close()
+            Detector.drop_room(self.room)
+            self.pool.remove_room(self)
+
+    def _processing(self, source):
+        result = self.own.room_listen(source, self.room, self._interrupted, self._activated)
+        if not result:
+            return
+        adata, model_name, phrases, chrome_mode = result
+        text = self.own.voice_recognition(adata)
+        if chrome_mode and text and phrases:
+            _, clear_text = self.cfg.models.msg_parse(text, phrases)
+            if clear_text is None:
+                self.log('Activation error: \'{}\', trigger: {}'.format(text, model_name), logger.DEBUG)
+                return
+            text = clear_text
+        self.log('Recognized: {}'.format(repr(text)), logger.INFO)
+        reply, caller = None, False
+        while caller is not None and not self._interrupted():
+            reply, caller = self.own.modules_tester(text, caller, None, model_name)
+            if caller:
+                reply and self._say(reply)
+                result = self.own.room_listen(source, self.room, self._interrupted, None, False)
+                text = self.own.voice_recognition(result[0]) if result else ''
+                reply = None
+        if reply:
+            self._say(reply)
+
+    def _activated(self):
+        if self.cfg.gts('alarmkwactivated'):
+            path = self.cfg.path['ding']
+            self._play(path, None, os.path.splitext(path)[1])
+
+    def _say(self, text: str):
+        self._play(*self.own.tts(text)())
+
+    def _play(self, path, stream, ext):
+        if not self._session.output or not TapDecoder.supported(ext):
+            self.log(F('Неизвестный тип файла: {}', ext), logger.WARN)
+            return
+        player = RemotePlayer(ext, path, stream, None, self._session)
+        while True:
+            try:
+                return player.wait(self.WAIT)
+            except subprocess.TimeoutExpired:
+                if self._interrupted():
+                    player.kill()
+
+
+class SatelliteSession(threading.Thread):
+    # Темп энергии для выбора активного сателлита
+    ENERGY_RATIO = 0.3
+
+    def __init__(self, pool: SatellitePool, log, name: str, conn: Connect, cmd, rate: int, output: bool):
+        super().__init__(name='Satellite')
+        self.pool = pool
+        self.log = log
+        self.name = name
+        self.rate = rate
+        self.output = output
+        self.buffer = bytearray()
+        self.energy = 0
+        self.work = True
+        # SatelliteRoom в режиме хаба
+        self.room = None
+        self._conn = conn
+        self._cmd = cmd
+        self._in_state = None
+        self._out_state = None
+
+    def close_signal(self):
+        self.work = False
+        self._conn.close()
+
+    def send(self, pcm: bytes, rate: int) -> bool:
+        if not self.work:
+            return False
+        if rate != self.rate:
+            pcm, self._out_state = audioop.ratecv(pcm, SatellitePool.WIDTH, 1, rate, self.rate, self._out_state)
+        return self._write(pcm)
+
+    def stop(self):
+        # Сбросить то, что сателлит еще не проиграл
+        self._out_state = None
+        self._write({'method': 'stop'})
+
+    def _write(self, data) -> bool:
+        try:
+            self._conn.write_frame(data)
+        except RuntimeError as e:
+            self.log('Write error: {}'.format(e), logger.ERROR)
+            self.close_signal()
+            return False
+        return True
+
+    def run(self):
+        self._conn.settimeout(None)
+        try:
+            self._conn.write({'result': 'ok', 'id': self._cmd})
+            for data in self._conn.read_frames():
+                if not self.work:
+                    break
+                if isinstance(data, bytes):
+                    self._processing(data)
+                else:
+                    self._control(data)
+        except RuntimeError as e:
+            self.log('OPEN ERROR: {}'.format(e), logger.ERROR)
+        finally:
+            self.work = False
+            self.pool.remove(self)
+            self._conn.close()
+            self.log('close.', logger.INFO)
+
+    def _processing(self, data: bytes):
+        if len(data) % SatellitePool.WIDTH:
+            data = data[:-(len(data) % SatellitePool.WIDTH)]
+        if not data:
+            return
+        if self.rate != self.pool.rate:
+            data, self._in_state = audioop.ratecv(
+                data, SatellitePool.WIDTH, 1, self.rate, self.pool.rate, self._in_state
+            )
+        self.energy += (audioop.rms(data, SatellitePool.WIDTH) - self.energy) * self.ENERGY_RATIO
+        self.pool.feed(self, data)
+
+    def _control(self, data: str):
+        try:
+            data = json.loads(data)
+        except (json.decoder.JSONDecodeError, TypeError):
+            data = None
+        self.log('Control: {}'.format(repr(data)[:200]))
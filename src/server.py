@@ -4,7 +4,7 @@ import socket
 
 import logger as logger_
 from languages import F
-from lib.api.misc import api_commands, upgrade_duplex, InternalException
+from lib.api.misc import api_commands, upgrade_duplex, InternalException, dict_key_checker
 from lib.api.socket_api_handler import SocketAPIHandler, APIHandler
 from owner import Owner
 
@@ -17,6 +17,24 @@ class _APIHandler(APIHandler):
         except RuntimeError as e:
             raise InternalException(msg=str(e))
 
+    @api_commands('upgrade satellite', pure_json=True)
+    def _upgrade_satellite(self, _, data: dict):
+        """
+        Переводит соединение в бинарный режим сателлита - удаленного микрофона и динамика:
+
+        {"method": "upgrade satellite", "params": {"name": "kitchen", "rate": 16000, "output": true}, "id": "1"}
+
+        После ответа {"result": "ok", "id": "1"} соединение передает кадры, см. Connect.read_frames:
+        bytes - PCM s16le mono (от сателлита - микрофон, к нему - звук для воспроизведения), str - json.
+        """
+        dict_key_checker(data, ('name',))
+        if not (isinstance(data['name'], str) and data['name']):
+            raise InternalException(2, 'name must be non empty str')
+        try:
+            upgrade_duplex(self.own, self.get('conn'), (self.id, data), 'upgrade satellite')
+        except RuntimeError as e:
+            raise InternalException(msg=str(e))
+
 
 class MDTServer(SocketAPIHandler):
     def __init__(self, cfg, log, owner: Owner):
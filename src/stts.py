@@ -3,13 +3,12 @@
 import hashlib
 import os
 import os.path
+import queue
 import random
 import threading
 import time
 import wave
 
-import pyaudio
-
 import lib.STT as STT
 import lib.TTS as TTS
 import lib.sr_wrapper as sr
@@ -17,6 +16,9 @@ import logger
 import utils
 from languages import F
 from lib.audio_utils import StreamRecognition, StreamDetector
+from lib.provider_health import ProviderHealth
+from lib.stt_cache import STTCache
+from lib.tts_cache_index import ChecksumWriter
 from owner import Owner
 
 
@@ -32,8 +34,53 @@ class TextToSpeech:
         return _TTSWorker(self.cfg, self._log, msg, realtime).get
 
 
+class _Flight:
+    """
+    Один синтез на одновременные одинаковые запросы (sha1, провайдер, формат).
+    Поток раздается всем подписчикам, опоздавшие сначала получают уже пришедшее.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history = bytearray()
+        self._streams = []
+        self._closed = False
+        self.ready = threading.Event()
+        self.failed = False
+
+    def subscribe(self, stream):
+        with self._lock:
+            if self._history:
+                stream.write(bytes(self._history))
+            if self._closed:
+                stream.close()
+            else:
+                self._streams.append(stream)
+
+    def write(self, data: bytes):
+        if not data:
+            return self.close()
+        with self._lock:
+            self._history.extend(data)
+            for stream in self._streams:
+                stream.write(data)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for stream in self._streams:
+                stream.close()
+            self._streams.clear()
+
+
 class _TTSWorker(threading.Thread):
     WAIT = 600
+    _flights = {}
+    _flights_lock = threading.Lock()
+    # Pre-roll потока по формату в KiB, tts_preroll переопределяет по провайдеру или формату
+    PREROLL = {'wav': 8, 'mp3': 2, 'opus': 1}
+    # Счетчики потоков по провайдерам: [потоков, underruns, секунд ожидания]
+    _stream_stats = {}
+    _stats_lock = threading.Lock()
 
     def __init__(self, cfg, log, msg, realtime):
         super().__init__(name='TTSWorker')
@@ -52,7 +99,7 @@ class _TTSWorker(threading.Thread):
         self._start_time = time.time()
         self.start()
 
-        if not self.cfg.get('optimistic_nonblock_tts'):
+        if not self.cfg.gts('optimistic_nonblock_tts'):
             self._wait()
 
     def get(self):
@@ -91,7 +138,7 @@ class _TTSWorker(threading.Thread):
                 self._buff_size *= 4
             self._file_path = os.path.join(self.cfg.gt('cache', 'path'), self._provider + rname) if use_cache else \
                 '<{}><{}>'.format(sha1, ext)
-            self._tts_gen(self._file_path if use_cache else None, ext, self._msg)
+            self._tts_gen(self._file_path if use_cache else None, ext, self._msg, (sha1, self._provider, ext))
             self._unlock()
             work_time = time.time() - self._start_time
             action = F('{}сгенерированно {}', msg_gen, self._provider)
@@ -129,13 +176,54 @@ class _TTSWorker(threading.Thread):
         if prov == 'yandex':
             for ext_ in ('mp3', 'opus'):
                 file = os.path.join(self.cfg.gt('cache', 'path'), prov + rname + ext_)
-                if os.path.isfile(file):
+                if self._is_valid(file):
                     return file
             return None
         file = os.path.join(self.cfg.gt('cache', 'path'), prov + rname + ext)
-        return file if os.path.isfile(file) else None
+        return file if self._is_valid(file) else None
+
+    def _is_valid(self, file: str) -> bool:
+        if not os.path.isfile(file):
+            return False
+        valid = self.cfg.tts_index.valid(file)
+        if valid is False:
+            # Обрезанный или испорченный файл, сгенерируем заново
+            self.log('TTS cache {} is corrupted, removed'.format(file), logger.WARN)
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+        return bool(valid)
+
+    def _tts_gen(self, file, format_, msg: str, flight_key: tuple):
+        with self._flights_lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+        if not leader:
+            return self._tts_follow(flight, file, format_)
+        try:
+            self._tts_lead(flight, file, format_, msg)
+        finally:
+            with self._flights_lock:
+                self._flights.pop(flight_key, None)
+            flight.failed = flight.failed or not flight.ready.is_set()
+            flight.ready.set()
+            flight.close()
+
+    def _tts_follow(self, flight: _Flight, file, format_):
+        # Такой же запрос уже синтезируется - слушаем его поток
+        flight.ready.wait(self.WAIT)
+        if flight.failed:
+            self._file_path = self.cfg.path['tts_error']
+            return
+        self.log('TTS coalesced: {}'.format(self._file_path), logger.DEBUG)
+        self._stream = utils.StreamBuffer(self._preroll(format_), self._stream_report)
+        flight.subscribe(self._stream)
+        self._ext = '.{}'.format(format_) if not file else None
 
-    def _tts_gen(self, file, format_, msg: str):
+    def _tts_lead(self, flight: _Flight, file, format_, msg: str):
         key = None
         sets = utils.rhvoice_rest_sets(self.cfg[self._provider]) if self._provider == 'rhvoice-rest' else {}
         try:
@@ -158,20 +246,64 @@ class _TTSWorker(threading.Thread):
         except Exception as e:
             self._synthesis_error(key, e)
             self._file_path = self.cfg.path['tts_error']
+            flight.failed = True
             return
 
-        self._stream = utils.FakeFP()
-        write_to = [self._stream]
-        if file:
-            write_to.append(open(file, 'wb'))
+        self._stream = utils.StreamBuffer(self._preroll(format_), self._stream_report)
+        flight.subscribe(self._stream)
+        flight.ready.set()
+        write_to = [flight]
+        # Кэш пишется во временный файл, под своим именем появится только целиком
+        part = ChecksumWriter(file + '.part') if file else None
+        if part:
+            write_to.append(part)
         self._ext = '.{}'.format(format_) if not file else None
         self._unlock()
+        success = True
         try:
             tts.stream_to_fps(write_to)
         except Exception as e:
+            success = False
             self._synthesis_error(key, e)
-        for fp in write_to:
-            fp.close()
+        flight.close()
+        if part:
+            self._cache_commit(part, file, success)
+
+    def _cache_commit(self, part: ChecksumWriter, file: str, success: bool):
+        try:
+            if success:
+                part.flush()
+                os.fsync(part.fileno())
+            part.close()
+            if success:
+                os.replace(part.name, file)
+                self.cfg.tts_index.add(file, part.record)
+            else:
+                os.remove(part.name)
+        except OSError as e:
+            self.log('TTS cache {}: {}'.format(file, e), logger.ERROR)
+
+    def _preroll(self, format_: str) -> int:
+        try:
+            preroll = utils.parse_preroll(self.cfg.gts('tts_preroll', ''))
+        except RuntimeError as e:
+            self.log(e, logger.WARN)
+            preroll = {}
+        size = preroll.get(self._provider, preroll.get(format_, self.PREROLL.get(format_, 0)))
+        return size * 1024
+
+    def _stream_report(self, stats: dict):
+        with self._stats_lock:
+            total = self._stream_stats.setdefault(self._provider, [0, 0, 0.0])
+            total[0] += 1
+            total[1] += stats['underruns']
+            total[2] += stats['stall']
+            total = total.copy()
+        msg = 'Stream {}: start {}, underruns {}, stall {}, max buffer {} KiB. Total {} streams: underruns {}, stall {}'
+        self.log(msg.format(
+            self._provider, utils.pretty_time(stats['start'] or 0), stats['underruns'],
+            utils.pretty_time(stats['stall']), stats['max_fill'] // 1024, total[0], total[1], utils.pretty_time(total[2])
+        ), logger.DEBUG)
 
     def _synthesis_error(self, key, e):
         if not isinstance(e, RuntimeError):
@@ -180,6 +312,9 @@ class _TTSWorker(threading.Thread):
 
 
 class SpeechToText:
+    # Сколько раз подряд должна прийти одна и та же промежуточная гипотеза для досрочного выполнения
+    PARTIAL_STABLE = 3
+
     def __init__(self, cfg, log, owner: Owner):
         self.log = log
         self.cfg = cfg
@@ -189,6 +324,9 @@ class SpeechToText:
         self._work = True
         self._start_stt_event = owner.registration('start_stt_event')
         self._stop_stt_event = owner.registration('stop_stt_event')
+        self._health = ProviderHealth(log, self._probe)
+        self._stt_cache = STTCache(cfg)
+        sr.Microphone.set_virtual(self.cfg.gts('virtual_mic'), self.cfg.gts('virtual_mic_pacing'))
         try:
             self.max_mic_index = len(sr.Microphone().list_microphone_names()) - 1
             try:
@@ -212,6 +350,8 @@ class SpeechToText:
 
     def stop(self):
         self._work = False
+        self._health.stop()
+        self._stt_cache.save(True)
         self.log('stop.', logger.INFO)
 
     def busy(self):
@@ -270,7 +410,7 @@ class SpeechToText:
         else:
             self.own.set_lvl(lvl)
             self.own.kill_popen()
-        self.log('audio devices: {}'.format(pyaudio.PyAudio().get_device_count() - 1), logger.DEBUG)
+        self.log('audio devices: {}'.format(sr.Microphone.device_count() - 1), logger.DEBUG)
 
         hello = hello or self.sys_say.hello
         file_path = self.own.tts(hello) if not voice and hello else None
@@ -326,7 +466,10 @@ class SpeechToText:
         return listener.audio, record_time, listener.energy_threshold, listener.rms
 
     def _block_listen(self, hello, lvl, file_path, self_call=False):
-        r = sr.Recognizer(self.own.record_callback, self.cfg.gt('listener', 'silent_multiplier'))
+        r = sr.Recognizer(
+            self.own.record_callback, self.cfg.gt('listener', 'silent_multiplier'),
+            self.cfg.gt('listener', 'endpointer')
+        )
         mic = sr.Microphone(device_index=self.get_mic_index())
         alarm = self.cfg.gts('alarmtts') and not hello
 
@@ -397,11 +540,60 @@ class SpeechToText:
             return audio.text
         self.own.speech_recognized(True)
         try:
-            return self._voice_recognition(audio, quiet, fusion)
+            # Гонка только для потока: проигравшие перестают получать аудио.
+            # Целую фразу (AudioData) не отменить, ее отправили бы и оплатили все провайдеры
+            providers = self._providers_list('providerstt_race') if isinstance(audio, StreamRecognition) else []
+            if len(providers) > 1:
+                if self._selection != 'static':
+                    providers = self._health.available(providers)
+                if len(providers) > 1:
+                    return self._race_recognition(audio, fusion, providers)
+            provider = None
+            if self._selection != 'static':
+                provider = self._health.select(self._providers_list('providerstt_backup'), self._selection)
+            return self._voice_recognition(audio, quiet, fusion, provider)
         finally:
             self.own.speech_recognized(False)
 
-    def _voice_recognition(self, audio, quiet: bool = False, fusion=None, provider=None) -> utils.TextBox:
+    @property
+    def _selection(self) -> str:
+        return self.cfg.gts('stt_selection', 'static')
+
+    def _providers_list(self, key: str) -> list:
+        # providerstt и дополнительные провайдеры из key
+        providers = [self.cfg.gts('providerstt', 'unset')]
+        for prov in self.cfg.gts(key, '').split(','):
+            prov = prov.strip().lower()
+            if prov and prov not in providers and self.own.is_stt_provider(prov):
+                providers.append(prov)
+        return providers
+
+    def _race_recognition(self, audio: StreamRecognition, fusion, providers: list) -> utils.TextBox:
+        # Поток фразы распознается всеми провайдерами одновременно, ждем только победителя.
+        # Проигравший, уже отправивший все аудио, дождется своего ответа в фоне, результат отбрасывается
+        agreement = self.cfg.gts('stt_race_policy') == 'agreement'
+        sources = audio.fork(len(providers))
+        results = queue.Queue()
+        for source, prov in zip(sources, providers):
+            RecognitionWorker(self._voice_recognition, source, prov, results.put, fusion)
+
+        done, winner = [], None
+        while len(done) < len(providers):
+            text = results.get()
+            done.append(text)
+            if text and (not agreement or [x.lower() for x in done].count(text.lower()) > 1):
+                winner = text
+                break
+        if winner is None:
+            # Победителя нет - основной провайдер, затем любой непустой результат
+            winner = next((x for x in done if x and x.provider == providers[0]), None)
+            winner = winner or next((x for x in done if x), utils.TextBox('', providers[0]))
+        # Проигравшие перестают получать аудио
+        [source.terminate() for source in sources]
+        self.log(F('Параллельное распознавание {}: победил {}', ', '.join(providers), winner.provider), logger.DEBUG)
+        return winner
+
+    def _voice_recognition(self, audio, quiet: bool = False, fusion=None, provider=None, cached=False) -> utils.TextBox:
         def say(text: str):
             if not quiet:
                 self.own.say(text)
@@ -412,22 +604,27 @@ class SpeechToText:
             say(F('Ошибка распознавания - неизвестный провайдер {}', ''))
             return utils.TextBox('', prov)
         self.log(F('Для распознавания используем {}', prov), logger.DEBUG)
+        cache_key = None
+        if cached and isinstance(audio, sr.AudioData) and not fusion:
+            # Тот же звук уже распознавался (тесты образцов, сравнение провайдеров) - не отправляем снова
+            cache_key = self._stt_cache.fingerprint(
+                audio.frame_data, audio.sample_rate, audio.sample_width, prov, self.cfg.stt_lang(prov)
+            )
+            text = self._stt_cache.get(cache_key)
+            if text is not None:
+                self.log('STT cache hit: {}'.format(prov), logger.DEBUG)
+                return utils.TextBox(text, prov)
         wtime = time.time()
         key = None
+        partial = self._partial_callback(audio, prov, wtime) if isinstance(audio, StreamRecognition) else None
         try:
             key = self.cfg.key(prov, 'apikeystt')
-            command = STT.GetSTT(
-                prov,
-                audio_data=audio,
-                key=key,
-                lang=self.cfg.stt_lang(prov),
-                url=self.cfg.gt(prov, 'server'),
-                yandex_api=self.cfg.yandex_api(prov),
-                grpc=self.cfg.gt(prov, 'grpc'),
-            ).text()
+            command = self._get_stt(prov, key, audio, partial)
         except STT.UnknownValueError:
             command = ''
         except Exception as e:
+            if self._selection != 'static':
+                self._health.record(prov, False, time.time() - wtime)
             say(F('Произошла ошибка распознавания'))
             msg = 'Ошибка распознавания речи от {}, ключ \'{}\'. ({})'
             if not isinstance(e, RuntimeError):
@@ -437,13 +634,57 @@ class SpeechToText:
         if fusion:
             wtime = fusion()
         w_time = time.time() - wtime
+        if self._selection != 'static':
+            self._health.record(prov, True, w_time)
+        if command:
+            self._stt_cache.set(cache_key, command)
         self.log(F('Распознано за {}', utils.pretty_time(w_time)), logger.DEBUG)
         return utils.TextBox(command or '', prov, w_time)
 
+    def _get_stt(self, prov: str, key, audio, partial=None) -> str:
+        return STT.GetSTT(
+            prov,
+            audio_data=audio,
+            key=key,
+            lang=self.cfg.stt_lang(prov),
+            url=self.cfg.gt(prov, 'server'),
+            yandex_api=self.cfg.yandex_api(prov),
+            grpc=self.cfg.gt(prov, 'grpc'),
+            partial=partial,
+        ).text()
+
+    def _probe(self, prov: str) -> bool:
+        # Полсекунды тишины, пустой ответ тоже успех
+        try:
+            self._get_stt(prov, self.cfg.key(prov, 'apikeystt'), sr.AudioData(b'\x00' * 16000, 16000, 2))
+        except STT.UnknownValueError:
+            pass
+        except Exception as e:
+            self.log(F('Провайдер {} все еще недоступен: {}', prov, e), logger.DEBUG)
+            return False
+        return True
+
+    def _partial_callback(self, audio: StreamRecognition, prov: str, wtime: float):
+        early_dispatch = self.cfg.gt('listener', 'early_dispatch')
+        last = ['', 0]
+
+        def callback(text: str):
+            audio.partial(text)
+            if text == last[0]:
+                last[1] += 1
+            else:
+                last[0], last[1] = text, 1
+                self.own.speech_partial_callback(text)
+            if early_dispatch and last[1] == self.PARTIAL_STABLE and self.own.modules_prematch(text):
+                w_time = time.time() - wtime
+                self.log(F('Досрочно распознано за {}: {}', utils.pretty_time(w_time), text), logger.DEBUG)
+                audio.early_result(utils.TextBox(text, prov, w_time))
+        return callback
+
     def phrase_from_files(self, files: list):
         if not files:
             return '', 0
-        workers = [RecognitionWorker(self._voice_recognition, file) for file in files]
+        workers = [RecognitionWorker(self._voice_recognition, file, cached=True) for file in files]
         result = [worker.get for worker in workers]
         del workers
         # Фраза с 50% + 1 побеждает
@@ -464,7 +705,7 @@ class SpeechToText:
         if not providers:
             return []
         adata = adata_from_file(file_or_adata)
-        workers = [RecognitionWorker(self._voice_recognition, adata, provider) for provider in providers]
+        workers = [RecognitionWorker(self._voice_recognition, adata, provider, cached=True) for provider in providers]
         return [worker.get for worker in workers]
 
     def _print_mic_info(self):
@@ -516,16 +757,25 @@ class SpeechToText:
 
 
 class RecognitionWorker(threading.Thread):
-    def __init__(self, voice_recognition, file_or_adata, provider=None):
+    def __init__(self, voice_recognition, file_or_adata, provider=None, callback=None, fusion=None, cached=False):
         super().__init__()
         self._voice_recognition = voice_recognition
         self._file_or_adata = file_or_adata
         self._provider = provider
+        self._callback = callback
+        self._fusion = fusion
+        self._cached = cached
         self._result = utils.TextBox('', provider)
         self.start()
 
     def run(self):
-        self._result = self._voice_recognition(adata_from_file(self._file_or_adata), True, provider=self._provider)
+        try:
+            self._result = self._voice_recognition(
+                adata_from_file(self._file_or_adata), True, self._fusion, self._provider, self._cached
+            )
+        finally:
+            if self._callback:
+                self._callback(self._result)
 
     @property
     def get(self):
@@ -571,8 +821,8 @@ class Phrases:
         return random.SystemRandom().choice(self._phrases[name])
 
 
-def adata_from_file(file_or_adata: str or sr.AudioData) -> sr.AudioData:
-    if isinstance(file_or_adata, sr.AudioData):
+def adata_from_file(file_or_adata: str or sr.AudioData or StreamRecognition) -> sr.AudioData or StreamRecognition:
+    if isinstance(file_or_adata, (sr.AudioData, StreamRecognition)):
         return file_or_adata
     else:
         with wave.open(file_or_adata, 'rb') as fp:
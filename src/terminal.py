@@ -37,7 +37,7 @@ class MDTerminal(threading.Thread):
         # Что делает терминал, для диагностики зависаний треда
         # 0 - ничего, 1 - слушает микрофон, 2 - тестирут микрофон, 3 - обрабатывает результат, 4 - внешний вызов
         self.stage = 0
-        self._sw = _SampleWorker(cfg, log.add('SW'), owner, self._reload)
+        self._sw = _SampleWorker(cfg, log.add('SW'), owner, lambda: self.call('reload', save_time=False))
         self.DATA_CALL = {
             'reload': self._reload,
             'volume': self._set_volume_quiet,  # volume == nvolume
@@ -58,11 +58,13 @@ class MDTerminal(threading.Thread):
             'test.play': self._sw.test_play,
             'test.delete': self._sw.test_delete,
             'test.test': self._sw.test_test,
+            'job.cancel': self._sw.cancel,
             'sre': lambda text, rms=None, model=None: self.own.detected_fake(text, rms, model, self._detected_parse),
         }
 
     def join(self, timeout=30):
         self._wait.set()
+        self._sw.stop(timeout)
         super().join(timeout=timeout)
         self._listener_notify_cached(False)
 
@@ -202,6 +204,8 @@ class MDTerminal(threading.Thread):
                 self._detected_parse(True, *self.own.listen(data))
             elif cmd == 'voice' and not data:
                 self._detected_parse(False, *self.own.listen(voice=True))
+            elif cmd == 'barge_in' and data:
+                self.own.detected_barge_in(data, self._detected_parse)
             elif cmd in self.DATA_CALL:
                 self.DATA_CALL[cmd](data)
             elif cmd in self.ARGS_CALL:
@@ -308,15 +312,58 @@ class MDTerminal(threading.Thread):
 
 
 class _SampleWorker:
+    # Сколько файлов распознаем одновременно в test.test, провайдеры для файла и так параллельно
+    PARALLEL = 4
+
     def __init__(self, cfg, log, owner: Owner,  reload_cb):
         self.log, self.cfg, self.own = log, cfg, owner
-        # Перезагружает терминал, строго в треде самого терминала
+        # Перезагружает терминал через его очередь, можно из любого треда
         self._reload_cb = reload_cb
+        # Компиляция и тесты идут в фоне, чтобы не блокировать активацию. Одновременно только одна задача
+        self._job = None
+        self._cancel = threading.Event()
 
     def _send_notify(self, event: str, state: bool) -> None:
         self.own.sub_call('default', event, state)
         return None
 
+    def _progress(self, done: int, total: int):
+        self.own.sub_call('default', 'sample_job', self._job.name, done, total)
+
+    def _background(self, name: str, target, *args) -> bool:
+        if self._job and self._job.is_alive():
+            self.log('Job {} is running, ignore {}'.format(repr(self._job.name), repr(name)), logger.WARN)
+            return False
+        self._cancel.clear()
+        self._job = threading.Thread(target=self._job_wrapper, args=(target, args), name=name)
+        self._job.start()
+        return True
+
+    def _job_wrapper(self, target, args):
+        self.own.sub_call('default', 'sample_job', self._job.name, 'start')
+        try:
+            target(*args)
+        except Exception as e:
+            self.log('Job {} error: {}'.format(repr(self._job.name), utils.PrettyException(e)), logger.ERROR)
+        finally:
+            state = 'cancel' if self._cancel.is_set() else 'stop'
+            self.own.sub_call('default', 'sample_job', self._job.name, state)
+
+    def _canceled(self) -> bool:
+        if self._cancel.is_set():
+            self.log('Job {} canceled'.format(repr(self._job.name)), logger.INFO)
+            return True
+        return False
+
+    def cancel(self, *_, **__):
+        if self._job and self._job.is_alive():
+            self._cancel.set()
+
+    def stop(self, timeout=None):
+        self.cancel()
+        if self._job:
+            self._job.join(timeout)
+
     def _is_fake_models(self):
         if self.cfg.detector.FAKE_MODELS:
             self.log('Detector {} use fake models - nope action.'.format(self.cfg.detector.NAME), logger.WARN)
@@ -370,7 +417,16 @@ class _SampleWorker:
             self.log(msg, logger.WARN)
             return
 
+        self._background('compile', self._compile_job, model, username)
+
+    def _compile_job(self, model, username):
         self._send_notify('model_compile', True)
+        try:
+            self._compile_samples(model, username)
+        finally:
+            self._send_notify('model_compile', False)
+
+    def _compile_samples(self, model, username):
         samples = []
         samples_miss = []
         for num in range(1, self.cfg.detector.SAMPLES_COUNT + 1):
@@ -390,7 +446,6 @@ class _SampleWorker:
             samples_miss = '{}{}'.format(', '.join(samples_miss[:split]), more)
             self.log(F('Ошибка компиляции - файлы {} не найдены в {}.', samples_miss, path), logger.ERROR)
             self.own.say(F('Ошибка компиляции - файлы не найдены.'))
-        self._send_notify('model_compile', False)
 
     def rec_del(self, model, _):
         if self._is_fake_models():
@@ -490,18 +545,39 @@ class _SampleWorker:
         providers = self._test_stt_providers(providers)
         if not providers:
             return
+        self._background('test.test', self._test_job, providers, files)
+
+    def _test_job(self, providers: list, files: list):
         p_offset = max(len(provider) for provider in providers)
         template = '{:#} [{:>~}]: {}'.replace('#', str(p_offset), 1)
-        for name in files:
-            result = self.own.multiple_recognition(os.path.join(self.cfg.path['test'], name), providers)
-            result.sort(key=lambda x: x.time)
-            result = {k.provider: {'time': utils.pretty_time(k.time), 'result': str(k)} for k in result}
-            t_offset = max(len(k['time']) for k in result.values())
-            head = template.replace('~', str(t_offset), 1)
-            self.log('== Multiple recognition for {} =='.format(repr(name)), logger.INFO)
-            for provider, data in result.items():
-                self.log(head.format(provider, data['time'], repr(data['result'])), logger.INFO)
-            self.log('=' * (p_offset + 1), logger.INFO)
+        pending = queue.Queue()
+        [pending.put_nowait(name) for name in files]
+        lock = threading.Lock()
+        done = [0]
+
+        def worker():
+            while not self._cancel.is_set():
+                try:
+                    name = pending.get_nowait()
+                except queue.Empty:
+                    return
+                result = self.own.multiple_recognition(os.path.join(self.cfg.path['test'], name), providers)
+                result.sort(key=lambda x: x.time)
+                result = {k.provider: {'time': utils.pretty_time(k.time), 'result': str(k)} for k in result}
+                t_offset = max(len(k['time']) for k in result.values())
+                head = template.replace('~', str(t_offset), 1)
+                with lock:
+                    self.log('== Multiple recognition for {} =='.format(repr(name)), logger.INFO)
+                    for provider, data in result.items():
+                        self.log(head.format(provider, data['time'], repr(data['result'])), logger.INFO)
+                    self.log('=' * (p_offset + 1), logger.INFO)
+                    done[0] += 1
+                    self._progress(done[0], len(files))
+
+        workers = [threading.Thread(target=worker, name='SampleTest') for _ in range(min(self.PARALLEL, len(files)))]
+        [thread.start() for thread in workers]
+        [thread.join() for thread in workers]
+        self._canceled()
 
     def _test_stt_providers(self, providers: list) -> list:
         if '*' in providers:
@@ -555,7 +631,11 @@ class _SampleWorker:
         return file if os.path.splitext(file)[1] == self.cfg.path['test_ext'] else file + self.cfg.path['test_ext']
 
     def _compile_model(self, model, samples, username):
+        # Образцы распознаются параллельно
         phrase, match_count = self.own.phrase_from_files(samples)
+        self._progress(1, 3)
+        if self._canceled():
+            return
         pmdl_name = self.cfg.detector.gen_name('model', model)
         pmdl_path = os.path.join(self.cfg.path['models'], pmdl_name)
         if not self.cfg.detector.is_model_name(pmdl_name):
@@ -588,7 +668,11 @@ class _SampleWorker:
             self.own.say(F('Ошибка компиляции модели номер {}', model))
             return
         work_time = utils.pretty_time(time.time() - work_time)
+        self._progress(2, 3)
+        if self._canceled():
+            return
         snowboy.save(pmdl_path)
+        self._progress(3, 3)
 
         msg = ', "{}",'.format(phrase) if phrase else ''
         self.log(F('Модель{} скомпилирована успешно за {}: {}', msg, work_time, pmdl_path), logger.INFO)
@@ -606,6 +690,11 @@ class _SampleWorker:
         model_data = {'models': {pmdl_name: phrase}}
         if username:
             model_data['persons'] = {pmdl_name: username}
-        self.own.settings_from_inside(model_data)
-        self.cfg.models_load()
-        self._reload_cb()
+
+        def callback():
+            self.own.settings_from_inside(model_data)
+            self.cfg.models_load()
+            self._reload_cb()
+        # Компиляция идет в фоне, а терминал слушает с текущими моделями - меняем их в его треде
+        # noinspection PyTypeChecker
+        self.own.terminal_call('callme', callback, save_time=False)
@@ -144,6 +144,84 @@ class FakeFP(queue.Queue):
         self.write(b'')
 
 
+class StreamBuffer:
+    """
+    Jitter buffer потокового TTS между синтезом и плеером, интерфейс как у FakeFP.
+    Первое чтение ждет preroll байт (или конца), если буфер опустел раньше конца - underrun,
+    снова копим preroll. Писатель ждет, пока в буфере больше LIMIT байт.
+    stats: start - сколько ждали первые данные, underruns, stall - сколько секунд ждали после underrun.
+    """
+    LIMIT = 1024 * 1024
+    CHUNK = 1024 * 4
+    # Никто не читает - выбрасываем, чтобы не висел синтез
+    WRITE_TIMEOUT = 60
+
+    def __init__(self, preroll: int = 0, callback=None):
+        self._preroll = max(1, preroll)
+        self._callback = callback
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._closed = False
+        self._buffering = True
+        self._created = time.time()
+        self.stats = {'start': None, 'underruns': 0, 'stall': 0.0, 'size': 0, 'max_fill': 0}
+
+    def write(self, data: bytes):
+        if not data:
+            return self.close()
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._buffer) < self.LIMIT or self._closed, self.WRITE_TIMEOUT):
+                self._closed = True
+                self._cond.notify_all()
+            if self._closed:
+                return
+            self._buffer.extend(data)
+            self.stats['max_fill'] = max(self.stats['max_fill'], len(self._buffer))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, size=None) -> bytes:
+        with self._cond:
+            if not (self._buffer or self._closed or self._buffering):
+                self.stats['underruns'] += 1
+                self._buffering = True
+            if self._buffering:
+                stall = time.time()
+                self._cond.wait_for(lambda: len(self._buffer) >= self._preroll or self._closed)
+                if self.stats['start'] is None:
+                    self.stats['start'] = time.time() - self._created
+                else:
+                    self.stats['stall'] += time.time() - stall
+                self._buffering = False
+            data = bytes(self._buffer[:size or self.CHUNK])
+            del self._buffer[:len(data)]
+            self.stats['size'] += len(data)
+            self._cond.notify_all()
+            callback, self._callback = (self._callback, None) if not data else (None, self._callback)
+        callback and callback(self.stats)
+        return data
+
+
+def parse_preroll(value: str) -> dict:
+    # 'wav:16,yandex:4' -> {'wav': 16, 'yandex': 4}, KiB
+    result = {}
+    for item in value.split(','):
+        key, sep, size = item.partition(':')
+        if not item.strip():
+            continue
+        if not (sep and key.strip()):
+            raise RuntimeError('Wrong preroll {}, must be format_or_provider:KiB'.format(repr(item)))
+        try:
+            result[key.strip().lower().lstrip('.')] = max(0, int(size))
+        except ValueError:
+            raise RuntimeError('Wrong preroll size {}'.format(repr(item)))
+    return result
+
+
 class Popen:
     TIMEOUT = 3 * 3600
 
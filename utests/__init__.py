@@ -1,8 +1,20 @@
+from .aligned_chunk import AlignedChunk
 from .cfg_up import ConfigUpdater
 from .ip_storage import IPStorage
+from .models_storage import ModelsOptions
+from .playback_tap import PlaybackTapTest
 from .polly import Polly
+from .provider_health import ProviderHealthTest
+from .stream_buffer import Preroll, JitterBuffer
+from .stt_cache import STTCacheTest
 from .training import SNPrettyErrors
+from .tts_cache_index import TTSCacheIndexTest
 from .xml import YandexXML
 from .url_builder import URLBuilder
+from .virtual_mic import VirtualMicURI
 
-__all__ = ['YandexXML', 'ConfigUpdater', 'Polly', 'SNPrettyErrors', 'IPStorage', 'URLBuilder']
+__all__ = [
+    'YandexXML', 'ConfigUpdater', 'Polly', 'SNPrettyErrors', 'IPStorage', 'URLBuilder', 'ProviderHealthTest',
+    'ModelsOptions', 'AlignedChunk', 'VirtualMicURI', 'STTCacheTest', 'Preroll', 'JitterBuffer',
+    'TTSCacheIndexTest', 'PlaybackTapTest',
+]
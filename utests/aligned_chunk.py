@@ -0,0 +1,46 @@
+import unittest
+
+from lib.audio_utils import aligned_chunk, BaseDetector
+
+
+class _Frames(BaseDetector):
+    def __init__(self, duration):
+        self.frames = []
+        super().__init__(duration, 2, 16000, 16000, False)
+
+    def new_chunk(self, buffer: bytes, is_speech=False):
+        self.frames.append(bytes(buffer))
+
+
+class AlignedChunk(unittest.TestCase):
+    def test_no_frames(self):
+        self.assertEqual(aligned_chunk(1024), 1024)
+        self.assertEqual(aligned_chunk(1024, 0, 0), 1024)
+
+    def test_aligned(self):
+        # snowboy + webrtc + apm
+        self.assertEqual(aligned_chunk(1024, 2400, 480, 160), 2400)
+        # porcupine
+        self.assertEqual(aligned_chunk(1024, 512), 1024)
+        self.assertEqual(aligned_chunk(100, 512), 512)
+        # Общее кратное больше target вдвое - только по первому кадру
+        self.assertEqual(aligned_chunk(1024, 512, 480), 1024)
+
+    def test_rate(self):
+        self.assertEqual(aligned_chunk(1024, 2400, 480, 160, rate=8000), 1200)
+        self.assertEqual(aligned_chunk(1024, 2400, 480, 160, rate=48000), 7200)
+        self.assertEqual(aligned_chunk(1024, 2400, rate=44100), 6615)
+        # 512 семплов 16 kHz не дают целого числа семплов 44.1 kHz
+        self.assertEqual(aligned_chunk(1000, 512, rate=44100), 1000)
+
+    def test_new_chunk(self):
+        detector = _Frames(30)
+        frame = 960
+        detector._new_chunk(b'a' * frame)
+        detector._new_chunk(b'b' * frame * 2)
+        detector._new_chunk(b'c' * 500)
+        detector._new_chunk(b'd' * (frame - 500 + 10))
+        self.assertEqual(
+            detector.frames, [b'a' * frame, b'b' * frame, b'b' * frame, b'c' * 500 + b'd' * (frame - 500)]
+        )
+        self.assertEqual(detector._buffer, b'd' * 10)
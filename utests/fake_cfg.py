@@ -0,0 +1,15 @@
+class FakeConfig(dict):
+    """Замена ConfigHandler для классов, хранящих данные в data: load_dict/save_dict в памяти, gt по разделам."""
+    def __init__(self, data=None, **sections):
+        super().__init__(sections)
+        self.data = data or {}
+        self.saved = None
+
+    def gt(self, sec, key, default=None):
+        return self.get(sec, {}).get(key, default)
+
+    def load_dict(self, _):
+        return self.data
+
+    def save_dict(self, _, data):
+        self.saved = data
@@ -0,0 +1,33 @@
+import unittest
+
+from lib.models_storage import ModelsStorage
+
+MODELS = ('one.pmdl', 'two.pmdl', 'three.pmdl')
+
+
+def storage(phrases: dict) -> ModelsStorage:
+    return ModelsStorage(MODELS, phrases=phrases, models=MODELS)
+
+
+class ModelsOptions(unittest.TestCase):
+    def test_defaults(self):
+        models = storage({})
+        self.assertEqual(models.per_model('sensitivity', 0.45), (0.45, 0.45, 0.45))
+        self.assertEqual(models.per_model('audio_gain', 1.0), (1.0, 1.0, 1.0))
+
+    def test_per_model(self):
+        models = storage({'sensitivity': 'two.pmdl:0.6, one.pmdl: 0.3', 'audio_gain': 'three.pmdl:2'})
+        self.assertEqual(models.per_model('sensitivity', 0.45), (0.3, 0.6, 0.45))
+        self.assertEqual(models.per_model('audio_gain', 1.0), (1.0, 1.0, 2.0))
+
+    def test_wrong(self):
+        models = storage({
+            'sensitivity': 'one.pmdl:1.5, two.pmdl:abc, four.pmdl:0.5, three.pmdl, :0.1',
+            'audio_gain': 'one.pmdl:0, two.pmdl:11',
+        })
+        self.assertEqual(models.per_model('sensitivity', 0.45), (0.45, 0.45, 0.45))
+        self.assertEqual(models.per_model('audio_gain', 1.0), (1.0, 1.0, 1.0))
+
+    def test_no_models(self):
+        models = ModelsStorage(no_models=True)
+        self.assertEqual(models.per_model('sensitivity', 0.45), (0.45,))
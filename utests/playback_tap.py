@@ -0,0 +1,34 @@
+import time
+import unittest
+
+from lib.audio_utils import PlaybackTap
+
+
+class PlaybackTapTest(unittest.TestCase):
+    def setUp(self):
+        self.tap = PlaybackTap()
+        self.session = self.tap.begin()
+        self.frame = b'\x00' * self.tap.FRAME
+        self.late = (self.tap.MAX_DELAY + 20) / 100
+
+    def tearDown(self):
+        self.tap.stop()
+
+    def test_late_first_data(self):
+        # Первый байт пришел позже MAX_DELAY после begin
+        time.sleep(self.late)
+        self.tap.feed(self.frame * 10, self.session)
+        self.assertEqual(len(self.tap._frames), 10)
+
+    def test_late_data(self):
+        # Поток прервался дольше MAX_DELAY, плеер ждал вместе с ним
+        self.tap.feed(self.frame * 10, self.session)
+        time.sleep(self.late)
+        self.tap.feed(self.frame * 10, self.session)
+        self.assertEqual(len(self.tap._frames), 20)
+
+    def test_old_session(self):
+        self.tap.feed(self.frame, self.session - 1)
+        self.tap.stop()
+        self.tap.feed(self.frame, self.session)
+        self.assertEqual(len(self.tap._frames), 0)
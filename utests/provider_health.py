@@ -0,0 +1,71 @@
+import unittest
+
+from lib.provider_health import ProviderHealth
+
+
+def health(probe=lambda _: True):
+    result = ProviderHealth(lambda *_: None, probe)
+    # Без фоновых проверок, _probing вызываем сами
+    result.COOLDOWN = 3600
+    result.MAX_COOLDOWN = 10000
+    return result
+
+
+class ProviderHealthTest(unittest.TestCase):
+    def tearDown(self):
+        if hasattr(self, 'health'):
+            self.health.stop()
+
+    def test_open_on_failures(self):
+        self.health = health()
+        for _ in range(ProviderHealth.FAILURES - 1):
+            self.health.record('one', False, 1)
+        self.assertEqual(self.health.available(['one', 'two']), ['one', 'two'])
+        self.health.record('one', False, 1)
+        self.assertEqual(self.health.available(['one', 'two']), ['two'])
+        # Отключены все - остается основной
+        self.assertEqual(self.health.available(['one']), ['one'])
+
+    def test_open_on_failure_rate(self):
+        self.health = health()
+        # Не больше двух ошибок подряд, доля ошибок превышает половину только на последней
+        for success in (True, True, True, False, False, True, False, False, True, False):
+            self.health.record('one', success, 1)
+            self.assertEqual(self.health.available(['one', 'two']), ['one', 'two'])
+        self.health.record('one', False, 1)
+        self.assertEqual(self.health.available(['one', 'two']), ['two'])
+
+    def test_close_clean_window(self):
+        self.health = health()
+        for _ in range(ProviderHealth.FAILURES):
+            self.health.record('one', False, 1)
+        self.health.record('one', True, 0.5)
+        self.assertEqual(self.health.available(['one', 'two']), ['one', 'two'])
+        # Старые ошибки не учитываются, одна новая не отключает провайдера
+        self.health.record('one', False, 1)
+        self.assertEqual(self.health.available(['one', 'two']), ['one', 'two'])
+
+    def test_backoff(self):
+        results = [False, False, True]
+        self.health = health(lambda _: results.pop(0))
+        for _ in range(ProviderHealth.FAILURES):
+            self.health.record('one', False, 1)
+        stat = self.health._stats['one']
+        self.assertEqual(stat.cooldown, 3600)
+        self.health._probing('one')
+        self.assertEqual(stat.cooldown, 7200)
+        self.health._probing('one')
+        self.assertEqual(stat.cooldown, 10000)
+        self.health._probing('one')
+        self.assertFalse(stat.opened)
+        self.assertEqual(stat.cooldown, 0)
+
+    def test_select_fastest(self):
+        self.health = health()
+        for _ in range(ProviderHealth.MIN_SAMPLES):
+            self.health.record('one', True, 2)
+        self.assertEqual(self.health.select(['one', 'two'], 'fastest'), 'two')
+        for _ in range(ProviderHealth.MIN_SAMPLES):
+            self.health.record('two', True, 1)
+        self.assertEqual(self.health.select(['one', 'two'], 'fastest'), 'two')
+        self.assertEqual(self.health.select(['one', 'two'], 'failover'), 'one')
@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+
+from utils import StreamBuffer, parse_preroll
+
+
+class Preroll(unittest.TestCase):
+    def test_right(self):
+        self.assertEqual(parse_preroll(''), {})
+        self.assertEqual(parse_preroll('wav:16, Yandex:4,.mp3: 8,'), {'wav': 16, 'yandex': 4, 'mp3': 8})
+        self.assertEqual(parse_preroll('opus:-1'), {'opus': 0})
+
+    def test_wrong(self):
+        for value in ('wav', ':16', 'wav:abc', 'wav:16,mp3'):
+            with self.assertRaises(RuntimeError, msg=value):
+                parse_preroll(value)
+
+
+class JitterBuffer(unittest.TestCase):
+    def test_preroll(self):
+        buffer = StreamBuffer(8)
+        threading.Timer(0.05, buffer.write, (b'1234',)).start()
+        threading.Timer(0.1, buffer.write, (b'5678',)).start()
+        start = time.time()
+        self.assertEqual(buffer.read(), b'12345678')
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        self.assertEqual(buffer.stats['underruns'], 0)
+
+    def test_underrun(self):
+        result = []
+        buffer = StreamBuffer(4, result.append)
+        buffer.write(b'1234')
+        self.assertEqual(buffer.read(), b'1234')
+        # Буфер опустел до конца потока - снова ждем preroll
+        threading.Timer(0.05, buffer.write, (b'5678',)).start()
+        self.assertEqual(buffer.read(), b'5678')
+        buffer.close()
+        self.assertEqual(buffer.read(), b'')
+        self.assertEqual(len(result), 1)
+        stats = result[0]
+        self.assertEqual(stats['underruns'], 1)
+        self.assertEqual(stats['size'], 8)
+        self.assertEqual(stats['max_fill'], 4)
+        self.assertGreater(stats['stall'], 0)
+
+    def test_close_short(self):
+        # Поток короче preroll
+        buffer = StreamBuffer(1024)
+        buffer.write(b'12')
+        buffer.write(b'')
+        self.assertEqual(buffer.read(), b'12')
+        self.assertEqual(buffer.read(), b'')
+        self.assertEqual(buffer.stats['underruns'], 0)
+
+    def test_limit(self):
+        buffer = StreamBuffer()
+        buffer.LIMIT = 4
+        buffer.WRITE_TIMEOUT = 0.05
+        buffer.write(b'1234')
+        start = time.time()
+        # Никто не читает - писатель не висит дольше WRITE_TIMEOUT, поток закрывается
+        buffer.write(b'5678')
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(buffer.read(), b'1234')
+        self.assertEqual(buffer.read(), b'')
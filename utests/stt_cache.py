@@ -0,0 +1,64 @@
+import time
+import unittest
+
+from lib.stt_cache import STTCache
+from .fake_cfg import FakeConfig
+
+
+def _cfg(ttl: int, data=None) -> FakeConfig:
+    return FakeConfig(data, cache={'stt_ttl': ttl})
+
+
+class STTCacheTest(unittest.TestCase):
+    def test_fingerprint(self):
+        key = STTCache.fingerprint(b'\x01\x02', 16000, 2, 'google', 'ru-RU')
+        self.assertEqual(key, STTCache.fingerprint(b'\x01\x02', 16000, 2, 'google', 'ru-RU'))
+        self.assertNotEqual(key, STTCache.fingerprint(b'\x01\x03', 16000, 2, 'google', 'ru-RU'))
+        self.assertNotEqual(key, STTCache.fingerprint(b'\x01\x02', 8000, 2, 'google', 'ru-RU'))
+        self.assertNotEqual(key, STTCache.fingerprint(b'\x01\x02', 16000, 2, 'yandex', 'ru-RU'))
+        self.assertNotEqual(key, STTCache.fingerprint(b'\x01\x02', 16000, 2, 'google', 'en-US'))
+
+    def test_get_set(self):
+        cache = STTCache(_cfg(1))
+        cache.set('key', 'text')
+        self.assertEqual(cache.get('key'), 'text')
+        self.assertIsNone(cache.get('other'))
+        self.assertIsNone(cache.get(None))
+
+    def test_disabled(self):
+        cfg = _cfg(0)
+        cache = STTCache(cfg)
+        cache.set('key', 'text')
+        self.assertIsNone(cache.get('key'))
+        cfg['cache']['stt_ttl'] = 1
+        self.assertIsNone(cache.get('key'))
+
+    def test_ttl(self):
+        now = int(time.time())
+        cfg = _cfg(1, {'fresh': ['one', now - 60], 'old': ['two', now - 3601], 'bad': 'three'})
+        cache = STTCache(cfg)
+        self.assertEqual(cache.get('fresh'), 'one')
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNone(cache.get('bad'))
+        cache.save(True)
+        self.assertEqual(cfg.saved, {'fresh': ['one', now - 60]})
+
+    def test_eviction(self):
+        cache = STTCache(_cfg(1))
+        cache.MAX_SIZE = 3
+        for idx in range(3):
+            cache.set(str(idx), str(idx))
+        # Самая старая запись
+        cache._data['1'][1] -= 10
+        cache.set('3', '3')
+        self.assertIsNone(cache.get('1'))
+        for idx in ('0', '2', '3'):
+            self.assertEqual(cache.get(idx), idx)
+
+    def test_save_interval(self):
+        cfg = _cfg(1)
+        cache = STTCache(cfg)
+        cache.set('key', 'text')
+        self.assertIsNone(cfg.saved)
+        cache.save(True)
+        self.assertEqual(list(cfg.saved), ['key'])
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.tts_cache_index import TTSCacheIndex, ChecksumWriter
+from .fake_cfg import FakeConfig
+
+
+class TTSCacheIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cfg = FakeConfig()
+        self.index = TTSCacheIndex(self.cfg)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.path, name)
+        writer = ChecksumWriter(path + '.part')
+        for step in range(0, len(data), 1000):
+            writer.write(data[step:step + 1000])
+        writer.close()
+        os.replace(writer.name, path)
+        self.index.add(path, writer.record)
+        return path
+
+    def test_writer(self):
+        path = self._write('file.mp3', os.urandom(5000))
+        self.assertEqual(self.index.checksum(path), self.index._data['file.mp3'])
+
+    def test_valid(self):
+        path = self._write('file.mp3', b'1' * 5000)
+        self.assertTrue(self.index.valid(path))
+
+    def test_no_record(self):
+        path = os.path.join(self.path, 'old.mp3')
+        with open(path, 'wb') as fp:
+            fp.write(b'1' * 5000)
+        self.assertIsNone(self.index.valid(path))
+
+    def test_corrupted(self):
+        truncated = self._write('truncated.mp3', b'1' * 5000)
+        with open(truncated, 'r+b') as fp:
+            fp.truncate(4000)
+        self.assertFalse(self.index.valid(truncated))
+        # Запись удалена вместе с поврежденным файлом
+        self.assertIsNone(self.index.valid(truncated))
+
+        changed = self._write('changed.mp3', b'1' * 5000)
+        with open(changed, 'r+b') as fp:
+            fp.write(b'2')
+        self.assertFalse(self.index.valid(changed))
+
+    def test_prune_adopt(self):
+        keep = self._write('keep.mp3', b'1' * 5000)
+        self._write('deleted.mp3', b'2' * 5000)
+        old = os.path.join(self.path, 'old.mp3')
+        with open(old, 'wb') as fp:
+            fp.write(b'3' * 5000)
+        self.index.prune(['keep.mp3', 'old.mp3'])
+        self.index.adopt([keep, old])
+        self.assertEqual(sorted(self.index._data), ['keep.mp3', 'old.mp3'])
+        self.assertTrue(self.index.valid(old))
+        self.index.save(True)
+        self.assertEqual(sorted(self.cfg.saved), ['keep.mp3', 'old.mp3'])
+
+    def test_load(self):
+        index = TTSCacheIndex(FakeConfig({'one': [10, 20], 'two': [10], 'three': 'x', 'four': ['1', 2]}))
+        self.assertIsNone(index.valid(os.path.join(self.path, 'two')))
+        self.assertEqual(list(index._data), ['one'])
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+import wave
+
+from lib.virtual_mic import parse_uri, _WavSource
+
+right = {
+    'wav:/tmp/test.wav': ('wav', '/tmp/test.wav'),
+    'WAV:test.wav': ('wav', 'test.wav'),
+    '/tmp/phrase.WAV': ('wav', '/tmp/phrase.WAV'),
+    'pcm:/tmp/mic.fifo': ('pcm', '/tmp/mic.fifo'),
+    'tcp:192.168.1.2:7999': ('tcp', ('192.168.1.2', 7999)),
+    'tcp::7999': ('tcp', ('127.0.0.1', 7999)),
+    'tcp:[::1]:7999': ('tcp', ('::1', 7999)),
+    'satellite': ('satellite', ''),
+    'satellite:kitchen': ('satellite', 'kitchen'),
+}
+wrong = ('', 'wav:', 'pcm:', 'tcp:host', 'tcp:host:port', 'http://host/file', '/tmp/file.mp3')
+
+
+class VirtualMicURI(unittest.TestCase):
+    def test_right(self):
+        for uri, result in right.items():
+            self.assertEqual(parse_uri(uri), result, uri)
+
+    def test_wrong(self):
+        for uri in wrong:
+            with self.assertRaises(RuntimeError, msg=uri):
+                parse_uri(uri)
+
+    def test_wav_convert(self):
+        # 8 kHz stereo 8 bit -> 16 kHz mono 16 bit
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        try:
+            with wave.open(path, 'wb') as fp:
+                fp.setnchannels(2)
+                fp.setsampwidth(1)
+                fp.setframerate(8000)
+                fp.writeframes(b'\x80' * 8000 * 2)
+            source = _WavSource(path, 16000, 2)
+            size, data = 0, source.read(3200)
+            while data:
+                size += len(data)
+                data = source.read(3200)
+            source.close()
+            self.assertAlmostEqual(size, 16000 * 2, delta=16)
+        finally:
+            os.remove(path)